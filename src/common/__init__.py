@@ -6,6 +6,7 @@ from .parsemetrics import *
 from .tokencount import *
 from .sentencecount import *
 from .sedcommands import *
+from .corpusfilter import *
 from .optconst import *
 
 __all__ = []
@@ -17,4 +18,5 @@ __all__.extend(parsemetrics.__all__)
 __all__.extend(tokencount.__all__)
 __all__.extend(sentencecount.__all__)
 __all__.extend(sedcommands.__all__)
+__all__.extend(corpusfilter.__all__)
 __all__.extend(optconst.__all__)
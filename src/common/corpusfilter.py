@@ -0,0 +1,55 @@
+from typing import Dict, Iterator, Optional
+from .sedcommands import get_sentence_filter
+
+__all__ = ['CorpusFilter']
+
+
+class CorpusFilter:
+    """
+    Single pass corpus file preprocessor. Corpus file lines are filtered the same way sed does it with
+        get_sed_regex() expressions, sentences and token appearances being counted at the same time.
+    """
+    def __init__(self, options: int, token_counts: Optional[Dict[str, int]] = None):
+        """
+        :param options:         Bit mask representing parsing options.
+        :param token_counts:    Dictionary of token appearance counts to be updated or None if tokens are not counted.
+        """
+        self._filter = get_sentence_filter(options)
+        self.token_counts = token_counts
+        self.sentence_count = 0
+        self.token_count = 0
+
+    def lines(self, corpus_path: str) -> Iterator[str]:
+        """
+        Read corpus file and yield filtered lines.
+
+        :param corpus_path:     Path to corpus file.
+        :return:                Iterator of filtered lines, each one terminated by '\\n' unless it is the last line
+                                of the file with no line feed. Encoded back with 'utf-8' and 'surrogateescape' error
+                                handler the lines are byte-identical to sed output.
+        """
+        # Only '\n' is a line separator for sed, invalid UTF-8 bytes are passed through as is
+        with open(corpus_path, "r", encoding="utf-8", errors="surrogateescape", newline="\n") as corpus_file:
+
+            for line in corpus_file:
+                eol = line[-1:] == "\n"
+
+                sentence = self._filter(line[:-1] if eol else line)
+
+                if sentence is None:
+                    continue
+
+                # 'wc -l' counts line feeds, so the last line is not counted if it is not terminated
+                if eol:
+                    self.sentence_count += 1
+
+                if self.token_counts is not None:
+
+                    # Tokens are unboxed as tokencount.unbox_tokens() does
+                    for token in sentence.split():
+                        token = token[1:-1] if token[0] == "[" and token[-1] == "]" else token
+
+                        self.token_counts[token] = self.token_counts.get(token, 0) + 1
+                        self.token_count += 1
+
+                yield sentence + "\n" if eol else sentence
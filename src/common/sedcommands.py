@@ -1,6 +1,14 @@
+import re
+from typing import Callable, Optional
 from .optconst import *
 
-__all__ = ['get_sed_regex', 'get_sed_cmd_common_part']
+__all__ = ['get_sed_regex', 'get_sed_cmd_common_part', 'get_sentence_filter']
+
+
+# Python equivalents of get_sed_regex() expressions, [[:space:]] being ASCII white space characters
+_EMPTY_LINE = re.compile(r"^\x0d?$")
+_ULL_LINK_LINE = re.compile(r"^([0-9]+[ \t\n\r\f\v]+.+){2}([ \t\n\r\f\v]+[-+0-9.e]+)?$")
+_BOXED_TOKEN = re.compile(r"\[([a-z0-9A-Z.,:\\@\"?!*~()/#$&;^%_`'\u2014©®°•…≤±×΅⁻¹²³€αβπγδμεθ«»=+-]*)\]")
 
 
 def get_sed_regex(options: int) -> str:
@@ -46,3 +54,25 @@ def get_sed_cmd_common_part(options: int) -> list:
     :return:            List of sed arguments.
     """
     return ["sed", "-Ee", get_sed_regex(options)]
+
+
+def get_sentence_filter(options: int) -> Callable[[str], Optional[str]]:
+    """
+    Return Python equivalent of sed filtering defined by get_sed_regex().
+
+    :param options:     Grammar tester options bit mask.
+    :return:            Function taking a corpus file line (no trailing '\\n') and returning either the line
+                        to be parsed or None if the line is filtered out.
+    """
+    ull_input, to_lower = options & BIT_ULL_IN, options & BIT_INPUT_TO_LCASE
+
+    def sentence_filter(line: str) -> Optional[str]:
+        if _EMPTY_LINE.match(line) or ull_input and _ULL_LINK_LINE.match(line):
+            return None
+
+        if ull_input:
+            line = _BOXED_TOKEN.sub(r"\1", line)
+
+        return line.lower() if to_lower else line
+
+    return sentence_filter
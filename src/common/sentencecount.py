@@ -1,7 +1,6 @@
 import os
-from typing import Optional
-from subprocess import PIPE, Popen
-from .sedcommands import *
+from typing import Dict, Optional
+from .corpusfilter import CorpusFilter
 from .dirhelper import traverse_dir_tree
 
 
@@ -16,61 +15,47 @@ class SentCountError(Exception):
     pass
 
 
-def get_sentence_count(corpus_path: str, options: int) -> int:
+def get_sentence_count(corpus_path: str, options: int, token_counts: Optional[Dict[str, int]] = None) -> int:
     """
     Count sentences in a single corpus file
 
     :param corpus_path:     Path to a single corpus file.
     :param options:         Bit mask representing parsing options.
+    :param token_counts:    Dictionary of token appearance counts to be updated in the same pass or None.
     :return:                Number of sentences.
     """
-    sentence_count = 0
-
-    sed_cmd = get_sed_cmd_common_part(options) + [corpus_path]
+    corpus_filter = CorpusFilter(options, token_counts)
 
     try:
-        # Get number of sentences in input file
-        with Popen(sed_cmd, stdout=PIPE) as proc_sed, \
-             Popen(["wc", "-l"], stdin=proc_sed.stdout, stdout=PIPE, stderr=PIPE) as proc_wcl:
-
-            # Closing grep output stream will terminate it's process.
-            proc_sed.stdout.close()
-
-            # Read pipes to get complete output returned by link-parser
-            raw, err = proc_wcl.communicate()
-
-            # Check return code to make sure the process completed successfully.
-            if proc_wcl.returncode != 0:
-                raise SentCountError("Process '{0}' terminated with exit code: {1} "
-                                     "and error message:\n'{2}'.".format("wc", proc_wcl.returncode, err.decode()))
-
-            sentence_count = int((raw.decode("utf-8-sig")).strip())
+        for _ in corpus_filter.lines(corpus_path):
+            pass
 
     except KeyboardInterrupt:
         print("get_sentence_count(): Ctrl+C triggered.")
         raise
 
-    return sentence_count
+    return corpus_filter.sentence_count
 
 
-def get_corpus_sentence_count(corpus_path: str, options: int) -> int:
+def get_corpus_sentence_count(corpus_path: str, options: int, token_counts: Optional[Dict[str, int]] = None) -> int:
     """
     Count total number of sentences across all corpus files
 
     :param corpus_path:     Path to a single corpus file or to a directory with multiple files.
     :param options:         Bit mask holding parse options.
+    :param token_counts:    Dictionary of token appearance counts to be updated in the same pass or None.
     :return:                Total number of sentences in the corpus.
     """
     total_sentences = 0
 
     def on_sentence_count(file: str, args: Optional[list]) -> None:
         nonlocal total_sentences
-        total_sentences += get_sentence_count(file, options)
+        total_sentences += get_sentence_count(file, options, token_counts)
 
     if os.path.isdir(corpus_path):
         traverse_dir_tree(corpus_path, "", [on_sentence_count], None, True)
 
     else:
-        total_sentences = get_sentence_count(corpus_path, options)
+        total_sentences = get_sentence_count(corpus_path, options, token_counts)
 
     return total_sentences
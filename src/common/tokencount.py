@@ -1,9 +1,8 @@
 import logging
 import os
 from typing import Dict, List
-from subprocess import Popen, PIPE
 from .dirhelper import traverse_dir_tree
-from .sedcommands import get_sed_cmd_common_part
+from .corpusfilter import CorpusFilter
 
 __all__ = [
     'update_token_counts',
@@ -33,38 +32,20 @@ def unbox_tokens(tokens: List[str]) -> List[str]:
 def update_token_counts(corpus_path: str, token_counts: Dict[str, int], options: int) -> int:
     """
     Update token counts saved in 'token_count' dictionary using the same settings as parser.
-        The corpus is filtered by 'sed' according to 'options' bit mask.
+        The corpus is filtered the same way as 'sed' does it according to 'options' bit mask.
 
     :param corpus_path:     Path to corpus file.
     :param token_counts:    Dictionary of token appearance counts.
     :param options:         Bit mask representing parsing options.
     :return:                Total number of tokens in corpus file.
     """
-    sed_cmd = get_sed_cmd_common_part(options) + [corpus_path]
+    corpus_filter = CorpusFilter(options, token_counts)
 
-    with Popen(sed_cmd, stdout=PIPE, stderr=PIPE) as proc_sed:
+    for _ in corpus_filter.lines(corpus_path):
+        pass
 
-        # Read pipes to get complete output returned by link-parser
-        raw_stream, err_stream = proc_sed.communicate()
-
-        # Check return code to make sure the process completed successfully.
-        if proc_sed.returncode != 0:
-            raise TokenCountError(f"Process '{sed_cmd[0]}' terminated with exit code: {proc_sed.returncode} "
-                                  f"and error message:\n'{err_stream.decode()}'")
-
-    total_count = 0
-
-    for line in raw_stream.decode().split("\n"):
-
-        for token in unbox_tokens([t.strip() for t in line.split()]):
-
-            # Increment token count
-            token_counts[token] = token_counts.get(token, 0) + 1
-
-            # Count total number of tokens appearances
-            total_count += 1
-
-    return total_count
+    # Count total number of tokens appearances
+    return corpus_filter.token_count
 
 
 def save_token_counts(token_counts: Dict[str, int], output_path: str) -> None:
@@ -26,6 +26,9 @@ def learn_categories(links, **kwargs):
     word_space = kwa('embeddings', 'word_space', **kwargs)
     dim_max = kwa(100, 'dim_max', **kwargs)
     sv_min = kwa(0.1, 'sv_min', **kwargs)
+    export_svd = kwa(False, 'export_svd', **kwargs)                    # 261018
+    svd_backend = kwa('sparsesvd', 'svd_backend', **kwargs)
+    svd_seed = kwa(0, 'svd_seed', **kwargs)
     algorithm = kwa('kmeans', 'clustering', **kwargs)
     verbose = kwa('none', 'verbose', **kwargs)
 
@@ -49,14 +52,17 @@ def learn_categories(links, **kwargs):
         dict_path = tmpath
         try:
             dim = vector_space_dim(links, dict_path, tmpath, dim_max, sv_min,
-                                   verbose)
+                                   verbose, backend = svd_backend,
+                                   seed = svd_seed)
         except:  # FIXME
             dim = dim_max
         log.update({'vector_space_dim': dim})
 
-        vdf, sv, re01 = pmisvd(links, dict_path, tmpath, dim)
+        vdf, sv, re01 = pmisvd(links, dict_path, tmpath, dim,
+                               export = export_svd, backend = svd_backend,
+                               seed = svd_seed)
         #-log.update(re01)  # {'vectors_file': out_file} -- no need
-        cdf, silhouette, inertia = best_clusters(vdf, **kwargs)
+        cdf, silhouette, inertia = best_clusters(vdf, log, **kwargs)
         log.update({'silhouette': silhouette, 'inertia': inertia})
 
     # Sparse word space, agglomerative clustering 2018-10-21, mean shift, ...
@@ -134,8 +140,8 @@ def cdf2cats(clusters, **kwargs):
         cats['disjuncts'] = [[]] + clusters['disjuncts'].tolist()
         djset = set()
         [[djset.add(y) for y in x] for x in cats['disjuncts']]
-        djlist = sorted(djset)
-        cats['djs'] = [set([djlist.index(x) for x in y if x in djlist])
+        djids = {x: i for i, x in enumerate(sorted(djset))}     # 261018
+        cats['djs'] = [set([djids[x] for x in y if x in djids])
                        for y in cats['disjuncts']]
     if 'counts' in clusters:
         cats['counts'] = [0] + clusters['counts'].tolist()
@@ -167,3 +173,6 @@ def cdf2cats(clusters, **kwargs):
 # 81231 cleanup after upstream merge and conflicts resolution (FIXME: 2nd check)
 # 90221 tmpath defined in learn, tweaks removed here
 # 90410 empty filtered parses dataset issue
+# 261018 DRK: PMI, SVD and vectors files in tmpath only if kwargs['export_svd']
+# 261018 DRK: vector_space_dim SVD at dim_max reused by pmisvd (svd_factors)
+# 261018 DRK: kwargs['svd_backend'], kwargs['svd_seed'] -- truncated_svd
@@ -0,0 +1,173 @@
+# language-learning/src/grammar_learner/category_store.py              # 261018
+import numpy as np
+from copy import copy
+from scipy.sparse import csr_matrix
+
+ROW_SETS = ['words', 'disjuncts']  # {'key': [[] or {}]} ⇒ CSR incidence
+
+
+def snapshot(cats):
+    """ copy-on-write snapshot of a legacy categories dict: column lists
+        copied, entries (words, disjuncts sets...) shared -- the learner
+        replaces entries, never updates them in place (appended ones aside)
+    """
+    return {key: list(value) if isinstance(value, list) else copy(value)
+            for key, value in cats.items()}
+
+
+def encode_rows(rows, data = None):
+    """ [[] or {} or ()] ⇒ (vocabulary, id map, CSR rows × vocabulary,
+        row types); row order of lists kept (unsorted CSR indices)
+    """
+    ids = {}
+    codes = [ids.setdefault(x, len(ids)) for row in rows for x in row]
+    indptr = np.zeros(len(rows) + 1, dtype = np.int64)
+    np.cumsum([len(row) for row in rows], out = indptr[1:])
+    if data is None:
+        data = np.ones(len(codes), dtype = np.int8)
+    matrix = csr_matrix((np.asarray(data), np.asarray(codes, dtype = np.int64),
+                         indptr), shape = (len(rows), len(ids)))
+    return list(ids), ids, matrix, [type(row) for row in rows]
+
+
+def decode_rows(vocabulary, matrix, kinds):
+    indptr, indices = matrix.indptr, matrix.indices
+    return [kind(vocabulary[j] for j in indices[indptr[i]:indptr[i + 1]])
+            for i, kind in enumerate(kinds)]
+
+
+def array_column(values):  # homogeneous int / float / str column ⇒ ndarray
+    types = set(type(x) for x in values)
+    if len(types) == 1 and types.pop() in [int, float, str]:
+        return np.asarray(values)
+    return None
+
+
+class CategoryStore:
+    """ categories / rules {'cluster': [], 'parent': [], 'words': [[]],
+        'disjuncts': [[]], ...} as numpy arrays:
+        - scalar columns ('parent', 'quality', 'counts'...) ⇒ ndarrays,
+          'cluster' names ⇒ object ndarray + cluster_ids name ⇒ row map;
+        - 'words', 'disjuncts' ⇒ CSR rows × vocabulary incidence matrices
+          (word_matrix, dj_matrix) + vocabularies and id maps, 'dj_counts'
+          aligned with disjuncts ⇒ dj_matrix data;
+        - other columns ('djs', 'similarities', 'children'...) kept as is.
+        Arrays are never updated in place: snapshot() shares them,
+        replace(**columns) re-encodes the replaced columns only.
+        from_dict / to_dict -- legacy dict adapters.
+    """
+    def __init__(self):
+        self.keys = []
+        self.arrays = {}  # scalar columns
+        self.columns = {}  # legacy list columns
+        self.vocabularies = {}
+        self.ids = {}
+        self.matrices = {}
+        self.kinds = {}
+        self.dj_counts = False  # dj_counts stored as dj_matrix data
+        self.cluster_ids = {}
+
+    @classmethod
+    def from_dict(cls, cats):
+        store = cls()
+        store.keys = list(cats.keys())
+        store.set_columns(cats)
+        return store
+
+    def set_columns(self, cats):
+        for key, values in cats.items():
+            if key in ROW_SETS or key == 'dj_counts':
+                continue
+            self.arrays.pop(key, None)
+            self.columns.pop(key, None)
+            array = array_column(values) if key != 'cluster' else None
+            if key == 'cluster':
+                self.arrays[key] = np.empty(len(values), dtype = object)
+                self.arrays[key][:] = values
+                self.cluster_ids = {}
+                for i, x in enumerate(values):
+                    if x is not None:
+                        self.cluster_ids.setdefault(x, i)
+            elif array is not None:
+                self.arrays[key] = array
+            else:
+                self.columns[key] = values
+        if 'words' in cats:
+            self.set_rows('words', cats['words'])
+        if 'disjuncts' in cats or 'dj_counts' in cats:
+            disjuncts = cats['disjuncts'] if 'disjuncts' in cats \
+                else self.column('disjuncts')
+            dj_counts = cats['dj_counts'] if 'dj_counts' in cats \
+                else self.column('dj_counts')
+            self.columns.pop('dj_counts', None)
+            self.dj_counts = False
+            if dj_counts is not None and len(dj_counts) == len(disjuncts) \
+                    and all(len(x) == len(y) and not isinstance(x, set)
+                            for x, y in zip(disjuncts, dj_counts)):
+                self.set_rows('disjuncts', disjuncts,
+                              [c for row in dj_counts for c in row])
+                self.dj_counts = True
+                self.kinds['dj_counts'] = [type(x) for x in dj_counts]
+            else:
+                self.set_rows('disjuncts', disjuncts)
+                if dj_counts is not None:
+                    self.columns['dj_counts'] = dj_counts
+
+    def set_rows(self, key, rows, data = None):
+        self.vocabularies[key], self.ids[key], self.matrices[key], \
+            self.kinds[key] = encode_rows(rows, data)
+
+    def snapshot(self):
+        store = copy(self)
+        for attr in ['keys', 'arrays', 'columns', 'vocabularies', 'ids',
+                     'matrices', 'kinds']:
+            setattr(store, attr, copy(getattr(self, attr)))
+        return store
+
+    def replace(self, **columns):
+        """ :return: a snapshot with the given legacy columns replaced """
+        store = self.snapshot()
+        store.keys += [key for key in columns if key not in store.keys]
+        store.set_columns(columns)
+        return store
+
+    def __len__(self):
+        return len(self.arrays['cluster'])
+
+    def index(self, cluster):  # cluster name ⇒ row, O(1)
+        return self.cluster_ids[cluster]
+
+    @property
+    def word_matrix(self):  # clusters × words incidence
+        return self.matrices['words']
+
+    @property
+    def dj_matrix(self):  # clusters × disjuncts, dj_counts data if stored
+        return self.matrices['disjuncts']
+
+    def word_clusters(self, rows):
+        """ :return: {word: row} -- the last of rows containing the word """
+        m = self.matrices['words']
+        vocabulary = self.vocabularies['words']
+        clusters = {}
+        for i in rows:
+            for j in m.indices[m.indptr[i]:m.indptr[i + 1]]:
+                clusters[vocabulary[j]] = i
+        return clusters
+
+    def column(self, key):  # ⇒ legacy list column
+        if key in self.arrays:
+            return self.arrays[key].tolist()
+        if key in self.columns:
+            return self.columns[key]
+        if key in ROW_SETS and key in self.matrices:
+            return decode_rows(self.vocabularies[key], self.matrices[key],
+                               self.kinds[key])
+        if key == 'dj_counts' and self.dj_counts:
+            m = self.matrices['disjuncts']
+            return [kind(m.data[m.indptr[i]:m.indptr[i + 1]].tolist())
+                    for i, kind in enumerate(self.kinds['dj_counts'])]
+        return None
+
+    def to_dict(self):
+        return {key: self.column(key) for key in self.keys}
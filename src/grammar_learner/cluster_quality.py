@@ -0,0 +1,92 @@
+# language-learning/src/grammar_learner/cluster_quality.py              # 261018
+import time
+import numpy as np
+from sklearn.metrics import pairwise_distances_chunked, silhouette_score
+from .utl import kwa
+
+
+def stratified_sample(labels, size, seed = 0):
+    """ seeded sample of about `size` indices, each cluster represented in
+        proportion to its size, at least 2 members of each cluster (if any)
+    :return: sorted indices ndarray
+    """
+    labels = np.asarray(labels)
+    n = len(labels)
+    if not size or size >= n:
+        return np.arange(n)
+    ids, inverse, counts = np.unique(labels, return_inverse = True,
+                                     return_counts = True)
+    quota = np.minimum(counts, np.maximum(
+        np.floor(counts * size / n).astype(int), 2))
+    random = np.random.RandomState(seed)
+    perm = random.permutation(n)
+    order = perm[np.argsort(inverse[perm], kind = 'stable')]
+    rank = np.arange(n) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.sort(order[rank < np.repeat(quota, counts)])
+
+
+class SilhouetteScorer:
+    """ silhouette index of many clusterings of the same data (a number of
+        clusters sweep):
+        sample_size None or 0: exact -- from the second call on, pairwise
+          distances computed once, chunk by chunk (sklearn working_memory),
+          kept as float32 and reused with metric = 'precomputed';
+        sample_size > 0: silhouette of a seeded stratified sample.
+        elapsed: seconds spent scoring, distances computation included.
+    """
+    def __init__(self, x, metric = 'euclidean', sample_size = None, seed = 0):
+        self.x = x
+        self.metric = metric
+        self.sample_size = sample_size
+        self.seed = seed
+        self.distances = None
+        self.calls = 0
+        self.elapsed = 0.0
+
+    @classmethod
+    def from_kwargs(cls, x, metric = 'euclidean', **kwargs):
+        return cls(x, metric, kwa(None, 'silhouette_sample', **kwargs),
+                   kwa(0, 'silhouette_seed', **kwargs))
+
+    @property
+    def exact(self):
+        return not self.sample_size or self.sample_size >= self.x.shape[0]
+
+    @property
+    def mode(self):
+        return 'exact' if self.exact else 'sample ' + str(self.sample_size)
+
+    def pairwise(self):
+        """ :return: n × n float32 distances, computed on the first call """
+        if self.distances is None:
+            start = time.time()
+            n = self.x.shape[0]
+            distances = np.empty((n, n), dtype = np.float32)
+            i = 0
+            for chunk in pairwise_distances_chunked(self.x,
+                                                    metric = self.metric):
+                distances[i:i + chunk.shape[0]] = chunk
+                i += chunk.shape[0]
+            np.fill_diagonal(distances, 0)
+            self.distances = distances
+            self.elapsed += time.time() - start
+        return self.distances
+
+    def silhouette(self, labels):
+        labels = np.asarray(labels)
+        self.calls += 1
+        reuse = self.exact and (self.calls > 1 or self.distances is not None)
+        distances = self.pairwise() if reuse else None
+        start = time.time()
+        try:
+            if reuse:
+                return float(silhouette_score(distances, labels,
+                                              metric = 'precomputed'))
+            if self.exact:  # a single clustering: no n × n matrix kept
+                return float(silhouette_score(self.x, labels,
+                                              metric = self.metric))
+            idx = stratified_sample(labels, self.sample_size, self.seed)
+            return float(silhouette_score(self.x[idx], labels[idx],
+                                          metric = self.metric))
+        finally:
+            self.elapsed += time.time() - start
@@ -2,12 +2,14 @@
 import logging
 import numpy as np
 import pandas as pd
-from sklearn.cluster import KMeans
+from multiprocessing import Pool
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.metrics import pairwise_distances, silhouette_score
 from statistics import mode
 from random import randint
 from operator import itemgetter
 from .utl import UTC, kwa
+from .cluster_quality import SilhouetteScorer
 
 
 def cluster_id(n, nmax):
@@ -16,10 +18,42 @@ def cluster_id(n, nmax):
     return int2az(n).zfill(len(int2az(nmax))).replace('0', 'A')
 
 
-def cluster_words_kmeans(words_df, n_clusters, init = 'k-means++', n_init = 10):
+MINI_BATCH_KMEANS = ['mini-batch-kmeans', 'mini_batch_kmeans', 'minibatch']
+
+
+def mini_batch_size(algo):                                              # 261018
+    """ clustering ['mini-batch-kmeans', init, n_init, batch_size] ⇒
+        MiniBatchKMeans batch_size (default 1000), 0 ⇒ full batch KMeans """
+    if type(algo) is str:
+        algo = [algo]
+    if type(algo) not in [tuple, list] or len(algo) < 1 \
+            or algo[0] not in MINI_BATCH_KMEANS:
+        return 0
+    if len(algo) > 3:
+        try: return max(int(algo[3]), 1)
+        except: pass
+    return 1000
+
+
+def kmeans_model(n_clusters, init = 'k-means++', n_init = 10, seed = None,
+                 batch_size = 0):                                       # 261018
+    # batch_size > 0: MiniBatchKMeans, dense or scipy.sparse input
+    if batch_size > 0:
+        return MiniBatchKMeans(init = init, n_clusters = n_clusters,
+                               n_init = n_init, batch_size = batch_size,
+                               random_state = seed)
+    return KMeans(init = init, n_clusters = n_clusters, n_init = n_init,
+                  random_state = seed)
+
+
+def cluster_words_kmeans(words_df, n_clusters, init = 'k-means++', n_init = 10,
+                         seed = None, batch_size = 0, scorer = None):
     # words_df: pandas DataFrame
     # init: 'k-means++', 'random', ndarray with random seed
     # n_init: number of initializations (runs), default 10
+    # seed: KMeans random_state                                         # 261018
+    # batch_size > 0: MiniBatchKMeans, see mini_batch_size
+    # scorer: SilhouetteScorer of words_df vectors, shared by a sweep
     words_list = words_df['word'].tolist()
 
     if n_clusters < 2:                                                  # 90104
@@ -30,13 +64,21 @@ def cluster_words_kmeans(words_df, n_clusters, init = 'k-means++', n_init = 10):
     del df['word']
     # fails? = KMeans(init='random', n_clusters=n_clusters, n_init=30)
     # kmeans_model = KMeans(init='k-means++', n_clusters=n_clusters, n_init=10)
-    kmeans_model = KMeans(init = init, n_clusters = n_clusters, n_init = n_init)
-    kmeans_model.fit(df)
+    model = kmeans_model(n_clusters, init, n_init, seed, batch_size)
+    model.fit(df)
+    labels = model.labels_
+    inertia = model.inertia_
+    if scorer is None:
+        silhouette = silhouette_score(df, labels, metric = 'euclidean')
+    else:
+        silhouette = scorer.silhouette(labels)
+
+    return kmeans_cdf(words_list, model), silhouette, inertia
+
+
+def kmeans_cdf(words_list, kmeans_model):  # ⇒ clusters DataFrame     # 261018
     labels = kmeans_model.labels_
-    inertia = kmeans_model.inertia_
     centroids = np.asarray(kmeans_model.cluster_centers_[:(max(labels) + 1)])
-    silhouette = silhouette_score(df, labels, metric = 'euclidean')
-
     cdf = pd.DataFrame(centroids)
     cdf = cdf.applymap(lambda x: x if abs(x) > 1e-12 else 0.)
     cdf.columns = [x + 1 if type(x) == int else x for x in cdf.columns]
@@ -51,10 +93,186 @@ def cluster_words_kmeans(words_df, n_clusters, init = 'k-means++', n_init = 10):
     cols = ['cluster', 'cluster_words'] + cols
     cdf = cdf[cols]
 
-    return cdf, silhouette, inertia
+    return cdf
+
+
+def split_clusters(x, centers, labels, n_new):                          # 261018
+    """ k ⇒ k + n_new initial centers: the farthest point of the cluster
+        with max sum of squared distances becomes a new center """
+    centers = [c for c in centers]
+    labels = labels.copy()
+    d = np.sum((x - np.asarray(centers)[labels]) ** 2, axis = 1)
+    sse = np.bincount(labels, weights = d, minlength = len(centers))
+    for n in range(n_new):
+        worst = int(np.argmax(sse))
+        members = np.where(labels == worst)[0]
+        if sse[worst] <= 0 or len(members) == 0:
+            members = np.arange(len(x))
+        p = members[np.argmax(d[members])]
+        centers.append(x[p])
+        labels[p] = len(centers) - 1
+        d[p] = 0
+        sse[worst] /= 2
+        sse = np.append(sse, sse[worst])
+    return np.asarray(centers)
+
+
+def incremental_kmeans(words_df, candidates, restarts = 2, seed = None,
+                       batch_size = 0, scorer = None):
+    """ warm-started k-means sweep over ascending n_clusters: k ⇒ k+1
+        starts from k centroids with the worst clusters split, plus
+        `restarts` k-means++ runs; the lower inertia result is kept
+        (MiniBatchKMeans runs if batch_size > 0)
+    :return: [(clusters, silhouette, inertia) or None] -- as
+             cluster_words_kmeans for each of candidates
+    """                                                                 # 261018
+    words_list = words_df['word'].tolist()
+    df = words_df.copy()
+    del df['word']
+    x = df.values.astype(float)
+    random = np.random.RandomState(seed)
+    model = None
+    results = []
+    for n_clusters in candidates:
+        if n_clusters < 2:
+            results.append(cluster_words_kmeans(words_df, n_clusters,
+                                                batch_size = batch_size,
+                                                scorer = scorer))
+            continue
+        try:
+            runs = []
+            run_seed = random.randint(2 ** 31 - 1)
+            if model is not None and n_clusters > len(model.cluster_centers_):
+                init = split_clusters(x, model.cluster_centers_, model.labels_,
+                                      n_clusters - len(model.cluster_centers_))
+                runs.append(kmeans_model(n_clusters, init, 1, run_seed,
+                                         batch_size))
+            n_init = 10 if len(runs) == 0 else restarts
+            if n_init > 0:
+                runs.append(kmeans_model(n_clusters, 'k-means++', n_init,
+                                         run_seed, batch_size))
+            for run in runs:
+                run.fit(x)
+            model = min(runs, key = lambda m: m.inertia_)
+            if scorer is None:
+                silhouette = silhouette_score(x, model.labels_,
+                                              metric = 'euclidean')
+            else:
+                silhouette = scorer.silhouette(model.labels_)
+            results.append((kmeans_cdf(words_list, model), silhouette,
+                            model.inertia_))
+        except:  # failed clustering: None, handled by callers
+            model = None
+            results.append(None)
+    return results
+
+
+sweep_vdf = None  # KMeansSweep worker process vectors
+sweep_scorer = None  # and their SilhouetteScorer                       # 261018
+
+
+def set_sweep_vdf(vdf, scorer = None):
+    global sweep_vdf, sweep_scorer
+    sweep_vdf = vdf
+    sweep_scorer = scorer
+
+
+def incremental_task(args):  # KMeansSweep incremental sweep task
+    candidates, restarts, seed, batch_size = args
+    start = sweep_scorer.elapsed
+    results = incremental_kmeans(sweep_vdf, candidates, restarts, seed,
+                                 batch_size, sweep_scorer)
+    return results, sweep_scorer.elapsed - start
+
+
+def kmeans_task(args):  # KMeansSweep task, run in a worker process
+    n_clusters, init, n_init, seed, batch_size = args
+    start = sweep_scorer.elapsed
+    try:
+        result = cluster_words_kmeans(sweep_vdf, n_clusters, init, n_init,
+                                      seed, batch_size, sweep_scorer)
+    except:  # failed clustering: None, handled by callers
+        result = None
+    return result, sweep_scorer.elapsed - start
+
+
+class KMeansSweep:                                                      # 261018
+    """ cluster_words_kmeans for lists of (n_clusters, init, n_init) tasks,
+        serial or in a process pool (kwargs['workers'] > 1). Seeds are
+        drawn in tasks order from kwargs['random_seed'] RandomState, so
+        serial and parallel sweeps return identical results.
+        kwargs['cluster_sweep'] = 'incremental': warm-started number of
+        clusters sweep, see incremental_kmeans.
+        kwargs['clustering'] = 'mini-batch-kmeans': MiniBatchKMeans runs,
+        see mini_batch_size.
+        Silhouette indices: a shared SilhouetteScorer, exact distances
+        computed once or kwargs['silhouette_sample'] words sampled;
+        metrics_time: seconds spent scoring.
+    """
+    def __init__(self, vdf, **kwargs):
+        self.vdf = vdf
+        self.random = np.random.RandomState(kwa(None, 'random_seed', **kwargs))
+        self.mode = kwa('full', 'cluster_sweep', **kwargs)
+        self.restarts = kwa(2, 'sweep_restarts', **kwargs)
+        self.batch_size = mini_batch_size(kwa('kmeans', 'clustering', **kwargs))
+        self.scorer = SilhouetteScorer.from_kwargs(
+            vdf[[x for x in vdf.columns if x != 'word']].values.astype(float),
+            'euclidean', **kwargs)
+        self.metrics_time = 0.0
+        workers = kwa(1, 'workers', **kwargs)
+        if workers > 1 and self.scorer.exact:  # shared by forked workers
+            self.scorer.pairwise()
+            self.metrics_time += self.scorer.elapsed
+        self.pool = Pool(workers, set_sweep_vdf, (vdf, self.scorer)) \
+            if workers > 1 else None
+
+    def run(self, tasks):
+        """ :return: [(clusters, silhouette, inertia) or None] in tasks order """
+        args = [(n, init, n_init, int(self.random.randint(2 ** 31 - 1)),
+                 self.batch_size) for n, init, n_init in tasks]
+        if self.pool is None:
+            set_sweep_vdf(self.vdf, self.scorer)
+            results = [kmeans_task(x) for x in args]
+        else:
+            results = self.pool.map(kmeans_task, args, chunksize = 1)
+        return self.timed(results)
+
+    def sweep(self, candidates, attempts = 1):
+        """ attempts × candidates n_clusters, k-means++ defaults
+        :return: [(clusters, silhouette, inertia) or None], attempts order
+        """
+        if self.mode != 'incremental':
+            return self.run([(n, 'k-means++', 10)
+                             for k in range(attempts) for n in candidates])
+        args = [(candidates, self.restarts,
+                 int(self.random.randint(2 ** 31 - 1)), self.batch_size)
+                for k in range(attempts)]
+        if self.pool is None:
+            set_sweep_vdf(self.vdf, self.scorer)
+            results = [incremental_task(x) for x in args]
+        else:
+            results = self.pool.map(incremental_task, args, chunksize = 1)
+        return [r for attempt in self.timed(results) for r in attempt]
+
+    def timed(self, results):  # [(result, metrics time)] ⇒ [result]
+        self.metrics_time += sum(t for r, t in results)
+        return [r for r, t in results]
 
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        set_sweep_vdf(None)
 
-def number_of_clusters(vdf, **kwargs):                                  # 90104
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def number_of_clusters(vdf, sweep = None, **kwargs):                    # 90104
     logger = logging.getLogger(__name__ + "number_of_clusters")
     algorithm = kwa('kmeans', 'clustering', **kwargs)
     criteria = kwa('silhouette', 'cluster_criteria', **kwargs)
@@ -84,10 +302,22 @@ def number_of_clusters(vdf, **kwargs):                                  # 90104
         return 4  # FIXME: hack Turtle 80420!
     n_clusters = max_clusters
 
+    # All attempts × n_clusters evaluated at once (in parallel if workers
+    # > 1), then checked in the legacy order                          # 261018
+    candidates = list(range(crange[0], max_clusters, crange[2]))
+    if sweep is None:
+        with KMeansSweep(vdf, **kwargs) as sweep:
+            results = sweep.sweep(candidates, attempts)
+    else:
+        results = sweep.sweep(candidates, attempts)
     lst = []
     for k in range(attempts):
-        for i, j in enumerate(range(crange[0], max_clusters, crange[2])):
-            cdf, silhouette, inertia = cluster_words_kmeans(vdf, j)
+        for i, j in enumerate(candidates):
+            result = results[k * len(candidates) + i]
+            if result is None:
+                raise ValueError('number_of_clusters: k-means failed, '
+                                 'n_clusters = ' + str(j))
+            cdf, silhouette, inertia = result
             sil_range.loc[i] = [j, len(cdf), round(silhouette, 4),
                                 round(inertia, 2)]
             if level > 0.9999:  # 1 - max Silhouette index
@@ -130,7 +360,7 @@ def number_of_clusters(vdf, **kwargs):                                  # 90104
     return int(n_clusters)
 
 
-def best_clusters(vdf, **kwargs):                                       # 90104
+def best_clusters(vdf, log = None, **kwargs):                           # 90104
     logger = logging.getLogger(__name__ + ".best_clusters")
     algo = kwa('kmeans', 'clustering', **kwargs)
     criteria = kwa('silhouette', 'cluster_criteria', **kwargs)
@@ -154,56 +384,62 @@ def best_clusters(vdf, **kwargs):                                       # 90104
             algorithm = 'kmeans'
             init = 'k-means++'
             n_init = 10
+        elif algo in MINI_BATCH_KMEANS:  # batch_size: KMeansSweep    # 261018
+            algorithm = 'kmeans'
+            n_init = 3
     elif type(algo) in [tuple, list]:
-        if algo[0] == 'kmeans':
+        if algo[0] == 'kmeans' or algo[0] in MINI_BATCH_KMEANS:
             algorithm = 'kmeans'
+            if algo[0] in MINI_BATCH_KMEANS: n_init = 3
             if len(algo) > 1 and algo[1][0] == 'r': init = 'random'
             if len(algo) > 2:
                 try: n_init = int(algo[2])
                 except: n_init = 10
 
+    with KMeansSweep(vdf, **kwargs) as sweep:                           # 261018
+        result = kmeans_sweep(vdf, sweep, crange, init, n_init, level, **kwargs)
+        if log is not None:  # silhouette scoring mode and time
+            log.update({'silhouette_mode': sweep.scorer.mode,
+                        'metrics_time': round(sweep.metrics_time, 3)})
+        return result
+
+
+def best_run(results, n_clusters):  # best silhouette of repeated tests
+    lst = [(n, n_clusters) + r for n, r in enumerate(results) if r is not None]
+    if len(lst) == 0:
+        return 0, 0, 0
+    lst.sort(key = itemgetter(3), reverse = True)
+    return lst[0][2], lst[0][3], lst[0][4]
+
+
+def kmeans_sweep(vdf, sweep, crange, init, n_init, level, **kwargs):   # 261018
+    # best_clusters search, k-means runs of each step via sweep.run
+
+    def kmeans(n_clusters, init = 'k-means++', n_init = 10):
+        result = sweep.run([(n_clusters, init, n_init)])[0]
+        if result is None:
+            raise ValueError('k-means failed, n_clusters = ' + str(n_clusters))
+        return result
+
     if crange[0] == crange[1]:  # given n_clusters
         if len(crange) > 2 and crange[2] > 1:  # run crange[2] times
-            lst = []
-            for n in range(crange[2]):
-                try:
-                    c, s, i = cluster_words_kmeans(vdf, crange[0], init, n_init)
-                    lst.append((n, crange[0], c, s, i))
-                except:
-                    if n == crange[2] - 1 and len(lst) == 0:
-                        return 0, 0, 0
-                    else:
-                        continue
-            lst.sort(key = itemgetter(3), reverse = True)
-            if len(lst) > 0:
-                return lst[0][2], lst[0][3], lst[0][4]
-            else:
-                return 0, 0, 0
+            return best_run(sweep.run([(crange[0], init, n_init)
+                                       for n in range(crange[2])]), crange[0])
         else:  # run once
-            clusters, silhouette, inertia = cluster_words_kmeans(vdf, crange[0])
+            clusters, silhouette, inertia = kmeans(crange[0])
             return clusters, silhouette, inertia
 
     elif crange[1] > crange[0]:  # 80809 option: legacy search in a given range
-        n_clstrs = number_of_clusters(vdf, **kwargs)
+        n_clstrs = number_of_clusters(vdf, sweep, **kwargs)
         if n_clstrs < 2:                                                # 90104
             return pd.DataFrame.from_dict(
                 {'cluster': 'B', 'cluster_words': [vdf['word'].tolist()]}), 0, 0
 
         if len(crange) > 3 and crange[3] > 1:
-            lst = []
-            for n in range(crange[3]):
-                try:
-                    c, s, i = cluster_words_kmeans(vdf, n_clstrs, init, n_init)
-                    lst.append((n, n_clstrs, c, s, i))
-                except:
-                    if n == crange[3] - 1 and len(lst) == 0:
-                        return 0, 0, 0
-                    else:
-                        continue
-            lst.sort(key = itemgetter(3), reverse = True)
-            return lst[0][2], lst[0][3], lst[0][4]
+            return best_run(sweep.run([(n_clstrs, init, n_init)
+                                       for n in range(crange[3])]), n_clstrs)
         else:
-            clusters, silhouette, inertia = cluster_words_kmeans(vdf, n_clstrs)
+            clusters, silhouette, inertia = kmeans(n_clstrs)
             return clusters, silhouette, inertia
     else:  # TODO: elif algorithm == 'kmeans'
         # Check number of clusters <= word vector dimensionality
@@ -216,7 +452,7 @@ def best_clusters(vdf, **kwargs):                                       # 90104
         i = 0
         while max_clusters > crange[0]:
             try:
-                c, s, i = cluster_words_kmeans(vdf, max_clusters, init, n_init)
+                c, s, i = kmeans(max_clusters, init, n_init)
                 break
             except:
                 max_clusters -= 1
@@ -232,32 +468,33 @@ def best_clusters(vdf, **kwargs):                                       # 90104
             else:  # check min clusters, find min viable # FIXME: overkill?
                 while min_clusters < max_clusters:
                     try:
-                        c, s, i = cluster_words_kmeans(vdf, min_clusters,
-                                                       init, n_init)
+                        c, s, i = kmeans(min_clusters, init, n_init)
                         break
                     except:
                         min_clusters += 1
             lst.append((1, min_clusters, c, s, i))
             middle = int((min_clusters + max_clusters) / 2)
-            c, s, i = cluster_words_kmeans(vdf, middle, init, n_init)
+            c, s, i = kmeans(middle, init, n_init)
             lst.append((2, middle, c, s, i))
             lst.sort(key = itemgetter(3), reverse = True)
 
             ntop = 1
             while ntop < crange[2]:
                 no = lst[0][1]
-                c, s, i = cluster_words_kmeans(vdf, no, init, n_init)
-                lst.append((len(lst), no, c, s, i))
                 dn = int(round(0.6 * abs(no - lst[ntop][1]), 0))
                 if ntop > crange[2] / 2.0:
                     dn = 1
+                steps = [no]  # the best n_clusters and neighbours: one batch
                 if no > min_clusters:
-                    nm = max(no - dn, min_clusters)
-                    c, s, i = cluster_words_kmeans(vdf, nm, init, n_init)
-                    lst.append((len(lst), nm, c, s, i))
+                    steps.append(max(no - dn, min_clusters))
                 if no < max_clusters:
-                    nm = min(no + dn, max_clusters)
-                    c, s, i = cluster_words_kmeans(vdf, nm, init, n_init)
+                    steps.append(min(no + dn, max_clusters))
+                results = sweep.run([(n, init, n_init) for n in steps])
+                for nm, result in zip(steps, results):
+                    if result is None:
+                        raise ValueError('k-means failed, n_clusters = '
+                                         + str(nm))
+                    c, s, i = result
                     lst.append((len(lst), nm, c, s, i))
                 lst.sort(key = itemgetter(3), reverse = True)
                 for n, x in enumerate(lst):
@@ -274,38 +511,81 @@ def best_clusters(vdf, **kwargs):                                       # 90104
 
 
 def group_links(links, **kwargs):  # Group «ILE»                        # 90209
+    """ words with identical multisets of links (disjuncts or connectors)
+        ⇒ clusters: order-independent 128-bit hash of each word links,
+        one grouping pass, hash collisions checked and regrouped  # 261018
+    :return: DataFrame ['cluster', 'cluster_words', 'disjuncts', 'counts']
+    """
     logger = logging.getLogger(__name__ + ".group_links")
 
     thresh = kwa(1, 'min_word_count', **kwargs) - 1                     # 90209
 
-    df = links.copy()
-    df['links'] = [[x] for x in df['link']]
-    del df['link']
-    df = df.groupby('word').agg({'links': 'sum', 'count': 'sum'}).reset_index()
-    df['words'] = [[x] for x in df['word']]
-    del df['word']
-
-    if thresh > 0: df = df.loc[df['count'] > thresh]                    # 90209
-
-    df2 = df.copy().reset_index()
-    df2['links'] = df2['links'].apply(lambda x: tuple(sorted(x)))
-    df3 = df2.groupby('links')['count'].apply(sum).reset_index()
-    df4 = df2.groupby('links')['words'].apply(sum).reset_index()
-    if df4['links'].tolist() == df3['links'].tolist():
-        df4['counts'] = df3['count']
-    else:
-        logger.error("group_links: df4['counts'] != df3['count'] ERROR!")
-    df4['words'] = df4['words'].apply(lambda x: sorted(list(x)))
-    df4['links'] = df4['links'].apply(lambda x: sorted(list(x)))
-    df4 = df4[['words', 'links', 'counts']] \
-        .sort_values(by = 'words', ascending = True)
-    df4.index = range(1, len(df4) + 1)
-    df4['cluster'] = range(1, len(df4) + 1)
-    df4['cluster'] = df4['cluster'].apply(lambda x: cluster_id(x, len(df4)))
-    df4 = df4.rename(columns = {'words': 'cluster_words', 'links': 'disjuncts'})
-    df4 = df4[['cluster', 'cluster_words', 'disjuncts', 'counts']]
-
-    return df4
+    columns = ['cluster', 'cluster_words', 'disjuncts', 'counts']
+    if len(links) == 0:
+        return pd.DataFrame(columns = columns)
+    words, word_list = pd.factorize(links['word'], sort = True)
+    codes, link_list = pd.factorize(links['link'], sort = True)
+    order = np.lexsort((codes, words))
+    words, codes = words[order], codes[order]
+    starts = np.flatnonzero(np.r_[True, words[1:] != words[:-1]])
+    sizes = np.diff(np.r_[starts, len(words)])
+    totals = np.add.reduceat(links['count'].values[order], starts)
+
+    keys = np.frombuffer(np.random.RandomState(0).bytes(16 * len(link_list)),
+                         dtype = np.uint64).reshape(2, -1)
+    with np.errstate(over = 'ignore'):  # sums mod 2⁶⁴
+        h1 = np.add.reduceat(keys[0][codes], starts)
+        h2 = np.add.reduceat(keys[1][codes], starts)
+
+    kept = np.flatnonzero(totals > thresh)                              # 90209
+    if len(kept) == 0:
+        return pd.DataFrame(columns = columns)
+    groups = np.array(pd.DataFrame(
+        {'h1': h1[kept], 'h2': h2[kept], 'n': sizes[kept]})
+        .groupby(['h1', 'h2', 'n'], sort = False).ngroup())
+
+    # Collision check: each word links == links of the group first word
+    first = np.full(groups.max() + 1, len(words))
+    np.minimum.at(first, groups, kept)
+    reps = first[groups]
+    ranks = np.arange(sizes[kept].sum()) \
+        - np.repeat(np.cumsum(sizes[kept]) - sizes[kept], sizes[kept])
+    positions = np.repeat(starts[kept], sizes[kept]) + ranks
+    rep_positions = np.repeat(starts[reps], sizes[kept]) + ranks
+    mismatch = codes[positions] != codes[rep_positions]
+    if mismatch.any():  # regroup colliding groups by exact links tuples
+        bad = np.isin(groups, np.repeat(groups, sizes[kept])[mismatch])
+        logger.debug('group_links: {} hash collisions'.format(bad.sum()))
+        exact = {}
+        n_groups = groups.max() + 1
+        for i in np.flatnonzero(bad):
+            j = kept[i]
+            key = tuple(codes[starts[j]:starts[j] + sizes[j]])
+            groups[i] = exact.setdefault(key, n_groups + len(exact))
+        groups = np.unique(groups, return_inverse = True)[1]
+
+    # Clusters ordered by their (alphabetically) first words, as sorted lists
+    n_groups = groups.max() + 1
+    first = np.full(n_groups, len(kept))
+    np.minimum.at(first, groups, np.arange(len(kept)))
+    rank = np.empty(n_groups, dtype = int)
+    rank[np.argsort(first)] = np.arange(n_groups)
+    groups = rank[groups]
+    members = np.argsort(groups, kind = 'stable')
+    bounds = np.flatnonzero(np.diff(groups[members])) + 1
+    reps = kept[members[np.r_[0, bounds]]]
+
+    df = pd.DataFrame({
+        'cluster_words': [x.tolist() for x in
+                          np.split(word_list.values[kept[members]], bounds)],
+        'disjuncts': [link_list.values[codes[s:s + n]].tolist()
+                      for s, n in zip(starts[reps], sizes[reps])],
+        'counts': np.bincount(groups, weights = totals[kept],
+                              minlength = n_groups).astype(totals.dtype)})
+    df.index = range(1, len(df) + 1)
+    df['cluster'] = [cluster_id(x, len(df)) for x in df.index]
+
+    return df[columns]
 
 
 def random_clusters(links, **kwargs):
@@ -351,3 +631,8 @@ def random_clusters(links, **kwargs):
 # 90104 resolve Turtle MST LW crash: 1 cluster
 # 90209 group_links: add min_word_count to 80925 legacy version
 # 90221 kmeans defaults updated for Grammar Learner tutorial
+# 261018 KMeansSweep: k-means runs of number_of_clusters and best_clusters
+#   steps in a process pool (kwargs['workers']), seeded in tasks order
+#   (kwargs['random_seed']) ⇒ serial and parallel results are identical
+# 261018 kwargs['cluster_sweep'] = 'incremental': number_of_clusters sweep
+#   warm-started from k centroids (split_clusters), kwargs['sweep_restarts']
@@ -0,0 +1,203 @@
+# language-learning/src/grammar_learner/connectivity.py                 # 261018
+import time
+import numpy as np
+from scipy.sparse import issparse, csr_matrix
+from sklearn.metrics import pairwise_distances
+from sklearn.neighbors import NearestNeighbors, kneighbors_graph
+from sklearn.preprocessing import normalize
+
+CONNECTIVITY_METHODS = ['auto', 'exact', 'tree', 'nndescent', 'sparse']
+
+
+def knn2graph(rows, cols, n):  # neighbour pairs ⇒ connectivity csr_matrix
+    return csr_matrix((np.ones(len(rows)), (rows, cols)), shape = (n, n))
+
+
+def row_top(rows, values, k):
+    """ k largest values of each row of (rows, values) pairs
+    :return: indices of the kept pairs
+    """
+    order = np.lexsort((-values, rows))
+    rows = rows[order]
+    keep = np.arange(len(rows)) - np.searchsorted(rows, rows) < k
+    return order[keep]
+
+
+def prune_features(x, m):  # csr x ⇒ m largest |values| of each row kept
+    coo = x.tocoo()
+    top = row_top(coo.row, np.abs(coo.data), m)
+    return csr_matrix((coo.data[top], (coo.row[top], coo.col[top])),
+                      shape = x.shape)
+
+
+def sparse_cosine_knn(x, k, prune = 0, chunk = 1024):
+    """ cosine top-k neighbours of csr x rows: chunked sparse products,
+        only rows with common features are candidates ⇒ cost ~ nnz of the
+        product, not n²; prune > 0: candidates found with the `prune`
+        largest features of each row (approximate, faster)
+    :return: rows, cols -- neighbour pairs, ≤ k for each row
+    """
+    x = normalize(csr_matrix(x, dtype = np.float64))
+    y = prune_features(x, prune) if prune > 0 else x
+    yt = y.T.tocsr()
+    n = x.shape[0]
+    rows, cols = [], []
+    for start in range(0, n, chunk):
+        product = (y[start:start + chunk] @ yt).tocoo()
+        r = product.row + start
+        mask = r != product.col
+        r, c = r[mask], product.col[mask]
+        top = row_top(r, product.data[mask], k)
+        rows.append(r[top])
+        cols.append(c[top])
+    return np.concatenate(rows), np.concatenate(cols)
+
+
+def tree_knn(x, k, metric = 'euclidean'):
+    """ exact k neighbours via sklearn kd / ball tree, ~ n log n for
+        low dimensional dense x (cosine ⇒ euclidean on normalized rows)
+    :return: n × k neighbour indices
+    """
+    if metric == 'cosine':
+        x = normalize(x)
+    algorithm = 'kd_tree' if x.shape[1] <= 20 else 'ball_tree'
+    model = NearestNeighbors(n_neighbors = k + 1, algorithm = algorithm)
+    ind = model.fit(x).kneighbors(x, return_distance = False)
+    n = x.shape[0]
+    self_ = ind == np.arange(n)[:, None]
+    self_[~self_.any(axis = 1), -1] = True  # duplicates: drop the last one
+    return ind[~self_].reshape(n, k)
+
+
+def nn_descent(x, k, metric = 'euclidean', iterations = 10, delta = 0.001,
+               seed = 0, chunk = 256):
+    """ approximate k neighbours of dense x: NN-descent (Dong et al. 2011),
+        neighbours of neighbours (and reverse neighbours) refine a random
+        graph until less than delta × n × k updates or `iterations`
+    :return: n × k neighbour indices
+    """
+    x = np.asarray(x, dtype = np.float64)
+    if metric == 'cosine':
+        x = normalize(x)
+    n = x.shape[0]
+    sq = np.einsum('ij,ij->i', x, x)
+    random = np.random.RandomState(seed)
+    ids = np.arange(n)
+
+    def distances(rows, cand):
+        d = sq[rows, None] + sq[cand] \
+            - 2 * np.matmul(x[cand], x[rows][:, :, None])[:, :, 0]
+        d[cand == rows[:, None]] = np.inf
+        return d
+
+    knn = random.randint(0, n - 1, (n, k))
+    knn += knn >= ids[:, None]  # no self loops
+    for iteration in range(iterations):
+        # k reverse neighbours of each point, self if none
+        src = np.repeat(ids, k)
+        dst = knn.ravel()
+        order = random.permutation(len(dst))
+        src, dst = src[order], dst[order]
+        order = np.argsort(dst, kind = 'stable')
+        src, dst = src[order], dst[order]
+        rank = np.arange(len(dst)) - np.searchsorted(dst, dst)
+        reverse = np.repeat(ids[:, None], k, axis = 1)
+        keep = rank < k
+        reverse[dst[keep], rank[keep]] = src[keep]
+        neighbours = np.hstack([knn, reverse])
+        updated = np.empty_like(knn)
+        for start in range(0, n, chunk):
+            rows = ids[start:start + chunk]
+            cand = np.hstack([neighbours[rows], knn[neighbours[rows]]
+                              .reshape(len(rows), -1)])
+            cand.sort(axis = 1)
+            d = distances(rows, cand)
+            d[:, 1:][cand[:, 1:] == cand[:, :-1]] = np.inf  # duplicates
+            top = np.argpartition(d, k - 1, axis = 1)[:, :k]
+            updated[rows] = np.take_along_axis(cand, top, axis = 1)
+        changes = np.sum(np.sort(updated, axis = 1) != np.sort(knn, axis = 1))
+        knn = updated
+        if changes <= delta * n * k:
+            break
+    return knn
+
+
+def knn_recall(x, graph, k, metric = 'euclidean', sample_size = 100, seed = 0):
+    """ share of exact k neighbours found in graph rows of a seeded sample;
+        ties: a neighbour as close as the exact k-th one is a hit;
+        cosine: orthogonal words are not neighbours """
+    n = x.shape[0]
+    random = np.random.RandomState(seed)
+    sample = np.sort(random.choice(n, min(sample_size, n), replace = False))
+    d = pairwise_distances(x[sample], x, metric = metric)
+    d[np.arange(len(sample)), sample] = np.inf
+    if metric == 'cosine':
+        d[d > 1 - 1e-9] = np.inf
+    kth = np.partition(d, k - 1, axis = 1)[:, k - 1]
+    relevant = np.minimum(np.sum(np.isfinite(d), axis = 1), k)
+    hits = 0
+    for i, j in enumerate(sample):
+        found = d[i, graph[j].indices]
+        hits += min(np.sum(np.isfinite(found) & (found <= kth[i] + 1e-9)),
+                    relevant[i])
+    return float(hits / max(np.sum(relevant), 1))
+
+
+def connectivity_graph(cd, connectivity, log = None):
+    """ agglomerative clustering connectivity: k nearest neighbours graph
+    :param connectivity: int -- n_neighbors, legacy exact kneighbors_graph;
+        dict -- {'n_neighbors': 10, 'method': 'auto', 'metric': 'euclidean',
+        'iterations': 10, 'prune': 0, 'recall_sample': 100, 'seed': 0}:
+        'exact' -- kneighbors_graph, brute force, n²;
+        'tree' -- kd / ball tree, dense cd;
+        'nndescent' -- approximate, dense cd, 'iterations' ⇒ recall;
+        'sparse' -- cosine top-k, scipy.sparse cd, 'prune' > 0 ⇒ faster,
+                    approximate;
+        'auto' -- 'sparse' for scipy.sparse cd, 'tree' for dense cd with
+                  ≤ 50 dimensions, 'nndescent' otherwise.
+    :param log: dict updated with method, time and recall (estimated with
+        'recall_sample' rows, 0 ⇒ not estimated)
+    :return: connectivity csr_matrix
+    """
+    if type(connectivity) is int:
+        connectivity = {'n_neighbors': connectivity, 'method': 'exact',
+                        'recall_sample': 0}
+    n = cd.shape[0]
+    k = min(connectivity.get('n_neighbors', 10), n - 1)
+    method = connectivity.get('method', 'auto')
+    metric = connectivity.get('metric', 'euclidean')
+    seed = connectivity.get('seed', 0)
+    if method not in CONNECTIVITY_METHODS:
+        raise ValueError('connectivity_graph: unknown method ' + str(method))
+    if method == 'auto':
+        if issparse(cd):
+            method = 'sparse'
+        else:
+            method = 'tree' if cd.shape[1] <= 50 else 'nndescent'
+    if method == 'sparse':
+        metric = 'cosine'
+
+    start = time.time()
+    if method == 'exact':
+        graph = kneighbors_graph(cd, k, metric = metric, include_self = False)
+    elif method == 'sparse':
+        rows, cols = sparse_cosine_knn(cd, k, connectivity.get('prune', 0))
+        graph = knn2graph(rows, cols, n)
+    else:
+        x = cd.toarray() if issparse(cd) else np.asarray(cd)
+        if method == 'tree':
+            knn = tree_knn(x, k, metric)
+        else:
+            knn = nn_descent(x, k, metric,
+                             connectivity.get('iterations', 10), seed = seed)
+        graph = knn2graph(np.repeat(np.arange(n), k), knn.ravel(), n)
+    elapsed = time.time() - start
+
+    if log is not None:
+        log.update({'connectivity': method,
+                    'connectivity_time': round(elapsed, 3)})
+        sample_size = connectivity.get('recall_sample', 100)
+        if sample_size > 0:
+            log['connectivity_recall'] = round(
+                knn_recall(cd, graph, k, metric, sample_size, seed), 4)
+    return graph
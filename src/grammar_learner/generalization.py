@@ -1,74 +1,18 @@
 # language-learning/src/grammar_learner/generalization.py               # 81231
 import logging
-from copy import copy, deepcopy
+from copy import copy
 from operator import itemgetter
 from .clustering import cluster_id
 from .utl import kwa
+from .similarity_engine import SimilarityEngine, MinHashLSH
 
 
 def aggregate(categories, threshold, similarity_function, verbose = 'none'):
+    # 261018 sparse similarity engine, a single round
     logger = logging.getLogger(__name__ + ".aggregate")
-    cats = deepcopy(categories)
-    cats.pop('dj_counts', None)
-    similar_clusters = []
-    similarities = []
-    ncats = len(cats['words'])
-
-    for i, x in enumerate(cats['djs']):
-        if i == 0:
-            continue
-        if cats['parent'][i] > 0:
-            continue
-        for j in range(i + 1, ncats):
-            if cats['parent'][j] > 0:
-                continue
-            similarity = similarity_function(x, cats['djs'][j])
-            if similarity > threshold:
-                similar_clusters.append([i, j, similarity])
-            #? if similarity > aggregate and similarity < merge:
-            similarities.append(round(similarity, 2))
-
-    merges = [{x[0], x[1]} for x in similar_clusters if x[2] > threshold]
-    merged = []
-    for m, mset in enumerate(merges):
-        if m in merged:
-            continue
-        for k in range(m + 1, len(merges)):
-            if k in merged:
-                continue
-            if len(mset & merges[k]) > 0:
-                if mset | merges[k] not in merges:
-                    merges.append(mset | merges[k])
-                merged.extend([m, k])
-    merges = [x for i, x in enumerate(merges) if i not in merged]
-
-    for mset in merges:
-        new_cluster_id = len(cats['parent'])
-        cats['cluster'].append(cluster_id(new_cluster_id, new_cluster_id))
-        # TODO: check new_cluster_id > 25**n ⇒ change n_letters in _id's ?
-        cats['parent'].append(0)
-        cats['children'].append(mset)
-        cats['words'].append(set())
-        cats['disjuncts'].append(set())
-        cats['djs'].append(set())
-        cats['counts'].append(0)
-        cats['quality'].append(threshold)
-        for cluster in mset:
-            cats['parent'][cluster] = new_cluster_id
-            cats['words'][new_cluster_id].update(cats['words'][cluster])
-            cats['disjuncts'][new_cluster_id].update(cats['disjuncts'][cluster])
-            cats['djs'][new_cluster_id].update(cats['djs'][cluster])
-            cats['counts'][new_cluster_id] += cats['counts'][cluster]
-            # cats['similarities'][new_cluster_id]... TODO?
-        cats['similarities'].append(
-            [0 for word in cats['words'][new_cluster_id]])
-
-        d = {x: (i + 1) for i, x in
-             enumerate(sorted(set([x for y in cats['disjuncts'] for x in y])))}
-        cats['djs'] = [set([d[x] for x in y]) for y in cats['disjuncts']]
-        # TODO? sort by frequency?
-
-    return cats, sorted(set(similarities), reverse = True)
+    engine = SimilarityEngine(categories, similarity_function, threshold)
+    similarities = engine.aggregate(threshold)
+    return engine.categories(), similarities
 
 
 def reorder(cats):
@@ -98,8 +42,12 @@ def reorder(cats):
         if len(branchi) > 0:
             ordnung.extend(branchi)
 
+    position = {}  # 261018 ordnung.index(x), O(1)
+    for i, x in enumerate(ordnung):
+        position.setdefault(x, i)
+
     new_cats = {}
-    new_cats['parent'] = [ordnung.index(cats['parent'][i]) for i in ordnung]
+    new_cats['parent'] = [position[cats['parent'][i]] for i in ordnung]
 
     n = sum(1 for i in new_cats['parent'] if i == 0)
     new_cats['cluster'] = [cluster_id(i, n) if x == 0 else None
@@ -112,7 +60,7 @@ def reorder(cats):
 
     for i, item in enumerate(new_cats['children']):
         if type(item) is set and len(item) > 0:
-            new_cats['children'][i] = set([ordnung.index(x) for x in item])
+            new_cats['children'][i] = set([position[x] for x in item])
 
     rules = [i for i, x in enumerate(new_cats['parent'])
              if (x == 0 and i > 0)]
@@ -125,7 +73,7 @@ def reorder(cats):
             for disjunct in new_cats['disjuncts'][rule]:
                 new_dj = []
                 for index in disjunct:
-                    new_dj.append(ordnung.index(abs(index)) * sign(index))
+                    new_dj.append(position[abs(index)] * sign(index))
                 new_rule.append(tuple(new_dj))
             new_cats['disjuncts'][rule] = set(new_rule)
         else:  # 81130: prune clusters with empty dj sets  # TODO: update
@@ -198,17 +146,22 @@ def generalize_rules(categories, **kwargs):  # 80622
     verbose = kwa('none', 'verbose', **kwargs)
 
     threshold = merge_threshold  # 0.8
-    cats, similarities = aggregate(categories, threshold, jaccard, verbose)
+    # 261018 one engine for all rounds: only merged pairs updated
+    engine = SimilarityEngine(categories, jaccard,
+                              min(merge_threshold, aggr_threshold),
+                              minhash = MinHashLSH.from_kwargs(**kwargs))
+    similarities = engine.aggregate(threshold)
     sims = [x for x in similarities]  # if x < threshold]
     threshold = max(sims) - 0.01
     # TODO: delete merged clusters?
 
     z = len(similarities)
     while z > 1 and threshold > aggr_threshold:
-        cats, similarities = aggregate(cats, threshold, jaccard, verbose)
+        similarities = engine.aggregate(threshold)
         sims = [x for x in similarities if x < threshold]
         threshold = max(sims) - 0.01
         z = len(sims)
+    cats = engine.categories()
 
     # Renumber connectors in disjuncts # TODO: for all clusters?
     clusters = [i for i, x in enumerate(cats['cluster'])
@@ -217,11 +170,15 @@ def generalize_rules(categories, **kwargs):  # 80622
     sign = lambda x: (1, -1)[x < 0]
     counter = 0
 
+    roots = {}  # 261018 memoized: connector ⇒ top level ancestor
+
     def ancestor(connector, parents):
-        if parents[abs(connector)] == 0:
-            return connector
-        else:
-            return ancestor(parents[abs(connector)], parents)
+        if connector not in roots:
+            if parents[abs(connector)] == 0:
+                roots[connector] = connector
+            else:
+                roots[connector] = ancestor(parents[abs(connector)], parents)
+        return roots[connector]
 
     for cluster in clusters:
         new_rule = []
@@ -232,8 +189,8 @@ def generalize_rules(categories, **kwargs):  # 80622
             new_rule.append(tuple(new_dj))
         cats['disjuncts'][cluster] = set(new_rule)
 
-    return reorder(cats), \
-           {'similarity_thresholds': sims, 'updated_disjuncts': counter}
+    return reorder(cats), dict({'similarity_thresholds': sims,
+                                'updated_disjuncts': counter}, **engine.log)
 
 
 def renumber(cats):  # 81121
@@ -242,11 +199,15 @@ def renumber(cats):  # 81121
                 if i > 0 and x is not None]
     sign = lambda x: (1, -1)[x < 0]
 
+    roots = {}  # 261018 memoized: connector ⇒ top level ancestor
+
     def ancestor(connector, parents):
-        if parents[abs(connector)] == 0:
-            return connector
-        else:
-            return ancestor(parents[abs(connector)], parents)
+        if connector not in roots:
+            if parents[abs(connector)] == 0:
+                roots[connector] = connector
+            else:
+                roots[connector] = ancestor(parents[abs(connector)], parents)
+        return roots[connector]
 
     for cluster in clusters:
         new_rule = []
@@ -269,17 +230,21 @@ def generalise_rules(categories, **kwargs):  # 81121
 
     if generalisation == 'hierarchical':  # updated 'jaccard' legacy
         threshold = merge_threshold  # 0.8
-        cats, similarities = aggregate(categories, threshold, jaccard, verbose)
+        engine = SimilarityEngine(categories, jaccard,                  # 261018
+                                  min(merge_threshold, aggr_threshold),
+                                  minhash = MinHashLSH.from_kwargs(**kwargs))
+        similarities = engine.aggregate(threshold)
         sims = [x for x in similarities]  # if x < threshold]
         threshold = max(sims) - 0.01
         # TODO: delete merged clusters?
         z = len(similarities)
         while z > 1 and threshold > aggr_threshold:
-            cats, similarities = aggregate(cats, threshold, jaccard, verbose)
-            cats = renumber(cats)
+            similarities = engine.aggregate(threshold)
+            engine.update(renumber)
             sims = [x for x in similarities if x < threshold]
             threshold = max(sims) - 0.01  # step-by-step hierarchy construction
             z = len(sims)
+        cats = engine.categories()
 
     else:  # 81120 1-step jaccard-based, iterate after dj connectors update
         threshold = aggr_threshold
@@ -294,77 +259,19 @@ def generalise_rules(categories, **kwargs):  # 81121
             dn = n_clusters - n_cats
             n_clusters = n_cats
 
-    return reorder(cats), {'rules_generalization': 'hierarchical'}
+    log = {'rules_generalization': 'hierarchical'}
+    if generalisation == 'hierarchical':
+        log.update(engine.log)
+    return reorder(cats), log
 
 
 def agglomerate(categories, threshold, similarity_function, verbose = 'none'):
+    # 261018 sparse similarity engine, a single round, 'top' updated
     logger = logging.getLogger(__name__ + ".agglomerate")
-    cats = deepcopy(categories)
-    cats.pop('dj_counts', None)  # 81101 TODO: list ⇒ dict? restructure cats?
-    cats.update({'top': deepcopy(cats['parent'])})  # 81123
-
-    similarities = []
-    similar_clusters = []
-    ncats = len(cats['words'])
-    for i, x in enumerate(cats['djs']):
-        if i == 0:
-            continue
-        if cats['parent'][i] > 0:
-            continue
-        # if cats['top'][i] > 0: continue
-        for j in range(i + 1, ncats):
-            if cats['parent'][j] > 0:
-                continue
-            # if cats['top'][j] > 0: continue
-            similarity = similarity_function(x, cats['djs'][j])
-            if similarity > threshold:
-                similar_clusters.append([i, j, similarity])
-            # if similarity > aggregate and similarity < merge:
-            similarities.append(round(similarity, 2))
-
-    merged = []
-    merges = [{x[0], x[1]} for x in similar_clusters if x[2] > threshold]
-    for m, mset in enumerate(merges):
-        if m in merged:
-            continue
-        for k in range(m + 1, len(merges)):
-            if k in merged:
-                continue
-            if len(mset & merges[k]) > 0:
-                if mset | merges[k] not in merges:
-                    merges.append(mset | merges[k])
-                merged.extend([m, k])
-    merges = [x for i, x in enumerate(merges) if i not in merged]
-    for mset in merges:
-        new_cluster_id = len(cats['parent'])
-        # new_cluster_id = len(cats['top'])  # TODO?
-        # cats['cluster'].append(cluster_id(new_cluster_id, new_cluster_id))
-        cats['cluster'].append(None)  # 81123
-        cats['top'].append(0)  # 81123
-        cats['parent'].append(0)  # TODO? append(None) & use top?
-        cats['children'].append(mset)
-        cats['words'].append(set())
-        cats['disjuncts'].append(set())
-        cats['djs'].append(set())
-        cats['counts'].append(0)
-        cats['quality'].append(threshold)
-
-        for cluster in mset:
-            cats['top'][cluster] = new_cluster_id  # 81123
-            cats['parent'][cluster] = new_cluster_id  # TODO: don't change
-            cats['words'][new_cluster_id].update(cats['words'][cluster])
-            cats['disjuncts'][new_cluster_id].update(cats['disjuncts'][cluster])
-            cats['djs'][new_cluster_id].update(cats['djs'][cluster])
-            cats['counts'][new_cluster_id] += cats['counts'][cluster]
-            # cats['similarities'][new_cluster_id]... TODO?
-        cats['similarities'].append(
-            [0 for word in cats['words'][new_cluster_id]])
-
-        d = {x: (i + 1) for i, x in
-             enumerate(sorted(set([x for y in cats['disjuncts'] for x in y])))}
-        cats['djs'] = [set([d[x] for x in y]) for y in cats['disjuncts']]
-
-    return cats, sorted(set(similarities), reverse = True)
+    engine = SimilarityEngine(categories, similarity_function, threshold,
+                              top = True)
+    similarities = engine.aggregate(threshold)
+    return engine.categories(), similarities
 
 
 def add_upper_level(categories, **kwargs):
@@ -382,7 +289,10 @@ def add_upper_level(categories, **kwargs):
     else:
         threshold = 0.8
 
-    cats, similarities = agglomerate(categories, threshold, jaccard, verbose)
+    engine = SimilarityEngine(categories, jaccard,                      # 261018
+                              min(threshold, group_threshold), top = True,
+                              minhash = MinHashLSH.from_kwargs(**kwargs))
+    similarities = engine.aggregate(threshold)
     sims = [x for x in similarities]  # if x < threshold]
 
     if len(sims) > 0:
@@ -394,7 +304,7 @@ def add_upper_level(categories, **kwargs):
 
     z = len(similarities)
     while z > 0 and threshold > group_threshold:
-        cats, similarities = agglomerate(cats, threshold, jaccard, verbose)
+        similarities = engine.aggregate(threshold)
         sims = [x for x in similarities if x < threshold]
         z = len(sims)
         if z > 0:
@@ -402,7 +312,8 @@ def add_upper_level(categories, **kwargs):
         else:
             threshold = 0.0
 
-    return cats, {'category tree': 'v.2018-12-12'}
+    return engine.categories(), dict({'category tree': 'v.2018-12-12'},
+                                     **engine.log)
 
 # Notes:
 
@@ -1,9 +1,10 @@
 # language-learning/src/grammar_inducer.py                              # 81207
 import logging
-from copy import deepcopy
+import numpy as np
 from collections import Counter
 from typing import List, Tuple
 from .utl import UTC, kwa
+from .category_store import CategoryStore, snapshot
 
 
 def add_disjuncts(cats, links, **kwargs):
@@ -14,7 +15,7 @@ def add_disjuncts(cats, links, **kwargs):
     max_disjuncts = kwa(100000, 'max_disjuncts', **kwargs)
     verbose = kwa('none', 'verbose', **kwargs)
 
-    fat_cats = deepcopy(cats)
+    fat_cats = snapshot(cats)                                           # 261018
     top_clusters = [i for i, x in enumerate(cats['cluster']) if
                     i > 0 and x is not None]
     word_clusters = dict()
@@ -22,16 +23,14 @@ def add_disjuncts(cats, links, **kwargs):
         for word in cats['words'][i]:
             word_clusters[word] = i
 
-    df = links.copy()
-    df['cluster'] = df['word'].apply(
-        lambda x: word_clusters[x] if x in word_clusters else 0)
-    cdf = df.groupby('cluster').sum().reset_index()
-    cdf = cdf.loc[cdf['cluster'] > 0]
-    fat_cats['counts'] = [0] + cdf['count'].tolist()
+    # 261018 vectorised: a single (cluster, link) groupby, clusters split
+    # from the sorted table instead of a cdf.loc[cluster] scan per cluster
+    df = links[['word', 'link', 'count']].copy()
+    df['cluster'] = df['word'].map(word_clusters).fillna(0).astype(int)
+    cdf = df.groupby('cluster')['count'].sum()
+    fat_cats['counts'] = [0] + cdf[cdf.index > 0].tolist()
 
-    fat_cats['disjuncts'] = [[]]
-    fat_cats['dj_counts'] = [[]]
-    cdf = df.groupby(['cluster', 'link'], as_index = False).sum() \
+    cdf = df.groupby(['cluster', 'link'], as_index = False)['count'].sum() \
         .sort_values(by = ['cluster', 'count'], ascending = [True, False])
 
     # TODO?: dj_counts = Counter()
@@ -40,22 +39,24 @@ def add_disjuncts(cats, links, **kwargs):
     # ~ dj_counts[tuple(dj)] += categories['dj_counts'][cluster][i]
     # top_djs = set([x[0] for x in dj_counts.most_common(max_disjuncts)])
 
-    for cluster in top_clusters:
-        ccdf = cdf.loc[cdf['cluster'] == cluster]
-        fat_cats['disjuncts'].append(ccdf['link'].tolist())
-        fat_cats['dj_counts'].append(ccdf['count'].tolist())
-
-    fat_cats['djs'] = [[]]
-    ldf = df[['link', 'count']].copy().groupby('link').sum().sort_values(
+    ldf = df[['link', 'count']].groupby('link').sum().sort_values(
         by = 'count', ascending = False).reset_index()
     djdict = {x: i for i, x in enumerate(ldf['link'].tolist())}
-    df.drop(['word'], axis = 1, inplace = True)
-    df['dj'] = df['link'].apply(lambda x: djdict[x])
-    cdf = df.groupby(['cluster', 'dj'], as_index = False).sum().sort_values(
-        by = ['cluster', 'dj'], ascending = [True, True])
-    for cluster in top_clusters:
-        ccdf = cdf.loc[cdf['cluster'] == cluster]
-        fat_cats['djs'].append(ccdf['dj'].tolist())
+    cdf['dj'] = cdf['link'].map(djdict)
+
+    clusters = cdf['cluster'].values
+    bounds = zip(np.searchsorted(clusters, top_clusters, side = 'left'),
+                 np.searchsorted(clusters, top_clusters, side = 'right'))
+    disjuncts = cdf['link'].tolist()
+    dj_counts = cdf['count'].tolist()
+    djs = cdf['dj'].values
+    fat_cats['disjuncts'] = [[]]
+    fat_cats['dj_counts'] = [[]]
+    fat_cats['djs'] = [[]]
+    for i, j in bounds:
+        fat_cats['disjuncts'].append(disjuncts[i:j])
+        fat_cats['dj_counts'].append(dj_counts[i:j])
+        fat_cats['djs'].append(np.sort(djs[i:j]).tolist())
 
     return fat_cats
 
@@ -89,14 +90,13 @@ def induce_grammar(categories, **kwargs):
     max_disjuncts = kwa(100000, 'max_disjuncts', **kwargs)
     verbose = kwa('none', 'verbose', **kwargs)
 
-    rules = deepcopy(categories)
+    rules = snapshot(categories)                                        # 261018
+    store = CategoryStore.from_dict({'cluster': categories['cluster'],
+                                     'words': categories['words']})
     dj_counts = Counter()
     clusters = [i for i, x in enumerate(rules['cluster'])
                 if i > 0 and x is not None]
-    word_clusters = dict()
-    for i in clusters:
-        for word in rules['words'][i]:
-            word_clusters[word] = i
+    word_clusters = store.word_clusters(clusters)
     disjuncts = {}
 
     for cluster in clusters:
@@ -134,7 +134,7 @@ def induce_grammar(categories, **kwargs):
         # rules['disjuncts'][cluster] = top_djs & rules['disjuncts'][cluster]
         # - blocked 81205 -- might create rule without disjuncts ⇒ LG error
         # FIXME: add only rules with checked len(disjuncts) > 0
-        i = rules['cluster'].index(cluster)
+        i = store.index(cluster)
         djs = top_djs & rules['disjuncts'][i]
         if len(djs) > 0: rules['disjuncts'][i] = djs
         else:  # TODO: pop rules[...][i]
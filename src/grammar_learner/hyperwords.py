@@ -1,12 +1,16 @@
 ## Unstructured mess of files from 2017 - TODO: restore the file structure?
 from __future__ import division
 import logging
+import os
 import time
+import tracemalloc
 import numpy as np
 import pandas as pd
 #-from collections import Counter
-from scipy.sparse import dok_matrix, csr_matrix
+from scipy.sparse import dok_matrix, csr_matrix, coo_matrix
+from scipy.sparse.linalg import svds
 from sparsesvd import sparsesvd
+from sklearn.utils.extmath import randomized_svd
 import matplotlib.pyplot as plt
 
 '''links => PMI'''
@@ -181,287 +185,238 @@ def list2tsv(lst, path):
         for item in lst: f.write(item + '\n')
     return {'saved_items': len(lst)}
 
-def links2vec(links,out_path,tmp_path,dim=100,cds=1.0,eig=0.5,verbose='none'):
-    logger = logging.getLogger(__name__ + ".links2vec")
-    #80204: Language Learning - Clustering pipeline January 2018.ipynb
-    '''links => PMI'''
-    #-cds = 1.0  # cds = float(args['--cds']) # Context distribution smoothing [default: 1.0]
-    pmi_path = tmp_path + 'pmi'
-    start = time.time()
-    #-linkz = links.loc[(links['count'] > 2)]
-    linkz = links
-    words = linkz.groupby('word').sum().reset_index() \
-        .sort_values(by=['count','word'], ascending=[False,True])
-    contexts = linkz.groupby('link').sum().reset_index() \
-        .sort_values(by=['count','link'], ascending=[False,True])
-    # if verbose in ['max','debug']:
-    #     print('Linkz:', len(linkz), 'items')
-    #     with pd.option_context('display.max_rows', 6): print(linkz)
-    #     print('words:', len(words), 'items')
-    #     with pd.option_context('display.max_rows', 6): print(words,'\n')
-    #     print('contexts:', len(contexts), 'items')
-    #     with pd.option_context('display.max_rows', 6): print(contexts)
-    logger.info(f'Linkz: {len(linkz)} items')
-    with pd.option_context('display.max_rows', 6): logger.info(f"{linkz}")
-    logger.info(f'words: {len(words)} items')
-    with pd.option_context('display.max_rows', 6): logger.info(f'{words}\n')
-    logger.info(f'contexts: {len(contexts)} items')
-    with pd.option_context('display.max_rows', 6): logger.info(f"{contexts}")
-
-    iw = sorted(words['word'].drop_duplicates().values.tolist())
-    ic = sorted(contexts['link'].drop_duplicates().values.tolist())
-    wi = dict([(w, i) for i, w in enumerate(iw)])
-    ci = dict([(c, i) for i, c in enumerate(ic)])
-    counts = csr_matrix((len(wi), len(ci)), dtype=np.float32)
-    tmp_counts = dok_matrix((len(wi), len(ci)), dtype=np.float32)
-    update_threshold = 100000   # ~ batch size
-    i = 0
-    for row in linkz.itertuples():
-        if row.word in wi and row.link in ci:
-            tmp_counts[wi[row.word], ci[row.link]] = int(row.count)
-        i += 1
-        if i == update_threshold:
-            counts = counts + tmp_counts.tocsr()
-            tmp_counts = dok_matrix((len(wi), len(ci)), dtype=np.float32)
-            i = 0
-    counts = counts + tmp_counts.tocsr()
-    list2tsv(iw, pmi_path + '.words.vocab')     # any need to save?
-    list2tsv(ic, pmi_path + '.contexts.vocab')
-    # if verbose in ['max','debug']: print('PMI data saved to', pmi_path)
-    logger.info(f'PMI data saved to {pmi_path}')
-
-    pmi = calc_pmi(counts, cds)
-    np.savez_compressed(pmi_path, \
-        data=pmi.data, indices=pmi.indices, indptr=pmi.indptr, shape=pmi.shape)
-    # if verbose in ['max','debug']:
-    #   print('PMI matrix', type(pmi), pmi.shape, '\nsaved to', pmi_path)
-    logger.info(f'PMI matrix {type(pmi)}, {pmi.shape}\nsaved to {pmi_path}')
-
-    '''PMI => SVD'''
-    svd_path = pmi_path[:-3] + 'svd'
-    neg = 1     # int(args['--neg'])  Number of negative samples;
-                # [default: 1]        subtracts its log from PMI
-    # if verbose in ['max','debug']:
-    #   print('SVD started: dim', dim, ', output:', svd_path+'...')
-    logger.info(f'SVD started: dim {dim}, output: {svd_path}...')
-
-    explicit = PositiveExplicit(pmi_path, normalize=False, neg=neg)
-    ut, s, vt = sparsesvd(explicit.m.tocsc(), dim)
-    np.save(svd_path + '.ut.npy', ut)
-    np.save(svd_path + '.s.npy', s)
-    np.save(svd_path + '.vt.npy', vt)
-    list2tsv(explicit.iw, svd_path + '.words.vocab')  # any need to save?
-    list2tsv(explicit.ic, svd_path + '.contexts.vocab')
-    # if verbose in ['max','debug']:
-    #     print('SVD matrix (3 files .npy) saved:', len(ut[0]), 'vectors, ', \
-    #         'ut:', len(ut), 's:', len(s), 'vt:', len(vt))
-    logger.info(f'SVD matrix (3 files .npy) saved: {len(ut[0])} vectors, ut: {len(ut)}, s: {len(s)}, vt: {len(vt)}')
-
-    '''SVD => vectors.txt'''
-    out_file = out_path + 'vectors.txt'
-    svd = SVDEmbedding(svd_path, True, eig)
+def links2counts(links):                                                # 261018
+    """ links DataFrame ⇒ (counts, iw, ic): word-link counts csr_matrix built
+        in a single coo_matrix call, sorted words and links vocabularies """
+    words, iw = pd.factorize(links['word'], sort=True)
+    contexts, ic = pd.factorize(links['link'], sort=True)
+    counts = coo_matrix((links['count'].values.astype(np.float64),
+                         (words, contexts)), shape=(len(iw), len(ic)))
+    return counts.tocsr(), list(iw), list(ic)
+
+def calc_ppmi(counts, cds=1.0, neg=1):                                  # 261018
+    # calc_pmi + PositiveExplicit: log(e^PMI) - log(neg), negative values ⇒ 0
+    coo = csr_matrix(counts).tocoo()
+    sum_w = np.asarray(coo.sum(axis=1)).ravel()
+    sum_c = np.asarray(coo.sum(axis=0)).ravel()
+    if cds != 1: sum_c = sum_c ** cds
+    sum_total = sum_c.sum()
+    nz = coo.data > 0
+    row, col = coo.row[nz], coo.col[nz]
+    data = np.log(coo.data[nz] * sum_total / (sum_w[row] * sum_c[col]))
+    if neg != 1: data -= np.log(neg)
+    data[data < 0] = 0
+    ppmi = csr_matrix((data, (row, col)), shape=coo.shape)
+    ppmi.eliminate_zeros()
+    return ppmi
+
+def svd_vectors(ut, s, eig=0.5):  # SVDEmbedding(normalize=True) in RAM # 261018
+    if eig == 0.0:   m = ut.T
+    elif eig == 1.0: m = s * ut.T
+    else:            m = np.power(s, eig) * ut.T
+    norm = np.sqrt(np.sum(m * m, axis=1))
+    return m / norm[:, np.newaxis]
+
+def vectors2df(iw, m):  # ⇒ DataFrame(columns=['word', 1, 2, ... dim])
+    vdf = pd.DataFrame(m, columns=list(range(1, m.shape[1] + 1)))
+    vdf.insert(0, 'word', iw)
+    return vdf
+
+def save_vectors(iw, m, path):
+    out_file = path + '/vectors.txt'
     with open(out_file, 'w') as file:
-        for i, w in enumerate(svd.iw):
-            file.write(w+' '+(' '.join([str(x) for x in svd.m[i]]))+'\n')
-    readme_path = out_path + 'vectors_readme.txt'
-    readme = 'Word vectors: dimension '+str(dim)+', '+str(len(svd.iw))+' vectors'
+        for i, w in enumerate(iw):
+            file.write(w+' '+(' '.join([str(x) for x in m[i]]))+'\n')
+    readme_path = path + '/vectors_readme.txt'
+    readme = 'Word vectors: dimension '+str(m.shape[1])+', '+str(len(iw))+' vectors'
     with open(readme_path, 'w') as f: f.write(readme)
-    # if verbose != 'none':
-    #     print('vectors saved to\n', out_file, \
-    #         '- elapsed', int(round(time.time() - start, 0)), 's ~', \
-    #       round((time.time() - start)/len(ut[0])*1000, 3), 'ms/vector')
-    logger.warning(f'vectors saved to\n {out_file} - elapsed {int(round(time.time() - start, 0))} s ~ '
-                   f'{round((time.time() - start)/len(ut[0])*1000, 3)} ms/vector')
-
-    response = {'vectors_file': out_file}
-    return response
+    return out_file
 
-def epmisvd(links,path,tmpath,dim=100,cds=1.0,eig=0.5,neg=1,verbose='none'):
-    logger = logging.getLogger(__name__ + ".epmisvd")
-    # cds = 1.0 # context distribution smoothing [default: 1.0]
-    # eig = 0.5 # weighted exponent of the eigenvalue matrix [default: 0.5]
-    # neg = 1   # Number of negative samples; [default: 1] subtracts its log from PMI
-                # PMI => SVD PositiveExplicit parameter
-    '''links => PMI'''
-    pmi_path = tmpath + 'pmi'
-    start = time.time()
-    #-linkz = links.loc[(links['count'] > 2)]
-    linkz = links
-    words = linkz.groupby('word').sum().reset_index()\
-        .sort_values(by=['count','word'], ascending=[False,True])
-    contexts = linkz.groupby('link').sum().reset_index()\
-        .sort_values(by=['count','link'], ascending=[False,True])
-    # if verbose in ['max','debug']:
-    #     print('Linkz:', len(linkz), 'items')
-    #     with pd.option_context('display.max_rows', 6): print(linkz)
-    #     print('words:', len(words), 'items')
-    #     with pd.option_context('display.max_rows', 6): print(words,'\n')
-    #     print('contexts:', len(contexts), 'items')
-    #     with pd.option_context('display.max_rows', 6): print(contexts)
-    logger.info(f'Linkz: {len(linkz)} items')
-    with pd.option_context('display.max_rows', 6): logger.info(f'{linkz}')
-    logger.info(f'words: {len(words)} items')
-    with pd.option_context('display.max_rows', 6): logger.info(f'{words}\n')
-    logger.info(f'contexts: {len(contexts)} items')
-    with pd.option_context('display.max_rows', 6): logger.info(f'{contexts}')
-
-    iw = sorted(words['word'].drop_duplicates().values.tolist())
-    ic = sorted(contexts['link'].drop_duplicates().values.tolist())
-    wi = dict([(w, i) for i, w in enumerate(iw)])
-    ci = dict([(c, i) for i, c in enumerate(ic)])
-    counts = csr_matrix((len(wi), len(ci)), dtype=np.float32)
-    tmp_counts = dok_matrix((len(wi), len(ci)), dtype=np.float32)
-    update_threshold = 100000   # ~ batch size
-    i = 0
-    for row in linkz.itertuples():
-        if row.word in wi and row.link in ci:
-            tmp_counts[wi[row.word], ci[row.link]] = int(row.count)
-        i += 1
-        if i == update_threshold:
-            counts = counts + tmp_counts.tocsr()
-            tmp_counts = dok_matrix((len(wi), len(ci)), dtype=np.float32)
-            i = 0
-    counts = counts + tmp_counts.tocsr()
-    list2tsv(iw, pmi_path + '.words.vocab')  # any need to save?
-    list2tsv(ic, pmi_path + '.contexts.vocab')
-    # if verbose in ['max','debug']: print('PMI data saved to', pmi_path)
-    logger.info('PMI data saved to' + pmi_path)
-
-    '''counts + vocab => pmi'''
-    pmi = calc_pmi(counts, cds)
+def save_pmisvd(tmpath, iw, ic, ppmi, ut, s, vt):  # debug / export files
+    # pmi.npz: e^PPMI -- readable with PositiveExplicit, svd.*: SVDEmbedding
+    pmi_path = tmpath + '/pmi'
+    svd_path = tmpath + '/svd'
+    pmi = ppmi.copy()
+    pmi.data = np.exp(pmi.data)
     np.savez_compressed(pmi_path, \
         data=pmi.data, indices=pmi.indices, indptr=pmi.indptr, shape=pmi.shape)
-    # if verbose in ['max','debug']:
-    #   print('PMI matrix', type(pmi), pmi.shape, '\nsaved to', pmi_path)
-    logger.info(f'PMI matrix {type(pmi)} {pmi.shape}\nsaved to {pmi_path}')
-
-    '''PMI => SVD'''
-    svd_path = pmi_path[:-3] + 'svd'
-    # if verbose in ['max','debug']:
-    #     print('SVD started: dim', dim, ', output:', svd_path+'...')
-    logger.info(f'SVD started: dim {dim}, output: {svd_path}...')
-
-    explicit = PositiveExplicit(pmi_path, normalize=False, neg=neg)
-    #print('explicit.m:', explicit.m)
-    ut, s, vt = sparsesvd(explicit.m.tocsc(), dim)
+    list2tsv(iw, pmi_path + '.words.vocab')
+    list2tsv(ic, pmi_path + '.contexts.vocab')
     np.save(svd_path + '.ut.npy', ut)
     np.save(svd_path + '.s.npy', s)
     np.save(svd_path + '.vt.npy', vt)
-    list2tsv(explicit.iw, svd_path + '.words.vocab')  # any need to save?
-    list2tsv(explicit.ic, svd_path + '.contexts.vocab')
-    # if verbose in ['max','debug']:
-    #     print('SVD matrix (3 files .npy) saved:', len(ut[0]), 'vectors, ', \
-    #           'ut:', len(ut), 's:', len(s), 'vt:', len(vt))
-    logger.info(f'SVD matrix (3 files .npy) saved: {len(ut[0])} vectors, ut: {len(ut)} s: {len(s)} vt:{len(vt)}')
-
-    '''SVD => vectors.txt'''
-    svd = SVDEmbedding(svd_path, True, eig)   # TODO: move code here, RAM2RAM
-    if len(svd.m[0]) < dim: dim = len(svd.m[0])   # 80216
-    vectors_df = pd.DataFrame(columns=['word'] + list(range(1,dim+1)))
-    for i, w in enumerate(svd.iw):
-        vectors_df.loc[i] = [w] + svd.m[i].tolist()
-    out_file = path + 'vectors.txt'
-    with open(out_file, 'w') as file:
-        for i, w in enumerate(svd.iw):
-            file.write(w+' '+(' '.join([str(x) for x in svd.m[i]]))+'\n')
-    readme_path = path + 'vectors_readme.txt'
-    readme = 'Word vectors: dimension '+str(dim)+', '+str(len(svd.iw))+' vectors'
-    with open(readme_path, 'w') as f: f.write(readme)
-    # if verbose in ['max','debug']:
-    #     print('vectors saved to\n', out_file, \
-    #         '- elapsed', int(round(time.time() - start, 0)), 's ~', \
-    #       round((time.time() - start)/len(ut[0])*1000, 3), 'ms/vector')
-    logger.info(f'vectors saved to\n {out_file} - elapsed {int(round(time.time() - start, 0))} s ~ '
-                f'{round((time.time() - start)/len(ut[0])*1000, 3)} ms/vector')
+    list2tsv(iw, svd_path + '.words.vocab')
+    list2tsv(ic, svd_path + '.contexts.vocab')
+
+SVD_BACKENDS = ['sparsesvd', 'randomized', 'arpack']                   # 261018
+
+def truncated_svd(m, dim=100, backend='sparsesvd', seed=0):             # 261018
+    """ top dim singular triplets of a sparse matrix, sparsesvd output format
+    :param backend: 'sparsesvd' -- SVDLIBC (default, legacy),
+                    'randomized' -- sklearn randomized_svd,
+                    'arpack' -- scipy.sparse.linalg.svds
+    :param seed:    random state of 'randomized' and 'arpack' start vector
+    :return:        (ut, s, vt), s in descending order
+    """
+    if backend == 'randomized':
+        k = min(dim, min(m.shape))
+        u, s, vt = randomized_svd(m, k, random_state=seed)
+        return u.T, s, vt
+    elif backend == 'arpack':
+        k = min(dim, min(m.shape) - 1)  # svds: k < min(m.shape)
+        v0 = np.random.RandomState(seed).uniform(-1, 1, min(m.shape))
+        u, s, vt = svds(m.astype(np.float64), k, v0=v0)
+        order = np.argsort(s)[::-1]
+        return u[:, order].T, s[order], vt[order]
+    elif backend == 'sparsesvd':
+        return sparsesvd(m.tocsc(), dim)
+    else:
+        raise ValueError(f'truncated_svd: unknown backend {backend}, '
+                         f'use one of {SVD_BACKENDS}')
+
+svd_cache = {}  # last PPMI SVD: key » (dim, iw, ic, ppmi, ut, s, vt) # 261018
+
+def svd_factors(links, dim=100, cds=1.0, neg=1, backend='sparsesvd',
+                seed=0):                                                # 261018
+    """ links ⇒ PPMI ⇒ SVD factors, cached in RAM: the same links with the
+        same or smaller dim ⇒ truncated factors of the last decomposition
+    :return: (iw, ic, ppmi, ut, s, vt)
+    """
+    key = (int(pd.util.hash_pandas_object(links[['word', 'link', 'count']],
+                                          index=False).sum()),
+           len(links), cds, neg, backend, seed)
+    if key in svd_cache and svd_cache[key][0] >= dim:
+        k, iw, ic, ppmi, ut, s, vt = svd_cache[key]
+        return iw, ic, ppmi, ut[:dim], s[:dim], vt[:dim]
+    counts, iw, ic = links2counts(links)
+    ppmi = calc_ppmi(counts, cds, neg)
+    ut, s, vt = truncated_svd(ppmi, dim, backend, seed)
+    svd_cache.clear()
+    svd_cache[key] = (dim, iw, ic, ppmi, ut, s, vt)
+    return iw, ic, ppmi, ut, s, vt
 
-    response = {'vectors_file': out_file}
-    return vectors_df, response
+def links2vec(links,out_path,tmp_path,dim=100,cds=1.0,eig=0.5,verbose='none'):
+    #80204: Language Learning - Clustering pipeline January 2018.ipynb
+    vdf, sv, response = pmisvd(links, out_path, tmp_path, dim, cds, eig,
+                               verbose=verbose, export=True)        # 261018
+    return response
+
+def epmisvd(links,path,tmpath,dim=100,cds=1.0,eig=0.5,neg=1,verbose='none'):
+    vdf, sv, response = pmisvd(links, path, tmpath, dim, cds, eig, neg,
+                               verbose, export=True)                # 261018
+    return vdf, response
 
 
-def pmisvd(links,path,tmpath, dim=100, cds=1.0, eig=0.5, neg=1, verbose='none'):
+def pmisvd(links, path, tmpath, dim=100, cds=1.0, eig=0.5, neg=1,
+           verbose='none', export=False, backend='sparsesvd', seed=0):
     logger = logging.getLogger(__name__ + ".pmisvd")
     '''80223 epmisvd enhanced: return +singular values'''
     # path - dir to save vectors.txt and readme
-    # path - dir to save temporary files
+    # tmpath - dir to save temporary files
     # cds = 1.0 # context distribution smoothing [default: 1.0]
     # eig = 0.5 # weighted exponent of the eigenvalue matrix [default: 0.5]
     # neg = 1   # Number of negative samples; [default: 1] subtracts its log from PMI
                 # PMI => SVD PositiveExplicit parameter
+    # export = False: RAM only; True: save PMI, SVD and vectors files  # 261018
+    # backend, seed: truncated_svd options
     if tmpath[-1] == '/': tmpath = tmpath[:-1]
     if path[-1] == '/': path = path[:-1]
-
-    '''links => PMI'''
-    pmi_path = tmpath + '/pmi'
     start = time.time()
-    #-linkz = links.loc[(links['count'] > 2)]
-    linkz = links
-    words = linkz.groupby('word').sum().reset_index()\
-        .sort_values(by=['count','word'], ascending=[False,True])
-    contexts = linkz.groupby('link').sum().reset_index()\
-        .sort_values(by=['count','link'], ascending=[False,True])
-
-    iw = sorted(words['word'].drop_duplicates().values.tolist())
-    ic = sorted(contexts['link'].drop_duplicates().values.tolist())
-    wi = dict([(w, i) for i, w in enumerate(iw)])
-    ci = dict([(c, i) for i, c in enumerate(ic)])
-    counts = csr_matrix((len(wi), len(ci)), dtype=np.float32)
-    tmp_counts = dok_matrix((len(wi), len(ci)), dtype=np.float32)
-    update_threshold = 100000   # ~ batch size
-    i = 0
-    for row in linkz.itertuples():
-        if row.word in wi and row.link in ci:
-            tmp_counts[wi[row.word], ci[row.link]] = int(row.count)
-        i += 1
-        if i == update_threshold:
-            counts = counts + tmp_counts.tocsr()
-            tmp_counts = dok_matrix((len(wi), len(ci)), dtype=np.float32)
-            i = 0
-    counts = counts + tmp_counts.tocsr()
-    list2tsv(iw, pmi_path + '.words.vocab')  # any need to save?
-    list2tsv(ic, pmi_path + '.contexts.vocab')
 
-    '''counts + vocab => pmi'''
-    pmi = calc_pmi(counts, cds)
-    np.savez_compressed(pmi_path, \
-        data=pmi.data, indices=pmi.indices, indptr=pmi.indptr, shape=pmi.shape)
+    '''links => PMI => SVD'''
+    iw, ic, ppmi, ut, s, vt = svd_factors(links, dim, cds, neg, backend, seed)
+    logger.info(f'PPMI matrix {ppmi.shape}, {ppmi.nnz} non-zero values')
 
-    '''PMI => SVD'''
-    svd_path = pmi_path[:-3] + 'svd'
-    explicit = PositiveExplicit(pmi_path, normalize=False, neg=neg)
-    ut, s, vt = sparsesvd(explicit.m.tocsc(), dim)
-    np.save(svd_path + '.ut.npy', ut)
-    np.save(svd_path + '.s.npy', s)
-    np.save(svd_path + '.vt.npy', vt)
-    list2tsv(explicit.iw, svd_path + '.words.vocab')  # any need to save?
-    list2tsv(explicit.ic, svd_path + '.contexts.vocab')
-
-    '''SVD => vectors.txt'''
-    svd = SVDEmbedding(svd_path, True, eig)   # TODO: move code here, RAM2RAM
-    if len(svd.m[0]) < dim: dim = len(svd.m[0])   # 80216
-    vectors_df = pd.DataFrame(columns=['word'] + list(range(1,dim+1)))
-    for i, w in enumerate(svd.iw):
-        vectors_df.loc[i] = [w] + svd.m[i].tolist()
-    out_file = path + '/vectors.txt'
-    with open(out_file, 'w') as file:
-        for i, w in enumerate(svd.iw):
-            file.write(w+' '+(' '.join([str(x) for x in svd.m[i]]))+'\n')
-    readme_path = path + '/vectors_readme.txt'
-    readme = 'Word vectors: dimension '+str(dim)+', '+str(len(svd.iw))+' vectors'
-    with open(readme_path, 'w') as f: f.write(readme)
+    '''SVD => vectors'''
+    m = svd_vectors(ut, s, eig)
+    vectors_df = vectors2df(iw, m)
+    response = {}
+    if export:
+        save_pmisvd(tmpath, iw, ic, ppmi, ut, s, vt)
+        response['vectors_file'] = save_vectors(iw, m, path)
+    logger.info(f'{m.shape[0]} vectors, dimension {m.shape[1]} - elapsed '
+                f'{round(time.time() - start, 1)} s')
 
     singular_values = s.tolist()  # type(s): numpy.ndarray
-    return vectors_df, singular_values, {'vectors_file': out_file}
+    return vectors_df, singular_values, response
 
 
 def vector_space_dim(links, path, tmpath, dim_max=100, sv_min=0.9,
-                     verbose='none', cds=1.0, eig=0.5, neg=1):      # 80329
-    vdf, sv, response = pmisvd(links, path, tmpath, dim_max)
+                     verbose='none', cds=1.0, eig=0.5, neg=1,
+                     backend='sparsesvd', seed=0):                  # 80329
+    # SVD factors at dim_max cached ⇒ pmisvd(dim <= dim_max) truncates them
+    iw, ic, ppmi, ut, s, vt = svd_factors(links, dim_max, cds, neg,
+                                          backend, seed)            # 261018
+    sv = s.tolist()
     dim = max([i for i,x in enumerate(sv) if x > max(sv)*sv_min])
     return dim+1
 
 
+def svd_error(m, ut, s, vt):  # relative Frobenius reconstruction error
+    norm2 = float(m.multiply(m).sum())
+    um = np.asarray((m.T @ ut.T).T)  # ut·m, m: sparse
+    cross = float(np.sum(s * np.einsum('ij,ij->i', um, vt)))
+    gram = (ut @ ut.T) * (vt @ vt.T)  # ‖U·S·Vt‖² = Σ s_i s_j (UᵀU)_ij (VtVtᵀ)_ij
+    approx2 = float(s @ gram @ s)
+    return np.sqrt(max(norm2 - 2 * cross + approx2, 0.0) / norm2) \
+        if norm2 > 0 else 0.0
+
+
+BENCHMARK_CORPORA = ['POC-English-NoAmb/MST-fixed-manually',
+                     'POC-English-Amb/MST-fixed-manually',
+                     'CDS/LG-E-clean',
+                     'CDS-caps-br-text/LG-English']
+
+def svd_benchmark(corpora=None, dims=(10, 25, 50), backends=None, seed=0,
+                  **kwargs):                                            # 261018
+    """ truncated_svd backends on PPMI matrices of parsed corpora
+    :param corpora:     list of input parses dirs, default: BENCHMARK_CORPORA
+                        in language-learning/data
+    :param dims:        SVD dimensions
+    :param backends:    list of truncated_svd backends, default: SVD_BACKENDS
+    :param kwargs:      files2links options: context, parse_mode, ...
+    :return:            DataFrame: corpus, words, features, backend, dim,
+                        seconds, peak_mb (Python and numpy allocations,
+                        tracemalloc), error (relative Frobenius norm)
+    """
+    from .read_files import check_mst_files
+    from .pparser import files2links
+    if corpora is None:
+        data = os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                            '..', '..', 'data'))
+        corpora = [os.path.join(data, x) for x in BENCHMARK_CORPORA]
+    if backends is None:
+        backends = SVD_BACKENDS
+    rows = []
+    for corpus in corpora:
+        files, re = check_mst_files(corpus)
+        if len(files) == 0:
+            continue
+        links, re = files2links(**dict(kwargs, input_files=files))
+        counts, iw, ic = links2counts(links)
+        ppmi = calc_ppmi(counts, kwargs.get('cds', 1.0), kwargs.get('neg', 1))
+        for backend in backends:
+            for dim in dims:
+                tracemalloc.start()
+                start = time.time()
+                ut, s, vt = truncated_svd(ppmi, dim, backend, seed)
+                seconds = time.time() - start
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                rows.append([corpus, len(iw), len(ic), backend, dim,
+                             round(seconds, 3), round(peak / 2 ** 20, 1),
+                             round(svd_error(ppmi, ut, s, vt), 4)])
+    return pd.DataFrame(rows, columns=['corpus', 'words', 'features',
+                                       'backend', 'dim', 'seconds',
+                                       'peak_mb', 'error'])
+
+
 # Notes:
 
 # 80329 added vector_space_dim
 # TODO: refactor, control disk writes, ... PPMI ⇒ +frequency?
 # 90221 minor updates for Grammar Learner tutorial
+# 261018 pmisvd: counts coo_matrix from factorized links, vectorised PPMI,
+#   SVD and vectors in RAM; PMI, SVD and vectors files only if export=True
+# 261018 svd_factors: single SVD at dim_max for vector_space_dim and pmisvd
+# 261018 truncated_svd backends: sparsesvd, randomized, arpack; svd_benchmark
@@ -1,12 +1,11 @@
 # language-learning/src/learner.py                                      # 190410
 import logging
 import os, time  # pickle, numpy as np, pandas as pd
-from copy import deepcopy
 from shutil import copy2 as copy
 from collections import OrderedDict, Counter
 from .utl import UTC, kwa, sec2string
 from .read_files import check_dir, check_mst_files
-from .preprocessing import filter_links
+from .preprocessing import filter_links, filter_tables
 from .pparser import files2links, lines2links, filter_lines
 from .corpus_stats import corpus_stats
 from .category_learner import learn_categories, cats2list
@@ -14,6 +13,7 @@ from .grammar_inducer import induce_grammar, add_disjuncts, check_cats
 from .generalization import generalize_categories, generalize_rules, \
                             generalise_rules, add_upper_level
 from .write_files import list2file, save_link_grammar, save_cat_tree
+from .category_store import snapshot
 from ..common.cliutils import handle_path_string
 
 __all__ = ['learn_grammar', 'learn']
@@ -73,6 +73,7 @@ def learn(**kwargs):
     clustering = kwa('kmeans', 'clustering', **kwargs)  # TODO: update
     cats_gen = kwa('off', 'categories_generalization', **kwargs)
     grammar_rules = kwa(2, 'grammar_rules', **kwargs)
+    workers = kwa(1, 'workers', **kwargs)  # parallel processes         # 261018
     verbose = kwa('none', 'verbose', **kwargs)
 
     files, re01 = check_mst_files(input_parses, verbose)
@@ -84,12 +85,18 @@ def learn(**kwargs):
 
     '''Read parses, extract links to DataFrame (2018), + filter sentences'''
 
-    if 'ull_parsing' in kwargs and kwargs['ull_parsing'] == "180829":
+    legacy = 'ull_parsing' in kwargs and kwargs['ull_parsing'] == "180829"
+    if legacy:
         links, re02 = files2links(**kwargs)
         # links: pd.DataFrame(columns=['word', 'link', 'count'])
-    else:                                                               # 190417
-        links, re02 = filter_links(files, **kwargs)
+    else:  # single scan: tables for categories and grammar rules        # 261018
+        contexts = [context] if grammar_rules == context \
+            else [context, grammar_rules]
+        tables, re02 = filter_tables(files, contexts, **kwargs)
+        links = tables[context] if context in tables else {}
     log.update(re02)
+    if workers > 1:
+        log.update({'workers': workers})
 
     if len(links) < 1:  # Requested by @alexei-gl, issue #209           # 190426
         raise ValueError("Empty filtered dataset with max_sentence_length = "
@@ -128,10 +135,13 @@ def learn(**kwargs):
     '''Learn grammar'''
 
     if grammar_rules != context:
-        context = kwargs['context']
-        kwargs['context'] = kwargs['grammar_rules']
-        links, re06 = files2links(**kwargs)
-        kwargs['context'] = context
+        if legacy:
+            context = kwargs['context']
+            kwargs['context'] = kwargs['grammar_rules']
+            links, re06 = files2links(**kwargs)
+            kwargs['context'] = context
+        else:  # parsed in the same scan                               # 261018
+            links = tables.pop(grammar_rules)
 
     categories = add_disjuncts(categories, links, **kwargs)
     # TODO: check every category has disjuncts?         # 81204,  blocked 81207
@@ -140,7 +150,7 @@ def learn(**kwargs):
 
     # "Fully connected rules": every cluster connected to all clusters
     if grammar_rules < 0:
-        rules = deepcopy(categories)
+        rules = snapshot(categories)                                    # 261018
         clusters = [i for i, x in enumerate(rules['cluster'])
                     if i > 0 and x is not None]
         rule_list = [tuple([-x]) for x in clusters] + \
@@ -204,3 +214,8 @@ def learn_grammar(**kwargs):  # Backwards compatibility with legacy calls
 # 190409 Optional WSD, kwargs['wsd_symbol']
 # 190410 resolved empty filtered parses dataset issue
 # 190426 raise ValueError in case of empty filtered dataset (requested by pipeline)
+# 261018 kwargs['ull_parsing'] = 'stream': streaming integer-interned parser
+#   (default filter_links engine since 261018, option kept for compatibility)
+# 261018 kwargs['workers']: parallel input parsing in filter_links » stream_links
+# 261018 filter_tables: categories and grammar rules links from a single scan
+# 261018 kwargs['workers']: parallel k-means cluster_range sweep in best_clusters
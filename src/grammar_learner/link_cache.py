@@ -0,0 +1,103 @@
+# language-learning/src/grammar_learner/link_cache.py                   # 261018
+# On-disk cache of parsed links tables: npz files keyed by input files
+# fingerprint (size, mtime, content hash) and link extraction options.
+import os, json, hashlib, logging
+import numpy as np, pandas as pd
+from .utl import kwa
+
+# Options affecting extracted links and corpus stats, with learner defaults:
+CACHE_OPTIONS = [('parse_mode', 'lower'), ('context', 2),
+                 ('word_space', 'embeddings'), ('wsd_symbol', ''),
+                 ('max_sentence_length', 99), ('max_unparsed_words', 0),
+                 ('left_wall', ''), ('period', False), ('min_word_count', 1)]
+
+
+def file_hash(path, block = 2 ** 20):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for data in iter(lambda: f.read(block), b''):
+            h.update(data)
+    return h.hexdigest()
+
+
+def cache_key(files, source, **kwargs):
+    """ :param files:   list of paths to input files
+        :param source:  parser name: 'filter_links', 'files2links'
+        :return:        hex digest of files fingerprint + parse options
+    """
+    fingerprint = [[os.path.getsize(f), os.path.getmtime(f), file_hash(f)]
+                   for f in sorted(files)]
+    options = [[k, kwa(v, k, **kwargs)] for k, v in CACHE_OPTIONS]
+    key = json.dumps([source, fingerprint, options], default = str)
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def cache_file(files, source, **kwargs):
+    cache_dir = kwa('', 'links_cache', **kwargs)
+    if cache_dir in ['', 'none', None, False] or len(files) < 1:
+        return ''
+    if cache_dir is True:  # default cache dir in tmpath
+        cache_dir = os.path.join(kwa('', 'tmpath', **kwargs), 'links_cache')
+    os.makedirs(cache_dir, exist_ok = True)
+    return os.path.join(cache_dir, source + '_'
+                        + cache_key(files, source, **kwargs) + '.npz')
+
+
+def str2codes(column):  # pandas column » (codes, '\n'-joined vocabulary)
+    codes, uniques = pd.factorize(column)
+    vocab = np.frombuffer('\n'.join(uniques).encode(), dtype = np.uint8)
+    return codes.astype(np.int32), vocab
+
+
+def codes2str(codes, vocab):
+    uniques = np.array(vocab.tobytes().decode().split('\n'), dtype = object)
+    return uniques[codes]
+
+
+def save_links(path, links, re):
+    """ :param path:    cache file path (cache_file)
+        :param links:   DataFrame ['word', 'link', 'count'(, 'djlen')]
+        :param re:      dict: parser response (json-serializable values)
+    """
+    logger = logging.getLogger(__name__ + ".save_links")
+    arrays = {'meta': np.frombuffer(json.dumps(
+        {'columns': list(links.columns), 're': re},
+        default = int).encode(), dtype = np.uint8)}
+    for column in links.columns:
+        if links[column].dtype == object:
+            arrays[column], arrays[column + '_vocab'] = \
+                str2codes(links[column])
+        else:
+            arrays[column] = links[column].values
+    tmp = path + '.' + str(os.getpid()) + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)  # atomic: parallel runs may share the cache
+    logger.info(f'Links cache saved: {path}')
+
+
+def load_links(path):
+    """ :param path:    cache file path (cache_file)
+        :return:        (links, re) or (None, None) if no cached links
+    """
+    logger = logging.getLogger(__name__ + ".load_links")
+    if path == '' or not os.path.isfile(path):
+        return None, None
+    try:
+        with np.load(path, allow_pickle = False) as data:
+            meta = json.loads(data['meta'].tobytes().decode())
+            links = pd.DataFrame(
+                {c: codes2str(data[c], data[c + '_vocab'])
+                 if c + '_vocab' in data else data[c]
+                 for c in meta['columns']}, columns = meta['columns'])
+    except Exception as e:  # broken or outdated file » re-parse
+        logger.warning(f'Links cache {path} load failed: {e}')
+        return None, None
+    logger.info(f'Links cache loaded: {path}')
+    return links, meta['re']
+
+
+# Notes:
+
+# 261018 links cache: kwargs['links_cache'] = cache directory path or True
+#   (tmpath/links_cache); used by filter_links and files2links
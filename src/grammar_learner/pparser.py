@@ -1,7 +1,9 @@
-# language-learning/src/grammar_learner/pparser.py                      # 190417
+# language-learning/src/grammar_learner/pparser.py                      # 261018
 import logging, pandas as pd
 from collections import Counter
 from .corpus_stats import corpus_stats
+from .link_cache import cache_file, load_links, save_links
+from .ull_stream import stream_counters
 from .utl import kwa
 
 
@@ -115,7 +117,6 @@ def files2links(**kwargs):  # 2018 legacy, 2019-02: » filter_lines, lines2links
     parse_mode = kwa('lower', 'parse_mode', **kwargs)
     # parse_mode: 'given'~ as parsed, 'lower', 'casefold'
     context = kwa(2, 'context', **kwargs)
-    group = True  # always? » kwa(True, 'group', **kwargs) ?
     verbose = kwa('none', 'verbose', **kwargs)
 
     df = pd.DataFrame(columns=['word', 'link', 'count'])
@@ -123,62 +124,31 @@ def files2links(**kwargs):  # 2018 legacy, 2019-02: » filter_lines, lines2links
     files = kwargs['input_files']
     if len(files) == 0:
         return df, {'parsed_links': 0, 'error': 'files2links: files = []'}
-    lines = []
-    for i, file in enumerate(files):
-        with open(file, 'r') as f:
-            lines.extend(f.readlines())
-
-    if parse_mode == 'lower':
-        lines = [' '.join([y.lower() if y != '###LEFT-WALL###'
-                 else y for y in x.split()]) for x in lines]
-    elif parse_mode == 'casefold':
-        lines = [' '.join([y.casefold() if y != '###LEFT-WALL###'
-                 else y for y in x.split()]) for x in lines]
-
-    response = corpus_stats(lines)
-    ordnung = ['word', 'link', 'count']
-    cdf = mst2connectors(lines, **kwargs)[ordnung]
-    ddf = mst2disjuncts(lines, **kwargs)[ordnung]
-
-    unique_connectors = cdf.groupby('link', as_index=False).sum()
-    avg_connector_count = round(len(cdf)/len(unique_connectors), 1)
-    unique_djs = ddf.groupby('link', as_index=False).sum()
-    avg_disjunct_count = round(len(ddf)/len(unique_djs), 1)
-    unique_seeds = ddf.groupby(['word', 'link'], as_index=False).sum()
-    avg_seed_count = round(len(ddf) / len(unique_seeds), 1)
-
-    ddf['djlen'] = ddf['link'].apply(lambda x: x.count('&') +1)
-    avg_disjunct_length = float(round(ddf['djlen'].mean(), 1))
-    max_disjunct_length = int(ddf['djlen'].max())
-
-    response['corpus_stats'].extend([
-        ['Unique connectors number', len(unique_connectors)],
-        ['Total  connectors count ', len(cdf)],
-        ['Average connector count ', avg_connector_count],
-        ['Unique disjuncts number', len(unique_djs)],
-        ['Total  disjuncts count ', len(ddf)],
-        ['Average disjunct count ', avg_disjunct_count],
-        ['Average disjunct length', avg_disjunct_length],
-        ['Maximum disjunct length', max_disjunct_length],
-        ['Unique seeds number', len(unique_seeds)],
-        ['Total  seeds count ', len(ddf)],
-        ['Average seed count ', avg_seed_count]])
+    cache = cache_file(files, 'files2links', **kwargs)                  # 261018
+    links, response = load_links(cache)
+    if links is not None:
+        return links, response
+
+    # Single scan, no filtering, no WSD; both counters for corpus stats,
+    # links DataFrame only for the requested context                   # 261018
+    options = dict(kwargs, parse_mode = parse_mode, wsd_symbol = '',
+                   max_sentence_length = float('inf'),
+                   max_unparsed_words = float('inf'))
+    stats, counters, _ = stream_counters(files, [context, 1, 2], **options)
+    response = stats.response()
+    cstats = counters[1].stats()
+    dstats = counters[2].stats()
+    response['corpus_stats'].extend(cstats[:3] + dstats[:6] + [
+        ['Total  seeds count ', sum(counters[2].counts.values())],
+        dstats[6]])
 
     if context > 1:
-        df = ddf
         terms = 'disjuncts'
     elif context == 1:
-        df = cdf
         terms = 'connectors'
     else:
-        df = mst2words(lines, **kwargs)
         terms = 'words'  # legacy, not used  # FIXME:DEL?
-
-    if group:  # Always True?  # FIXME:DEL?
-        df = df.groupby(['word','link'], as_index=False).sum() \
-            .sort_values(by=['count', 'word', 'link'],
-                         ascending=[False, True, True]) \
-            .reset_index(drop=True)
+    df = counters[0 if context < 1 else min(context, 2)].table()
 
     response.update({
         'terms': terms,
@@ -186,9 +156,10 @@ def files2links(**kwargs):  # 2018 legacy, 2019-02: » filter_lines, lines2links
         'unique_links': len(df),
         'unique_words': len(set(df['word'].tolist())),
         'unique_terms': len(set(df['link'].tolist())),
-        'word-term_pairs': len(df.groupby(['word', 'link'],
-                                          as_index=False).sum())
+        'word-term_pairs': len(df)
     })
+    if cache != '':
+        save_links(cache, df, response)
 
     return df, response
 
@@ -299,3 +270,5 @@ def lines2links(lines, **kwargs):                                       # 190410
 # 190410 lines2links: check length of filtered dataset > 0
 # 190417 mst2disjuncts: prune words with counts < min_word_count
 # 190424 Add '###LEFT-WALL###' and '.' to tokens - lines 59, 60
+# 261018 files2links: optional links cache, kwargs['links_cache']
+# 261018 files2links: ull_stream counters, DataFrame only for the requested context
@@ -1,4 +1,4 @@
-# language-learning/src/grammar_learner/pqa_table.py                    # 190410
+# language-learning/src/grammar_learner/pqa_table.py                    # 261018
 # Test Grammar Learner to fill in ULL Project Plan Parses spreadshit
 import logging
 
@@ -150,6 +150,8 @@ def table_rows(lines, out_dir, cp, rp, runs=(1, 1), **kwargs):
         spaces += 'id'
     else:
         spaces += 'd'
+    if 'links_cache' not in kwargs:  # re-use parsed links in all runs   # 261018
+        kwargs['links_cache'] = True
     details = []
     average = []
     for i, line in enumerate(lines):
@@ -343,6 +345,8 @@ def wide_rows(lines, out_dir, cp, rp, runs=(1, 1), **kwargs):
     else:
         spaces += 'd'
 
+    if 'links_cache' not in kwargs:  # re-use parsed links in all runs   # 261018
+        kwargs['links_cache'] = True
     details = []
     average = []
     for i, line in enumerate(lines):
@@ -555,6 +559,8 @@ def wide_table(lines, out_dir, cp, rp, **kwargs):           # 81222 FIXME: [»]
         spaces += 'id'
     else: spaces += 'd'
 
+    if 'links_cache' not in kwargs:  # re-use parsed links in all runs   # 261018
+        kwargs['links_cache'] = True
     details = []
     for i, line in enumerate(lines):
         corpus = line[1]
@@ -668,3 +674,4 @@ def wide_table(lines, out_dir, cp, rp, **kwargs):           # 81222 FIXME: [»]
 # 81231 cleanup
 # 190221 tweak min_word_count (line 69)
 # 190410 fix empty filtered dataset issue
+# 261018 table_rows, wide_rows, wide_table: links cache on by default
@@ -1,10 +1,11 @@
-# language-learning/src/preprocessing.py  # parses cleanup & filtering  # 190417
+# language-learning/src/preprocessing.py  # parses cleanup & filtering  # 261018
 import os
 from collections import OrderedDict
 from .utl import UTC, kwa
 from .read_files import check_dir, check_mst_files
-from .pparser import lines2links
-from .corpus_stats import corpus_stats
+from .corpus_stats import corpus_stats, CorpusStats
+from .ull_stream import stream_tables
+from .link_cache import cache_file, load_links, save_links
 from .write_files import list2file, save_link_grammar, save_cat_tree
 
 
@@ -75,13 +76,26 @@ def parse_ull(ullstring, **kwargs):
 
 
 def filter_links(files, **kwargs):                                      # 190417
-    """ parses input files, filters and re
+    """ parses input files, filters and re -- single pass over each file
     :param files:   list of paths to input files
-    :param kwargs:  defined in kwa below
+    :param kwargs:  defined in filter_tables
     :return:        (links, re): DataFrame, {}
     """
-    parse_mode = kwa('lower', 'parse_mode', **kwargs)  # 'casefold' » default?
-    wsd_symbol = kwa('', 'wsd_symbol', **kwargs)
+    context = kwa(2, 'context', **kwargs)
+    tables, re = filter_tables(files, [context], **kwargs)
+    if context not in tables:
+        return {}, re
+    return tables[context], re
+
+
+def filter_tables(files, contexts, **kwargs):                           # 261018
+    """ parses input files once ⇒ links tables for several contexts
+    :param files:       list of paths to input files
+    :param contexts:    list of links tables: 0 - words, 1 - connectors,
+                        2 - disjuncts; stats are reported for contexts[0]
+    :param kwargs:      defined in kwa below and in ull_stream.stream_counters
+    :return:            ({context: links DataFrame}, re)
+    """
     output_grammar = kwargs['output_grammar']
     if 'project_directory' in kwargs:
         prj_dir = kwargs['project_directory']
@@ -104,31 +118,31 @@ def filter_links(files, **kwargs):                                      # 190417
     else:
         corpus_stats_file = prj_dir + '/corpus_stats.txt'
 
-    re = OrderedDict()
-    lines = []  # learner line 91
-    for i, file in enumerate(files):
-        with open(file, 'r') as f: lines.extend(f.readlines())
-        if len(lines[-1]) > 0: lines.append('')
-    if parse_mode == 'lower':
-        lines = [' '.join([w.lower() if w != '###LEFT-WALL###'
-                           else w for w in l.split()]) for l in lines]
-    elif parse_mode == 'casefold':
-        lines = [' '.join([w.casefold() if w != '###LEFT-WALL###'
-                           else w for w in l.split()]) for l in lines]
-    # WSD: word sense disambiguation symbol resolution:
-    if wsd_symbol != '':                                                # 190408
-        lines = [' '.join([w[0] + w[1:-1].replace(wsd_symbol, '.') + w[-1]
-                           if len(w) > 2 else w
-                           for w in l.split()]) for l in lines]
-
-    if 'corpus_stats' in corpus_stats(lines):
-        raw_corpus_stats = corpus_stats(lines)['corpus_stats']
-        if type(raw_corpus_stats) is list:
-            re.update({'raw_corpus_stats': raw_corpus_stats})
-            list2file(raw_corpus_stats, prj_dir + '/raw_corpus_stats.txt')
-            re.update({'raw_corpus_stats_file': prj_dir + '/raw_corpus_stats.txt'})
+    # Cached links and stats or a single pass: case, WSD, raw stats,
+    # filtering, filtered stats, links tables for all contexts
+    tables = OrderedDict()
+    caches = dict()
+    for context in contexts:
+        caches[context] = cache_file(files, 'filter_links',
+                                     **dict(kwargs, context = context))
+        tables[context] = load_links(caches[context])
+    missing = [c for c in contexts if tables[c][0] is None]
+    if len(missing) > 0:
+        raw_stats = CorpusStats()
+        parsed = stream_tables(files, missing, raw_stats, **kwargs)
+        raw_corpus_stats = raw_stats.response()['corpus_stats']
+        for context, (links, re_) in parsed.items():
+            re_['raw_corpus_stats'] = raw_corpus_stats
+            if caches[context] != '' and len(links) > 0:
+                save_links(caches[context], links, re_)
+            tables[context] = (links, re_)
+    links, re_ = tables[contexts[0]]
 
-    links, re_ = lines2links(lines, **kwargs)
+    re = OrderedDict()
+    raw_corpus_stats = re_.pop('raw_corpus_stats')
+    re.update({'raw_corpus_stats': raw_corpus_stats})
+    list2file(raw_corpus_stats, prj_dir + '/raw_corpus_stats.txt')
+    re.update({'raw_corpus_stats_file': prj_dir + '/raw_corpus_stats.txt'})
     re.update(re_)
     # Empty filtered df with 'max_sentence_length', 'max_unparsed_words'
     if len(links) < 1:
@@ -141,4 +155,4 @@ def filter_links(files, **kwargs):                                      # 190417
     # else:  # FIXME: raise error / assert ?
     #    return {'error': 'input_files'}, re
 
-    return links, re
+    return OrderedDict([(c, tables[c][0]) for c in contexts]), re
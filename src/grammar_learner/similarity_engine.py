@@ -0,0 +1,425 @@
+# language-learning/src/grammar_learner/similarity_engine.py            # 261018
+import heapq
+import time
+import numpy as np
+from collections import Counter, defaultdict
+from scipy.sparse import csr_matrix, vstack
+from .category_store import encode_rows, snapshot
+from .clustering import cluster_id
+from .utl import kwa
+
+PRIME = 2 ** 31 - 1  # MinHash universal hash family modulus
+
+SIMILARITY_FORMULAS = {  # set similarity from |x ∩ y|, |x|, |y|
+    'jaccard': lambda inter, a, b: inter / (a + b - inter),
+    'squared': lambda inter, a, b: inter ** 2 / a / b}
+
+
+def binary_rows(rows):  # [[] or {}] ⇒ binary CSR rows × items, duplicates out
+    matrix = csr_matrix(encode_rows(rows)[2], dtype = np.int32)
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return matrix
+
+
+def rounded_counts(similarities):  # ⇒ Counter {round(similarity, 2): pairs}
+    values, counts = np.unique(similarities, return_counts = True)
+    counter = Counter()
+    for value, count in zip(values.tolist(), counts.tolist()):
+        counter[round(value, 2)] += count
+    return counter
+
+
+def merge_pairs(pairs):
+    """ generalization.aggregate grouping of similar pairs, same result:
+        each set merged with the later ones it overlaps (in the range
+        known when it is reached), unions appended, merged sets dropped;
+        overlaps found via a cluster ⇒ sets index, not a scan of all sets
+    :param pairs: [(i, j)] -- similar clusters, i < j, sorted
+    :return: [set()] -- clusters to merge
+    """
+    merges = [{i, j} for i, j in pairs]
+    known = set(frozenset(x) for x in merges)
+    index = defaultdict(list)
+    for m, mset in enumerate(merges):
+        for x in mset:
+            index[x].append(m)
+    merged = set()
+    for m, mset in enumerate(merges):  # merges appended while iterating
+        if m in merged:
+            continue
+        limit = len(merges)
+        overlaps = sorted(set(k for x in mset for k in index[x]
+                              if m < k < limit))
+        for k in overlaps:
+            if k in merged:
+                continue
+            union = mset | merges[k]
+            if frozenset(union) not in known:
+                known.add(frozenset(union))
+                for x in union:
+                    index[x].append(len(merges))
+                merges.append(union)
+            merged.update([m, k])
+    return [x for i, x in enumerate(merges) if i not in merged]
+
+
+def lsh_bands(permutations, threshold):
+    """ :return: bands, rows -- the most rows per band with the LSH
+        threshold (1 / bands) ** (1 / rows) ≤ threshold: recall first """
+    bands, rows = permutations, 1
+    for r in range(2, permutations + 1):
+        if (1 / (permutations // r)) ** (1 / r) <= threshold:
+            bands, rows = permutations // r, r
+    return bands, rows
+
+
+def expand_ranges(lo, hi):  # ⇒ concatenated aranges lo[k]:hi[k]
+    counts = hi - lo
+    starts = np.repeat(lo - np.cumsum(counts) + counts, counts)
+    return starts + np.arange(np.sum(counts))
+
+
+class MinHashLSH:
+    """ candidate pairs of rows with Jaccard similarity > threshold:
+        MinHash signatures -- seeded universal hash family
+        (a * item + b) mod PRIME, the signature of a union == elementwise
+        minimum of the signatures; LSH banding -- rows with an equal band
+        (rows of signature) are candidates, a pair with similarity J is
+        found with probability 1 - (1 - J ** rows) ** bands.
+        Candidates verified by the exact engine; log: bands, candidate
+        pairs and time, recall vs exact pairs of a sample of rows.
+    """
+    def __init__(self, threshold, permutations = 128, seed = 0,
+                 recall_sample = 100, chunk = 2 ** 20):
+        self.threshold = threshold
+        self.chunk = chunk  # ~ band matches of a chunk of rows
+        self.bands, self.rows = lsh_bands(permutations, threshold)
+        random = np.random.RandomState(seed)
+        self.a = random.randint(1, PRIME, permutations).astype(np.int64)
+        self.b = random.randint(0, PRIME, permutations).astype(np.int64)
+        self.band_hash = random.randint(1, 2 ** 62, self.rows) \
+            .astype(np.uint64) * np.uint64(2) + np.uint64(1)  # odd
+        self.seed = seed
+        self.recall_sample = recall_sample
+        self.signatures = None
+        self.keys = None
+        self.log = {'minhash_bands': [self.bands, self.rows],
+                    'minhash_candidates': 0, 'minhash_time': 0.0}
+
+    @classmethod
+    def from_kwargs(cls, **kwargs):  # None: exact engine, all pairs
+        threshold = kwa(None, 'minhash_threshold', **kwargs)
+        if threshold is None:
+            return None
+        return cls(threshold, kwa(128, 'minhash_permutations', **kwargs),
+                   kwa(0, 'minhash_seed', **kwargs),
+                   kwa(100, 'minhash_recall_sample', **kwargs))
+
+    def band_keys(self, signatures):  # n × bands keys, equal bands ⇒ equal
+        bands = signatures[:, :self.bands * self.rows].astype(np.uint64) \
+            .reshape(len(signatures), self.bands, self.rows)
+        return np.sum(bands * self.band_hash, axis = 2, dtype = np.uint64)
+
+    def index(self, matrix):  # signatures and band keys of all rows
+        start = time.time()
+        n = matrix.shape[0]
+        self.signatures = np.full((n, len(self.a)), PRIME, dtype = np.int64)
+        filled = np.diff(matrix.indptr) > 0
+        items = matrix.indices.astype(np.int64)
+        for k, (a, b) in enumerate(zip(self.a, self.b)):
+            self.signatures[filled, k] = np.minimum.reduceat(
+                (a * items + b) % PRIME, matrix.indptr[:-1][filled])
+        self.keys = self.band_keys(self.signatures)
+        self.orders = np.argsort(self.keys, axis = 0, kind = 'stable').T
+        self.sorted_keys = np.take_along_axis(self.keys, self.orders.T,
+                                              axis = 0).T
+        self.log['minhash_time'] += time.time() - start
+
+    def extend(self, groups):  # new rows = unions of existing rows
+        signatures = np.array([self.signatures[sorted(x)].min(axis = 0)
+                               for x in groups])
+        keys = self.band_keys(signatures)
+        rows = np.arange(len(self.keys), len(self.keys) + len(keys))
+        self.signatures = np.vstack([self.signatures, signatures])
+        self.keys = np.vstack([self.keys, keys])
+        orders, sorted_keys = [], []
+        for band in range(self.bands):
+            order = np.argsort(keys[:, band], kind = 'stable')
+            at = np.searchsorted(self.sorted_keys[band], keys[order, band],
+                                 side = 'right')
+            orders.append(np.insert(self.orders[band], at, rows[order]))
+            sorted_keys.append(np.insert(self.sorted_keys[band], at,
+                                         keys[order, band]))
+        self.orders = np.array(orders)
+        self.sorted_keys = np.array(sorted_keys)
+
+    def candidates(self, rows, cols):
+        """ :yield: i, j -- distinct pairs of rows × cols sharing a band,
+            unique in each chunk of rows """
+        n = len(self.keys)
+        columns = np.zeros(n, dtype = bool)
+        columns[cols] = True
+        step = max(self.chunk // max(len(cols), 1), 256)
+        for start in range(0, len(rows), step):
+            chunk = rows[start:start + step]
+            pairs = []
+            for band in range(self.bands):
+                lo = np.searchsorted(self.sorted_keys[band],
+                                     self.keys[chunk, band], side = 'left')
+                hi = np.searchsorted(self.sorted_keys[band],
+                                     self.keys[chunk, band], side = 'right')
+                i = np.repeat(chunk, hi - lo)
+                j = self.orders[band][expand_ranges(lo, hi)]
+                pairs.append(i[columns[j]] * n + j[columns[j]])
+            pairs = np.unique(np.concatenate(pairs))
+            i, j = pairs // n, pairs % n
+            yield i[i != j], j[i != j]
+
+    def pairs(self, matrix, rows, cols):
+        """ :return: i, j, |i ∩ j| -- verified candidates, common items """
+        start = time.time()
+        sizes = np.diff(matrix.indptr)
+        result = []
+        for i, j in self.candidates(rows[sizes[rows] > 0],
+                                    cols[sizes[cols] > 0]):
+            inter = np.asarray(matrix[i].multiply(matrix[j]).sum(axis = 1)) \
+                .ravel().astype(np.int32)
+            self.log['minhash_candidates'] += len(i)
+            result.append((i[inter > 0], j[inter > 0], inter[inter > 0]))
+        self.log['minhash_time'] += time.time() - start
+        if len(result) == 0:
+            return np.zeros(0, dtype = int), np.zeros(0, dtype = int), \
+                   np.zeros(0, dtype = np.int32)
+        return tuple(np.concatenate(x) for x in zip(*result))
+
+    def recall(self, matrix, rows):
+        """ share of exact pairs with Jaccard > threshold of a seeded
+            sample of rows found as candidates """
+        rows = rows[np.diff(matrix.indptr)[rows] > 0]
+        if self.recall_sample < 1 or len(rows) < 2:
+            return
+        random = np.random.RandomState(self.seed)
+        sample = np.sort(random.choice(
+            rows, min(self.recall_sample, len(rows)), replace = False))
+        product = (matrix[sample] @ matrix[rows].T).tocoo()
+        i, j = sample[product.row], rows[product.col]
+        sizes = np.diff(matrix.indptr)
+        similar = (i != j) & (product.data / (sizes[i] + sizes[j]
+                                              - product.data) > self.threshold)
+        exact = set(zip(i[similar].tolist(), j[similar].tolist()))
+        found = set()
+        for ci, cj in self.candidates(sample, rows):
+            found.update(exact & set(zip(ci.tolist(), cj.tolist())))
+        self.log['minhash_recall'] = \
+            round(len(found) / len(exact), 4) if len(exact) > 0 else 1.0
+
+
+class SimilarityEngine:
+    """ rules generalization: top level clusters ⇒ rows of a binary CSR
+        clusters × disjuncts matrix, intersections of all pairs ⇒ one
+        (chunked) sparse product; candidate pairs with similarity > floor
+        in a max-heap; a merge updates only the merged and new rows.
+        aggregate(threshold) == generalization.aggregate / agglomerate
+        (top = True) rounds -- same merges, similarities, categories:
+        - 1st round: 'djs' similarity, after a merge -- 'disjuncts'
+          (aggregate renumbers djs as disjuncts);
+        - djs renumbered once, on categories() request.
+        update(function) -- disjuncts updated (renumbered) between rounds.
+        minhash: MinHashLSH -- only candidate pairs verified, similarities
+        of the other pairs unknown (approximate, faster for many rules).
+    """
+    def __init__(self, categories, similarity_function, floor = None,
+                 top = False, chunk = 1024, minhash = None):
+        cats = snapshot(categories)
+        cats.pop('dj_counts', None)
+        if top:
+            cats.update({'top': list(cats['parent'])})
+        self.cats = cats
+        self.top = top
+        self.floor = floor
+        self.chunk = chunk
+        self.minhash = minhash
+        name = getattr(similarity_function, '__name__', similarity_function)
+        if name not in SIMILARITY_FORMULAS:
+            raise ValueError('SimilarityEngine: unknown similarity ' + str(name))
+        self.formula = SIMILARITY_FORMULAS[name]
+        self.active = np.array([i > 0 and not x > 0 for i, x in
+                                enumerate(cats['parent'])], dtype = bool)
+        self.djs_stale = False  # djs to renumber as disjuncts
+        self.build('djs')
+
+    def build(self, key):  # all pairs of active rows
+        self.matrix = binary_rows(self.cats[key])
+        self.sizes = np.diff(self.matrix.indptr)
+        self.synced = key == 'disjuncts'  # matrix rows == disjuncts
+        self.counts = Counter()
+        self.heap = []
+        rows = np.flatnonzero(self.active)
+        if self.minhash is not None:
+            self.minhash.index(self.matrix)
+            self.minhash.recall(self.matrix, rows)
+            i, j, inter = self.pairs(rows, rows)
+            self.add(i[i < j], j[i < j], inter[i < j], push = False)
+        else:
+            for start in range(0, len(rows), self.chunk):
+                i, j, inter = self.intersections(
+                    rows[start:start + self.chunk], rows[start:])
+                self.add(i[i < j], j[i < j], inter[i < j], push = False)
+        heapq.heapify(self.heap)
+
+    def pairs(self, rows, cols):  # ⇒ i, j, |i ∩ j|: all or candidate pairs
+        if self.minhash is not None:
+            return self.minhash.pairs(self.matrix, rows, cols)
+        return self.intersections(rows, cols)
+
+    def intersections(self, rows, cols):
+        """ :return: i, j, |i ∩ j| -- row pairs with common items """
+        product = (self.matrix[rows] @ self.matrix[cols].T).tocoo()
+        return rows[product.row], cols[product.col], product.data
+
+    def similarity(self, i, j, inter):
+        return self.formula(inter.astype(np.int64), self.sizes[i],
+                            self.sizes[j])
+
+    def add(self, i, j, inter, push = True):  # new pairs ⇒ counts, heap
+        similarity = self.similarity(i, j, inter)
+        self.counts.update(rounded_counts(similarity))
+        candidates = similarity > self.floor if self.floor is not None \
+            else np.ones(len(similarity), dtype = bool)
+        i, j = i[candidates], j[candidates]
+        items = zip((-similarity[candidates]).tolist(),
+                    np.minimum(i, j).tolist(), np.maximum(i, j).tolist())
+        if push:
+            for item in items:
+                heapq.heappush(self.heap, item)
+        else:
+            self.heap.extend(items)
+
+    def remove(self, i, j, inter):  # pairs of merged rows ⇒ out of counts
+        self.counts.subtract(rounded_counts(self.similarity(i, j, inter)))
+
+    def first_zero(self):
+        """ 0 or 0.0: aggregate similarities keep the first one of the
+            pairs scan, 0 -- an empty cluster, 0.0 -- no common items """
+        rows = np.flatnonzero(self.active)
+        for k, i in enumerate(rows[:-1]):
+            _, j, inter = self.intersections(rows[k:k + 1], rows[k + 1:])
+            similarity = self.similarity(np.full(len(j), i), j, inter)
+            common = dict(zip(j.tolist(), similarity.tolist()))
+            for x in rows[k + 1:].tolist():
+                if x not in common:
+                    return 0 if self.sizes[i] == 0 or self.sizes[x] == 0 \
+                        else 0.0
+                if round(common[x], 2) == 0:
+                    return 0.0
+        return 0
+
+    def similarities(self):
+        """ :return: rounded similarities of all active pairs, descending """
+        n = int(np.sum(self.active))
+        pairs = n * (n - 1) // 2
+        values = set(x for x, count in self.counts.items()
+                     if count > 0 and x != 0)
+        zeros = pairs - sum(self.counts.values()) + self.counts.get(0, 0)
+        if zeros > 0:
+            values.add(self.first_zero())
+        return sorted(values, reverse = True)
+
+    def aggregate(self, threshold):
+        """ merge top level clusters with similarity > threshold
+        :return: rounded similarities of all pairs before the merges
+        """
+        similarities = self.similarities()
+        popped = []
+        while len(self.heap) > 0 and -self.heap[0][0] > threshold:
+            s, i, j = heapq.heappop(self.heap)
+            if self.active[i] and self.active[j]:
+                popped.append((s, i, j))
+        merges = merge_pairs(sorted((i, j) for s, i, j in popped))
+        if len(merges) == 0:
+            for item in popped:
+                heapq.heappush(self.heap, item)
+            return similarities
+
+        cats = self.cats
+        old = np.flatnonzero(self.active)
+        rows = []
+        for mset in merges:
+            new_cluster_id = len(cats['parent'])
+            if self.top:
+                cats['cluster'].append(None)
+                cats['top'].append(0)
+            else:
+                cats['cluster'].append(cluster_id(new_cluster_id,
+                                                  new_cluster_id))
+            cats['parent'].append(0)
+            cats['children'].append(mset)
+            cats['words'].append(set())
+            cats['disjuncts'].append(set())
+            cats['djs'].append(set())
+            cats['counts'].append(0)
+            cats['quality'].append(threshold)
+            for cluster in mset:
+                if self.top:
+                    cats['top'][cluster] = new_cluster_id
+                cats['parent'][cluster] = new_cluster_id
+                cats['words'][new_cluster_id].update(cats['words'][cluster])
+                cats['disjuncts'][new_cluster_id].update(
+                    cats['disjuncts'][cluster])
+                cats['counts'][new_cluster_id] += cats['counts'][cluster]
+            cats['similarities'].append(
+                [0 for word in cats['words'][new_cluster_id]])
+            members = self.matrix[sorted(mset)].indices
+            rows.append(np.unique(members))
+        self.djs_stale = True
+
+        merged = np.array(sorted(set().union(*merges)))
+        new = np.arange(len(self.active), len(cats['parent']))
+        self.active[merged] = False
+        self.active = np.concatenate([self.active,
+                                      np.ones(len(new), dtype = bool)])
+        if not self.synced:
+            self.build('disjuncts')
+            return similarities
+
+        i, j, inter = self.pairs(merged, old)
+        keep = ~np.isin(j, merged) | (i < j)
+        self.remove(i[keep], j[keep], inter[keep])
+        if self.minhash is not None:
+            self.minhash.extend(merges)
+        indptr = np.cumsum([0] + [len(x) for x in rows])
+        block = csr_matrix((np.ones(indptr[-1], dtype = np.int32),
+                            np.concatenate(rows), indptr),
+                           shape = (len(rows), self.matrix.shape[1]))
+        self.matrix = csr_matrix(vstack([self.matrix, block]))
+        self.sizes = np.diff(self.matrix.indptr)
+        i, j, inter = self.pairs(new, np.flatnonzero(self.active))
+        keep = ~np.isin(j, new) | (i < j)
+        self.add(i[keep], j[keep], inter[keep])
+        for item in popped:
+            if self.active[item[1]] and self.active[item[2]]:
+                heapq.heappush(self.heap, item)
+        return similarities
+
+    @property
+    def log(self):  # MinHash stage statistics, if any
+        if self.minhash is None:
+            return {}
+        return dict(self.minhash.log,
+                    minhash_time = round(self.minhash.log['minhash_time'], 3))
+
+    def update(self, function):
+        """ cats = function(cats) -- disjuncts updated, hierarchy kept """
+        self.cats = function(self.categories())
+        self.synced = False
+
+    def categories(self):
+        """ :return: categories dict, djs renumbered as disjuncts if stale """
+        cats = self.cats
+        if self.djs_stale:
+            d = {x: (i + 1) for i, x in enumerate(
+                sorted(set([x for y in cats['disjuncts'] for x in y])))}
+            cats['djs'] = [set([d[x] for x in y]) for y in cats['disjuncts']]
+            self.djs_stale = False
+        return cats
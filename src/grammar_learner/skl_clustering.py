@@ -1,18 +1,98 @@
 # language-learning/src/grammar_learner/skl_clustering.py               # 190425
 import numpy as np
-from sklearn.cluster import AgglomerativeClustering, KMeans, MeanShift, \
+from scipy.sparse import issparse, csr_matrix
+from sklearn.cluster import AgglomerativeClustering, MeanShift, \
     estimate_bandwidth
 # from sklearn import metrics, pairwise_distances
 from sklearn.metrics import silhouette_score, calinski_harabaz_score
-from sklearn.neighbors import kneighbors_graph
 # davies_bouldin_score -- next scikit-learn release?
 # https://github.com/scikit-learn/scikit-learn/issues/11303
 from .utl import kwa
-from .clustering import cluster_id
+from .clustering import cluster_id, MINI_BATCH_KMEANS, mini_batch_size, \
+    kmeans_model
+from .cluster_quality import SilhouetteScorer
+from .connectivity import connectivity_graph
 
 
-def skl_clustering(cd, n_clusters=10, **kwargs):
-    # cd: ndarray(words*disjuncts)
+def dense(cd):  # AgglomerativeClustering, MeanShift: dense input only  # 261018
+    return cd.toarray() if issparse(cd) else cd
+
+
+def variance_ratio(cd, labels):                                         # 261018
+    """ Calinski-Harabasz index, sparse cd supported (calinski_harabaz_score
+        accepts dense arrays only) """
+    if not issparse(cd):
+        return float(calinski_harabaz_score(cd, labels))
+    cd = csr_matrix(cd, dtype=np.float64)
+    n = cd.shape[0]
+    ids, labels = np.unique(labels, return_inverse=True)
+    k = len(ids)
+    if k < 2 or k >= n:
+        raise ValueError('variance_ratio: 2 <= n_labels < n_samples')
+    members = csr_matrix((np.ones(n), (labels, np.arange(n))), shape=(k, n))
+    sizes = np.bincount(labels, minlength=k).astype(np.float64)
+    centers = np.asarray((members @ cd).todense()) / sizes[:, None]
+    mean = np.asarray(cd.mean(axis=0)).ravel()
+    extra = float(np.sum(sizes * np.sum((centers - mean) ** 2, axis=1)))
+    intra = float(cd.multiply(cd).sum()
+                  - np.sum(sizes * np.sum(centers ** 2, axis=1)))
+    if intra <= 0:
+        return 1.0
+    return extra * (n - k) / (intra * (k - 1))
+
+
+def agglomerative_model(cd, n_clusters, clustering, compute_full_tree='auto',
+                        log=None):
+    # clustering: ('agglomerative', linkage, affinity, connectivity, full tree)
+    # log: dict updated with connectivity graph method, time and recall
+    linkage = 'ward'
+    affinity = 'euclidean'
+    connectivity = None
+    if clustering[1] in ['average', 'complete', 'single']:
+        linkage = clustering[1]
+    if len(clustering) > 2:
+        if clustering[2] in ['euclidean', 'cosine', 'manhattan']:
+            affinity = clustering[2]
+    if len(clustering) > 3:  # connectivity: int / dict           # 261018
+        if (type(clustering[3]) is int and clustering[3] > 0) \
+                or type(clustering[3]) is dict:
+            connectivity = connectivity_graph(cd, clustering[3], log)
+    if len(clustering) > 4:  # compute_full_tree
+        if clustering[4] is bool:
+            compute_full_tree = clustering[4]
+
+    return AgglomerativeClustering(n_clusters=n_clusters,
+                                   linkage=linkage, affinity=affinity,
+                                   connectivity=connectivity,
+                                   compute_full_tree=compute_full_tree)
+
+
+def cluster_metrics(cd, labels, clustering_metric=('silhouette', 'euclidean'),
+                    scorer=None):
+    # scorer: SilhouetteScorer of cd, shared by a sweep                # 261018
+    metrics = {}
+    try:
+        if scorer is None:
+            metrics['silhouette_index'] = float(
+                silhouette_score(cd, labels, metric=clustering_metric[1]))
+        else:
+            metrics['silhouette_index'] = scorer.silhouette(labels)
+    except:  # FIXME
+        metrics['silhouette_index'] = 0.0
+    try:
+        metrics['variance_ratio'] = float(variance_ratio(cd, labels))
+    except:  # FIXME
+        metrics['variance_ratio'] = 0.0
+    # try:
+    #   metrics['davies_bouldin_score'] = float(
+    #       davies_bouldin_score(cd, labels))
+    # except: metrics['davies_bouldin_score'] = 0.0
+    return metrics
+
+
+def skl_clustering(cd, n_clusters=10, scorer=None, **kwargs):
+    # cd: ndarray or scipy.sparse matrix (words*disjuncts)
+    # scorer: SilhouetteScorer of cd, see optimal_clusters              # 261018
     nc = min(n_clusters, cd.shape[0])                           # 190425
     clustering = kwa(('agglomerative', 'ward'), 'clustering', **kwargs)
     if type(clustering) is str:
@@ -20,6 +100,8 @@ def skl_clustering(cd, n_clusters=10, **kwargs):
             clustering = ('agglomerative', 'ward')
         elif clustering == 'kmeans':
             clustering = ('kmeans', 'k-means++', 10)
+        elif clustering in MINI_BATCH_KMEANS:                           # 261018
+            clustering = ('mini-batch-kmeans', 'k-means++', 3, 1000)
         elif clustering in ['mean_shift', 'mean shift', 'meanshift']:
             clustering = ('mean_shift', 2)  # TODO: check (..., 'auto)
         elif clustering == 'group':  # TODO: call ILE clustering?
@@ -41,44 +123,25 @@ def skl_clustering(cd, n_clusters=10, **kwargs):
 
     try:  # if True:  #
         if clustering[0] == 'agglomerative':
-            linkage = 'ward'
-            affinity = 'euclidean'
-            connectivity = None
-            compute_full_tree = 'auto'
-            if clustering[1] in ['average', 'complete', 'single']:
-                linkage = clustering[1]
-            if len(clustering) > 2:
-                if clustering[2] in ['euclidean', 'cosine', 'manhattan']:
-                    affinity = clustering[2]
-            if len(clustering) > 3:  # connectivity
-                if type(clustering[3]) is int and clustering[3] > 0:
-                    neighbors = clustering[3]
-                    # TODO: int / dict 
-                    connectivity = kneighbors_graph(cd, neighbors,
-                                                    include_self=False)
-            if len(clustering) > 4:  # compute_full_tree
-                if clustering[4] is bool:
-                    compute_full_tree = clustering[4]
-
-            model = AgglomerativeClustering(n_clusters=nc,
-                                            linkage=linkage, affinity=affinity,
-                                            connectivity=connectivity,
-                                            compute_full_tree=compute_full_tree)
-            model.fit(cd)
+            model = agglomerative_model(cd, nc, clustering, log=metrics)
+            model.fit(dense(cd))
             labels = model.labels_
 
             # TODO: centroids = ...
 
-        elif clustering[0] in ['k-means', 'kmeans']:
-            if clustering[1] in ['k-means++']:  # 'random' - fails?
-                init = clustering[1]
+        elif clustering[0] in ['k-means', 'kmeans'] + MINI_BATCH_KMEANS:
+            if len(clustering) > 1 and clustering[1] in ['k-means++']:
+                init = clustering[1]  # 'random' - fails?
             else:
                 init = 'k-means++'
             if len(clustering) > 2 and type(clustering[2]) is int:
                 n_init = clustering[2]
             else:
                 n_init = 10
-            model = KMeans(init=init, n_clusters=nc, n_init=n_init)
+            # MiniBatchKMeans: scipy.sparse cd clustered as is          # 261018
+            model = kmeans_model(nc, init, n_init,
+                                 kwa(None, 'random_seed', **kwargs),
+                                 mini_batch_size(clustering))
             model.fit(cd)
             labels = model.labels_
             metrics['inertia'] = model.inertia_
@@ -94,30 +157,17 @@ def skl_clustering(cd, n_clusters=10, **kwargs):
                 bandwidth = 'auto'
 
             model = MeanShift(bandwidth=bandwidth)
-            model.fit(cd)
+            model.fit(dense(cd))
             labels = model.labels_
 
             centroids = np.asarray(model.cluster_centers_[:(max(labels) + 1)])
 
         else:  # TODO: random clustering?
             model = AgglomerativeClustering(linkage='ward', n_clusters=nc)
-            model.fit(cd)
+            model.fit(dense(cd))
             labels = model.labels_
 
-        try:
-            metrics['silhouette_index'] = float(
-                silhouette_score(cd, labels, metric=clustering_metric[1]))
-        except:  # FIXME
-            metrics['silhouette_index'] = 0.0
-        try:
-            metrics['variance_ratio'] = float(
-                calinski_harabaz_score(cd, labels))
-        except:  # FIXME
-            metrics['variance_ratio'] = 0.0
-        # try:
-        #   metrics['davies_bouldin_score'] = float(
-        #       davies_bouldin_score(cd, labels))
-        # except: metrics['davies_bouldin_score'] = 0.0
+        metrics.update(cluster_metrics(cd, labels, clustering_metric, scorer))
 
         return labels, metrics, centroids
     except:  # else:  # FIXME
@@ -126,7 +176,75 @@ def skl_clustering(cd, n_clusters=10, **kwargs):
                {'clustering': 'skl_clustering error'}, []
 
 
+def agglomerative_tree(cd, clustering, log=None):                       # 261018
+    """ full merge tree ⇒ (children, n_leaves): sklearn children_ merges """
+    model = agglomerative_model(cd, 1, clustering, compute_full_tree=True,
+                                log=log)
+    model.fit(dense(cd))
+    return model.children_, cd.shape[0]
+
+
+def tree_labels(children, n_leaves, n_clusters):                        # 261018
+    """ cut the merge tree ⇒ n_clusters labels (as sklearn _hc_cut): the
+        first n_leaves - n_clusters merges applied, O(n_leaves log n_leaves)
+    """
+    n_merges = min(max(n_leaves - n_clusters, 0), len(children))
+    root = np.arange(n_leaves + n_merges)
+    root[np.asarray(children[:n_merges]).ravel()] = \
+        np.repeat(np.arange(n_leaves, n_leaves + n_merges), 2)
+    while True:  # pointer jumping: merge nodes ids > children ids
+        parent = root[root]
+        if np.array_equal(parent, root):
+            break
+        root = parent
+    return np.unique(root[:n_leaves], return_inverse=True)[1]
+
+
+def agglomerative_sweep(cd, n_range, scorer=None, **kwargs):            # 261018
+    """ best silhouette agglomerative clustering for n_clusters in n_range:
+        the hierarchy does not depend on n_clusters ⇒ a single fit, a tree
+        cut for each n_clusters
+    :return: (labels, metrics, centroids) -- as skl_clustering
+    """
+    clustering = kwa(('agglomerative', 'ward'), 'clustering', **kwargs)
+    clustering_metric = kwa(('silhouette', 'euclidean'),
+                            'clustering_metric', **kwargs)
+    graph = {}  # connectivity graph method, time, recall
+    try:
+        children, n_leaves = agglomerative_tree(cd, clustering, graph)
+    except:  # FIXME
+        print('except: skl_clustering error')
+        return np.asarray(range(cd.shape[0])), \
+               {'clustering': 'skl_clustering error'}, []
+    labels, metrics = None, None
+    tested = set()
+    for n_clusters in n_range:
+        nc = min(n_clusters, n_leaves)
+        if nc in tested:
+            continue
+        tested.add(nc)
+        l = tree_labels(children, n_leaves, nc)
+        m = {'clustering': clustering}
+        m.update(graph)
+        m.update(cluster_metrics(cd, l, clustering_metric, scorer))
+        if metrics is None or m['silhouette_index'] > metrics['silhouette_index']:
+            labels, metrics = l, m
+    return labels, metrics, np.asarray([[]])
+
+
 def optimal_clusters(cd, **kwargs):
+    # Silhouette indices of all tests: a shared SilhouetteScorer        # 261018
+    clustering_metric = kwa(('silhouette', 'euclidean'),
+                            'clustering_metric', **kwargs)
+    scorer = SilhouetteScorer.from_kwargs(cd, clustering_metric[1], **kwargs)
+    labels, metrics, centroids = clusters_search(cd, scorer, **kwargs)
+    if type(metrics) is dict:
+        metrics.update({'silhouette_mode': scorer.mode,
+                        'metrics_time': round(scorer.elapsed, 3)})
+    return labels, metrics, centroids
+
+
+def clusters_search(cd, scorer=None, **kwargs):  # optimal_clusters search
     # cluster_range = kwa((2,48,1), 'cluster_range')
     algo = kwa('agglomerative', 'clustering', **kwargs)
     criteria = kwa('silhouette', 'cluster_criteria', **kwargs)
@@ -139,6 +257,8 @@ def optimal_clusters(cd, **kwargs):
             algo = ('agglomerative', 'ward')
         elif algo == 'kmeans':
             algo = ('kmeans', 'k-means++', 10)
+        elif algo in MINI_BATCH_KMEANS:                                 # 261018
+            algo = ('mini-batch-kmeans', 'k-means++', 3, 1000)
         elif algo in ['mean_shift', 'mean shift', 'meanshift']:
             algo = ('mean_shift', 2)  # ('mean_shift', 'auto')?
         elif algo == 'group':
@@ -152,46 +272,69 @@ def optimal_clusters(cd, **kwargs):
         else:
             algo = ('agglomerative', 'ward')
 
+    if algo[0] == 'agglomerative' and type(crange) in [tuple, list] \
+            and len(crange) in [2, 3, 4]:                               # 261018
+        # Same order of tests as below: middle of the range first
+        if len(crange) == 2:
+            n_range = [crange[0]]
+        else:
+            n_min = min(crange[0], crange[1])
+            n_max = max(crange[0], crange[1])
+            step = crange[2] if len(crange) == 4 else 1
+            n_range = [int((n_min + n_max) / 2)] \
+                + list(range(n_min, n_max + 1, step))
+        return agglomerative_sweep(cd, n_range, scorer,
+                                   **dict(kwargs, clustering=algo))
+
+    if kwa(None, 'random_seed', **kwargs) is not None:                  # 261018
+        # Seeded k-means: one RandomState for all tests, distinct repeats
+        kwargs = dict(kwargs, random_seed=np.random.RandomState(
+            kwargs['random_seed']))
+
     if type(crange) is int or algo[0] in ['mean_shift', 'mean shift', 'meanshift']:
-        labels, metrics, centroids = skl_clustering(cd, crange, **kwargs)
+        labels, metrics, centroids = skl_clustering(cd, crange, scorer,
+                                                    **kwargs)
 
     if type(crange) in [tuple, list]:
         if len(crange) == 1:
             if type(crange[0]) is int:
                 labels, metrics, centroids = skl_clustering(cd, crange[0],
-                                                            **kwargs)
+                                                            scorer, **kwargs)
         elif len(crange) == 2:
             if type(crange[0]) is int and type(crange[1]) is int:
                 labels, metrics, centroids = skl_clustering(cd, crange[0],
-                                                            **kwargs)
+                                                            scorer, **kwargs)
                 for n in range(crange[1] - 1):
-                    l, m, c = skl_clustering(cd, crange[0], **kwargs)
+                    l, m, c = skl_clustering(cd, crange[0], scorer, **kwargs)
                     if m['silhouette_index'] > metrics['silhouette_index']:
                         labels, metrics, centroids = l, m, c
         elif len(crange) == 3:  # TODO: replace with SGD?
             n_min = min(crange[0], crange[1])
             n_max = max(crange[0], crange[1])
             labels, metrics, centroids = \
-                skl_clustering(cd, int((n_min + n_max) / 2), **kwargs)
+                skl_clustering(cd, int((n_min + n_max) / 2), scorer,
+                               **kwargs)
             for n_clusters in range(n_min, n_max + 1):
                 for n in range(kwargs['cluster_range'][2]):
-                    l, m, c = skl_clustering(cd, n_clusters, **kwargs)
+                    l, m, c = skl_clustering(cd, n_clusters, scorer, **kwargs)
                     if m['silhouette_index'] > metrics['silhouette_index']:
                         labels, metrics, centroids = l, m, c
         elif len(crange) == 4:
             n_min = min(crange[0], crange[1])
             n_max = max(crange[0], crange[1])
             labels, metrics, centroids = \
-                skl_clustering(cd, int((n_min + n_max) / 2), **kwargs)
+                skl_clustering(cd, int((n_min + n_max) / 2), scorer,
+                               **kwargs)
             for n_clusters in range(n_min, n_max + 1, crange[2]):
                 for n in range(kwargs['cluster_range'][3]):
-                    l, m, c = skl_clustering(cd, n_clusters, **kwargs)
+                    l, m, c = skl_clustering(cd, n_clusters, scorer, **kwargs)
                     if 'silhouette_index' in m \
                             and 'silhouette_index' in metrics:
                         if m['silhouette_index'] > metrics['silhouette_index']:
                             labels, metrics, centroids = l, m, c
         else:
-            labels, metrics, centroids = skl_clustering(cd, 10, **kwargs)
+            labels, metrics, centroids = skl_clustering(cd, 10, scorer,
+                                                        **kwargs)
 
     return labels, metrics, centroids
 
@@ -204,4 +347,7 @@ def optimal_clusters(cd, **kwargs):
 # 181203 cleanup
 # 190118 cleanup: remove debug printing
 # 190425 fix n_clusters > n_words case
+# 261018 sparse cd: k-means and silhouette on csr_matrix, dense() only for
+#   agglomerative and mean shift models, sparse variance_ratio
+# 261018 agglomerative cluster_range sweep: one full tree, tree_labels cuts
 # FIXME: try...except
@@ -1,6 +1,7 @@
 # language-learner/src/grammar_learner/sparse_word_space.py             # 81114
 import numpy as np
 import pandas as pd
+from scipy.sparse import coo_matrix, issparse
 from .utl import kwa
 
 
@@ -36,29 +37,45 @@ def clean_links(links, **kwargs):
 
     feat_idx = {feature: i for i, feature in enumerate(features)}
 
-    df = links.copy()
-    if 'djlen' in df: del df['djlen']
-    df['word_id'] = df['word'].apply(lambda x: word_idx[x] if x in word_idx else -1)
-    df['feat_id'] = df['link'].apply(lambda x: feat_idx[x] if x in feat_idx else -1)
-    if 'word' in df: del df['word']
-    if 'link' in df: del df['link']
-    df = df.loc[(df['word_id'] > -1) & (df['feat_id'] > -1)] \
-        [['word_id', 'feat_id', 'count']]
+    # Integer coding in bulk: -1 for words and features filtered out  # 261018
+    word_ids = links['word'].map(word_idx).fillna(-1).values.astype(np.int64)
+    feat_ids = links['link'].map(feat_idx).fillna(-1).values.astype(np.int64)
+    counts = links['count'].values.astype(np.int64)
+    mask = (word_ids > -1) & (feat_ids > -1)
+    linx = np.column_stack((word_ids[mask], feat_ids[mask], counts[mask]))
 
-    return df.values, words, features  # <numpy.ndarray>
+    return linx, words, features  # <numpy.ndarray>
 
 
-def co_occurrence_matrix(linx, **kwargs):  # updated 81012
+def co_occurrence_matrix(linx, **kwargs):  # updated 81012, sparse 261018
     # linx == numpy.ndarray [[word_id, feature_id, count]]
+    # return: scipy.sparse.csr_matrix [words]*[links], int64 counts
     threshold = kwa(1, 'min_co-occurrence_count', **kwargs)
-    counts = np.zeros((max(linx[:, 0]) + 1, max(linx[:, 1]) + 1), dtype=np.int16)
-    for x in linx: counts[x[0], x[1]] = x[2] if x[2] >= threshold else 0
+    shape = (int(max(linx[:, 0])) + 1, int(max(linx[:, 1])) + 1)
+    linx = linx[linx[:, 2] >= threshold]
+    counts = coo_matrix((linx[:, 2].astype(np.int64), (linx[:, 0], linx[:, 1])),
+                        shape = shape, dtype = np.int64).tocsr()
+    counts.sum_duplicates()
     return counts
 
 
 def categorical_distribution(counts, **kwargs):
-    # counts: numpy.ndarray [words]*[links]
+    # counts: scipy.sparse matrix or numpy.ndarray [words]*[links]
     threshold = kwa(0.0, 'min_co-occurrence_frequency', **kwargs)
-    vsm = np.divide(counts, np.sum(counts))  # Vector Space Model
-    cd = (vsm > threshold).astype(int)  # categorical distribution
-    return cd
+    if not issparse(counts):
+        vsm = np.divide(counts, np.sum(counts))  # Vector Space Model
+        cd = (vsm > threshold).astype(int)  # categorical distribution
+        return cd
+    vsm = counts.tocsr().astype(np.float64)
+    total = vsm.sum()
+    if total > 0: vsm.data /= total
+    vsm.data = (vsm.data > threshold).astype(np.int8)
+    vsm.eliminate_zeros()
+    return vsm.astype(np.int8)  # sparse categorical distribution
+
+
+# Notes:
+
+# 261018 clean_links: bulk integer coding; co_occurrence_matrix: csr_matrix
+#   from (word, feature, count) arrays with int64 counts (int16 overflowed);
+#   categorical_distribution keeps sparse input sparse
@@ -0,0 +1,500 @@
+# language-learning/src/grammar_learner/ull_stream.py                   # 261018
+# Streaming .ull parser: files are read line by line, words and connectors
+# are interned to integer ids, (word, link) counts are accumulated directly.
+# Output: same `word`, `link`, `count` DataFrame and stats as lines2links.
+import io, os, pandas as pd
+from collections import Counter
+from itertools import chain
+from multiprocessing import Pool
+from .corpus_stats import CorpusStats
+from .utl import kwa
+
+
+def is_link(x):  # x: split line
+    return len(x) in [4, 5] and x[0].isdigit() and x[2].isdigit()
+
+
+def open_chunk(chunk):
+    """ :param chunk: file path or (path, start, end) -- byte range """
+    if type(chunk) is str:
+        return open(chunk, 'r')
+    path, start, end = chunk
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return io.TextIOWrapper(io.BytesIO(data))  # default encoding ~ open()
+
+
+def sentence_start(f, pos):  # f: binary file, pos: approximate offset
+    f.seek(pos)
+    if pos > 0: f.readline()  # skip the rest of the line
+    while True:
+        start = f.tell()
+        line = f.readline()
+        if len(line) == 0:
+            return None  # EOF
+        x = line.decode(errors = 'replace').split()
+        if len(x) > 0 and not is_link(x):
+            return start
+
+
+def file_chunks(files, workers, max_chunk = 2 ** 26):
+    """ splits input files into sentence-aligned byte range chunks
+    :param files:       list of paths to input files
+    :param workers:     number of parallel workers
+    :param max_chunk:   max chunk size, bytes
+    :return:            [path or (path, start, end)] -- read_ull chunks
+    """
+    sizes = [os.path.getsize(file) for file in files]
+    if workers < 2 or len(files) >= workers and max(sizes) <= max_chunk:
+        return list(files)
+    chunk_size = min(max(sum(sizes) // workers, 2 ** 20), max_chunk)
+    chunks = []
+    for file, size in zip(files, sizes):
+        if size <= chunk_size:
+            chunks.append(file)
+            continue
+        starts = [0]
+        with open(file, 'rb') as f:
+            for pos in range(chunk_size, size, chunk_size):
+                start = sentence_start(f, pos)
+                if start is not None and start > starts[-1]:
+                    starts.append(start)
+        chunks.extend([(file, a, b) for a, b in zip(starts, starts[1:] + [size])])
+    return chunks
+
+
+def read_ull(files, **kwargs):
+    """ yields input lines as filter_links would see them after case and WSD
+    :param files:   list of paths or (path, start, end) byte range chunks
+    :param kwargs:  parse_mode, wsd_symbol
+    :return:        generator of (line, line.split()), '' after each file
+    """
+    parse_mode = kwa('lower', 'parse_mode', **kwargs)
+    wsd_symbol = kwa('', 'wsd_symbol', **kwargs)
+    if parse_mode == 'lower':
+        case = str.lower
+    elif parse_mode == 'casefold':
+        case = str.casefold
+    else: case = None
+
+    last = ''
+    for file in files:
+        with open_chunk(file) as f:
+            for line in f:
+                x = line.split()
+                if case is not None:
+                    x = [case(w) if w != '###LEFT-WALL###' else w for w in x]
+                if wsd_symbol != '':
+                    x = [w[0] + w[1:-1].replace(wsd_symbol, '.') + w[-1]
+                         if len(w) > 2 else w for w in x]
+                if case is not None or wsd_symbol != '':
+                    line = ' '.join(x)
+                last = line
+                yield line, x
+        if len(last) > 0:
+            last = ''
+            yield '', []
+
+
+def filter_sentences(lines, rejected = None, **kwargs):
+    """ streaming filter_lines: yields accepted sentences as lists of lines
+    :param lines:       iterable of (line, line.split()) -- read_ull output
+    :param rejected:    CorpusStats to update with rejected sentences lines
+    :param kwargs:      max_sentence_length, max_unparsed_words
+    :return:            generator of [sentence, link, ...] (line, x) lists
+    """
+    max_sentence_length = kwa(99, 'max_sentence_length', **kwargs) + 1
+    max_unparsed_words = kwa(0, 'max_unparsed_words', **kwargs) + 1
+    parsed_sentence = []  # list of lines: sentence + parses
+    linked_words = set()  # linked words numbers
+    parsed_words = set()  # "parsed" (not [...]) word numbers in the sentence
+    non_parsed_words = 0
+    for line, x in chain(lines, [('', [])]):  # filter_lines appends ''
+        if len(x) in [4, 5] and x[0].isdigit() and x[2].isdigit():
+            parsed_sentence.append((line, x))
+            if int(x[0]) > 0 and x[3] != '.':
+                linked_words.add(int(x[0]))
+                linked_words.add(int(x[2]))
+        else:  # empty line or new sentence
+            if len(parsed_sentence) > 0:
+                if len(parsed_words) < max_sentence_length and \
+                        non_parsed_words + len(parsed_words - linked_words) \
+                        < max_unparsed_words:
+                    yield parsed_sentence
+                elif rejected is not None:
+                    for l, y in parsed_sentence:
+                        rejected.update(l, y)
+                parsed_sentence = []
+            if len(x) > 0:  # new sentence:
+                parsed_sentence = [(line, x)]
+                if x[-1] == '.': x = x[:-1]
+                parsed_words = set([i+1 for i, w in enumerate(x)
+                                    if w[0] != '[' and w[-1] != ']'])
+                non_parsed_words = len(x) - len(parsed_words)
+                linked_words = set()
+
+
+class LinkCounter:
+    """ Accumulates (word, link) counts over interned integer ids
+
+    context = 0: words, 1: connectors, 2+: disjuncts -- as in lines2links;
+    sentences are expected as filtered line lists (filter_sentences output).
+    Disjuncts follow mst2disjuncts: links with words missing in `vocab`
+    (sentence words with counts >= min_word_count) break the disjunct set.
+    """
+    def __init__(self, **kwargs):
+        self.context = kwa(2, 'context', **kwargs)
+        self.lw = kwa('', 'left_wall', **kwargs)
+        self.dot = kwa(False, 'period', **kwargs)
+        self.words = dict()     # word » id
+        self.word_list = []     # id » word
+        self.djs = dict()       # disjunct: tuple of connector codes » id
+        self.dj_list = []       # id » disjunct
+        self.counts = Counter()  # (word_id, link_id) » count
+        self.vocab = set()      # mst2disjuncts tokens: sentence words found
+        if self.lw not in ['', 'none']: self.vocab.add('###LEFT-WALL###')
+        if self.dot: self.vocab.add('.')
+        self.complete = False   # vocab set in advance (min_word_count > 1)
+        self.deferred = []      # link lines blocks with not seen words
+        self.wall_off = Counter()  # '###LEFT-WALL###' not found in sentences
+        self.wall_on = Counter()   # '###LEFT-WALL###' found in sentences
+
+    def set_vocab(self, tokens):  # tokens: words with counts >= min_word_count
+        self.vocab.update(tokens)
+        self.complete = True
+
+    def wid(self, word):
+        if word not in self.words:
+            self.words[word] = len(self.word_list)
+            self.word_list.append(word)
+        return self.words[word]
+
+    def djid(self, dj):
+        if dj not in self.djs:
+            self.djs[dj] = len(self.dj_list)
+            self.dj_list.append(dj)
+        return self.djs[dj]
+
+    def add_sentence(self, lines):
+        if self.context < 1:
+            self.add_pairs(lines, words = True)
+        elif self.context == 1:
+            self.add_pairs(lines)
+        elif is_link(lines[0][1]):  # links without a sentence line
+            self.add_block(lines)
+        else:
+            if not self.complete:
+                self.vocab.update(lines[0][1])
+            self.add_block(lines[1:])
+
+    def add_pairs(self, lines, words = False):  # mst2words, mst2connectors
+        for line, x in lines:
+            if len(line) > 1 and line[0].isdigit() and is_link(x):
+                left = x[1]
+                if left == '###LEFT-WALL###':
+                    if self.lw in ['', 'none']:
+                        continue
+                    else:
+                        left = self.lw
+                if not self.dot and x[3] == '.':
+                    continue
+                if words:
+                    self.counts[(self.wid(left), self.wid(x[3]))] += 1
+                else:
+                    i = self.wid(left)
+                    j = self.wid(x[3])
+                    self.counts[(j, self.djid((2*i,)))] += 1
+                    self.counts[(i, self.djid((2*j+1,)))] += 1
+
+    def add_block(self, lines):  # mst2disjuncts
+        if self.complete:
+            return self.count_djs(lines, self.counts)
+        unknown = set()
+        for line, x in lines:
+            if line[0].isdigit():  # filtered lines: links only
+                unknown.update([w for w in (x[1], x[3])
+                                if w not in self.vocab])
+        if len(unknown) == 0:
+            self.count_djs(lines, self.counts)
+        elif unknown == {'###LEFT-WALL###'}:  # resolved in links()
+            self.count_djs(lines, self.wall_off)
+            self.count_djs(lines, self.wall_on, wall = True)
+        else:  # words of later sentences? -- resolved in links()
+            self.deferred.append(lines)
+
+    def count_djs(self, lines, counts, wall = False):
+        vocab = self.vocab
+        words = dict()
+        links = dict()
+        for line, x in lines:
+            if line[0].isdigit() \
+                    and (x[1] in vocab or (wall and x[1] == '###LEFT-WALL###')) \
+                    and (x[3] in vocab or (wall and x[3] == '###LEFT-WALL###')):
+                try:
+                    i = int(x[0])
+                    j = int(x[2])
+                except: continue
+                words[i] = self.lw if x[1] == '###LEFT-WALL###' else x[1]
+                words[j] = x[3]
+                if i in links:
+                    links[i].add(j)
+                else: links[i] = set([j])
+                if j in links:
+                    links[j].add(-i)
+                else: links[j] = set([-i])
+            else:
+                self.save_djs(words, links, counts)
+                words = dict()
+                links = dict()
+        self.save_djs(words, links, counts)
+
+    def save_djs(self, words, links, counts):
+        for k, v in links.items():
+            if len(v) == 1:
+                z = list(v)[0]
+                dj = (2 * self.wid(words[abs(z)]) + (1 if z > 0 else 0),)
+            else:
+                l = sorted([x for x in v if abs(x) in words and x <= 0],
+                           reverse = True)
+                r = sorted([y for y in v if y in words and y > 0])
+                dj = tuple([2 * self.wid(words[abs(z)]) + (1 if z > 0 else 0)
+                            for z in (l + r)])
+            counts[(self.wid(words[k]), self.djid(dj))] += 1
+
+    def add(self, other):  # merge counts of another LinkCounter
+        wmap = [self.wid(w) for w in other.word_list]
+        if self.context < 1:
+            lmap = wmap
+        else:
+            lmap = [self.djid(tuple([2 * wmap[c // 2] + c % 2 for c in dj]))
+                    for dj in other.dj_list]
+        for counts, add in [(self.counts, other.counts),
+                            (self.wall_off, other.wall_off),
+                            (self.wall_on, other.wall_on)]:
+            for (w, l), c in add.items():
+                counts[(wmap[w], lmap[l])] += c
+        if not self.complete:
+            self.vocab.update(other.vocab)
+        self.deferred.extend(other.deferred)
+        return self
+
+    def link(self, dj):
+        if self.context < 1:
+            return self.word_list[dj]
+        return ' & '.join([self.word_list[c // 2] + ('+' if c % 2 else '-')
+                           for c in self.dj_list[dj]])
+
+    def resolve(self):  # count deferred blocks after the last sentence
+        if not self.complete:
+            for block in self.deferred:
+                self.count_djs(block, self.counts)
+            self.deferred = []
+            if '###LEFT-WALL###' in self.vocab:
+                self.counts.update(self.wall_on)
+            else: self.counts.update(self.wall_off)
+            self.wall_on = Counter()
+            self.wall_off = Counter()
+
+    def table(self):
+        """ :return: links DataFrame, grouped and sorted as in lines2links """
+        self.resolve()
+        items = list(self.counts.items())
+        df = pd.DataFrame(
+            {'word': [self.word_list[w] for (w, l), c in items],
+             'link': [self.link(l) for (w, l), c in items],
+             'count': [c for (w, l), c in items]},
+            columns = ['word', 'link', 'count'])
+        if self.context > 1:
+            df['djlen'] = [c * len(self.dj_list[l]) for (w, l), c in items]
+        return df.sort_values(by = ['count', 'word', 'link'],
+                              ascending = [False, True, True]) \
+            .reset_index(drop = True)
+
+    def stats(self):
+        """ :return: lines2links corpus_stats rows """
+        self.resolve()
+        total = sum(self.counts.values())
+        if self.context > 1:
+            djlen = Counter()  # disjunct length » count
+            for (w, l), c in self.counts.items():
+                djlen[len(self.dj_list[l])] += c
+            n_links = len(set([l for w, l in self.counts]))
+            stats = [
+                ['Unique disjuncts number', n_links],
+                ['Total  disjuncts count ', total],
+                ['Average disjunct count ', round(total / n_links, 1)
+                 if n_links > 0 else 0],
+                ['Average disjunct length',
+                 float(round(sum([k * v for k, v in djlen.items()]) / total,
+                             1)) if total > 0 else 0.0],
+                ['Maximum disjunct length', max(djlen) if total > 0 else 0]]
+        elif self.context == 1:
+            n_links = len(set([l for w, l in self.counts]))
+            stats = [
+                ['Unique connectors number', n_links],
+                ['Total  connectors count ', total],
+                ['Average connector count ', round(total / n_links, 1)
+                 if n_links > 0 else 0]]
+        else:
+            n_words = len(set([w for w, l in self.counts]))
+            stats = [
+                ['Unique words number', n_words],
+                ['Total  words count ', total],
+                ['Average word count ', round(total / n_words, 1)
+                 if n_words > 0 else 0]]
+        stats.extend([
+            ['Unique seeds number', len(self.counts)],
+            ['Average seed count ', round(total / len(self.counts), 1)
+             if len(self.counts) > 0 else 0]])
+        return stats
+
+
+def terms(context):  # links table type: 0 - words, 1 - connectors, 2 - disjuncts
+    return 0 if context < 1 else 1 if context == 1 else 2
+
+
+def parse_chunks(args):  # stream_counters task, run in a worker process
+    """ :param args:    (chunks, contexts, vocab, kwargs) -- contexts: list
+                        of terms; vocab: None or min_word_count filtered
+                        tokens for the 2nd pass (disjuncts only)
+        :return:        (stats, rejected, tokens, {terms: counter}, sentences)
+    """
+    chunks, contexts, vocab, kwargs = args
+    min_word_count = kwa(1, 'min_word_count', **kwargs)
+    count_tokens = 2 in contexts and min_word_count > 1 and vocab is None
+    stats = CorpusStats()
+    rejected = CorpusStats()
+    tokens = Counter()
+    counters = dict()
+    for context in contexts:
+        if vocab is None and not (context == 2 and count_tokens):
+            counters[context] = LinkCounter(**dict(kwargs, context = context))
+    if vocab is not None:  # 2nd pass
+        counters[2] = LinkCounter(**dict(kwargs, context = 2))
+        counters[2].set_vocab(vocab)
+    sentences = 0
+    for sentence in filter_sentences(read_ull(chunks, **kwargs),
+                                     rejected if vocab is None else None,
+                                     **kwargs):
+        if count_tokens:  # 1st pass: disjuncts after all tokens counted
+            tokens.update(sentence[0][1])
+        for counter in counters.values():
+            counter.add_sentence(sentence)
+        if vocab is None:
+            for line, x in sentence:
+                stats.update(line, x)
+        sentences += 1
+    return stats, rejected, tokens, counters, sentences
+
+
+def stream_counters(files, contexts, raw_stats = None, **kwargs):
+    """ single scan of input files ⇒ stats and links counters
+    :param files:       list of paths to input files
+    :param contexts:    list of links tables to count: 0 - words,
+                        1 - connectors, 2 (and more) - disjuncts
+    :param raw_stats:   CorpusStats to update with all (unfiltered) lines
+    :param kwargs:      parse_mode, wsd_symbol, max_sentence_length,
+                        max_unparsed_words, left_wall, period,
+                        min_word_count, workers -- parallel processes
+    :return:            (stats, {terms: LinkCounter}, sentences) -- filtered
+                        CorpusStats, counters by terms(context), number of
+                        filtered sentences
+    """
+    min_word_count = kwa(1, 'min_word_count', **kwargs)
+    workers = kwa(1, 'workers', **kwargs)
+    contexts = sorted(set([terms(c) for c in contexts]))
+    options = {k: v for k, v in kwargs.items() if k in [
+        'parse_mode', 'wsd_symbol', 'max_sentence_length',
+        'max_unparsed_words', 'left_wall', 'period', 'min_word_count']}
+
+    # Tasks: all files in one process or sentence-aligned chunks in a pool
+    if workers > 1:
+        tasks = [[chunk] for chunk in file_chunks(files, workers)]
+    else: tasks = [files]
+    pool = Pool(min(workers, len(tasks))) if len(tasks) > 1 else None
+
+    def run(vocab):  # results in tasks order ⇒ deterministic reduce
+        args = [(chunks, contexts, vocab, options) for chunks in tasks]
+        if pool is None:
+            return map(parse_chunks, args)
+        return pool.imap(parse_chunks, args)
+
+    def merge(counters, others):
+        for context, counter in others.items():
+            if context in counters:
+                counters[context].add(counter)
+            else: counters[context] = counter
+
+    try:
+        stats = CorpusStats()
+        rejected = CorpusStats()
+        tokens = Counter()
+        counters = dict()
+        sentences = 0
+        for _stats, _rejected, _tokens, _counters, n in run(None):
+            stats.add(_stats)
+            rejected.add(_rejected)
+            tokens.update(_tokens)
+            merge(counters, _counters)
+            sentences += n
+        if 2 in contexts and min_word_count > 1:  # 2nd pass: disjuncts
+            vocab = set([w for w, c in tokens.items() if c >= min_word_count])
+            for _, _, _, _counters, _ in run(vocab):
+                merge(counters, _counters)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    if raw_stats is not None:  # raw stats = rejected + filtered sentences
+        raw_stats.add(rejected).add(stats)
+    return stats, counters, sentences
+
+
+def stream_tables(files, contexts, raw_stats = None, **kwargs):
+    """ streaming, integer-interned replacement of filter_lines + lines2links
+        for several links tables (see stream_counters) in a single scan
+    :return:    {context: (links, re)} -- links DataFrame and lines2links
+                response for each of contexts
+    """
+    stats, counters, sentences = \
+        stream_counters(files, contexts, raw_stats, **kwargs)
+    tables = dict()
+    for context in contexts:
+        if sentences < 1:
+            df = pd.DataFrame(columns = ['word', 'link'])
+            tables[context] = (df, {'filter_lines_error': 'empty_filtered_set'})
+        else:
+            re = stats.response()
+            re['corpus_stats'].extend(counters[terms(context)].stats())
+            tables[context] = (counters[terms(context)].table(), re)
+    return tables
+
+
+def stream_links(files, raw_stats = None, **kwargs):
+    """ streaming, integer-interned replacement of filter_lines + lines2links
+    :param files:       list of paths to input files
+    :param raw_stats:   CorpusStats to update with all (unfiltered) lines
+    :param kwargs:      context and stream_counters kwargs
+    :return:            (links, re): DataFrame, {'corpus_stats': [...]}
+    """
+    context = kwa(2, 'context', **kwargs)
+    return stream_tables(files, [context], raw_stats, **kwargs)[context]
+
+
+# Notes:
+
+# 261018 stream_links: streaming filter_lines + lines2links, integer-interned
+#   words, connectors and disjuncts, Counter of (word_id, link_id) pairs.
+#   min_word_count > 1 with disjuncts: second pass over files after counting
+#   tokens; otherwise link blocks with words not yet seen are deferred,
+#   blocks with '###LEFT-WALL###' links are counted both ways until the end.
+# 261018 raw_stats: unfiltered corpus stats in the same pass (filter_links):
+#   rejected sentences stats + filtered stats, each line is counted once;
+#   lines are split once and passed on as (line, tokens) pairs.
+# 261018 workers > 1: files or sentence-aligned byte range chunks of large
+#   files are parsed in a process pool; partial stats, token and link counts
+#   are merged in chunks order, words and links re-interned by LinkCounter.add
+# 261018 stream_counters, stream_tables: several links tables (connectors,
+#   disjuncts, words) from a single scan, only requested tables are built
@@ -4,6 +4,7 @@ import os, linkgrammar
 from collections import OrderedDict
 from copy import deepcopy
 from .utl import UTC
+from .category_store import CategoryStore
 
 def list2file(lst, out_file):
     string = ''
@@ -75,8 +76,10 @@ def rules2list(rules_dict, grammar_rules = 2, verbose = 'none'):
 
 def save_link_grammar(rules, output_grammar, grammar_rules = 2,
                       header = '', footer = ''):  # legacy FIXME:DEL?
-    # rules: [] or {}
+    # rules: [] or {} or CategoryStore
     # grammar_rules = kwargs['grammar_rules']: 1 ⇒ connectors, 2+ ⇒ disjuncts
+    if isinstance(rules, CategoryStore):                                # 261018
+        rules = rules.to_dict()
     if type(rules) is dict:
         rules = rules2list(rules, grammar_rules)
 
@@ -179,7 +182,9 @@ def save_category_tree(category_list, tree_file, verbose = 'none'):
 
 
 def save_cat_tree(cats, output_categories, verbose = 'none'):
-    # cats: {'cluster':[], 'words':[], ...}
+    # cats: {'cluster':[], 'words':[], ...} or CategoryStore
+    if isinstance(cats, CategoryStore):                                 # 261018
+        cats = cats.to_dict()
     tree_file = output_categories
     if os.path.isdir(tree_file):  # received directory ⇒ auto file name
         if tree_file[-1] != '/': tree_file += '/'
@@ -1,6 +1,8 @@
 from .grammartester import *
 from .parsevaluate import *
 from .lginprocparser import *
+from .lgworkerpool import *
+from .lgparserbase import *
 from .lgapiparser import *
 from .lgmisc import *
 from .parsestat import *
@@ -13,6 +15,8 @@ __all__ = []
 __all__.extend(grammartester.__all__)
 __all__.extend(parsevaluate.__all__)
 __all__.extend(lginprocparser.__all__)
+__all__.extend(lgworkerpool.__all__)
+__all__.extend(lgparserbase.__all__)
 __all__.extend(lgapiparser.__all__)
 __all__.extend(lgmisc.__all__)
 __all__.extend(parsestat.__all__)
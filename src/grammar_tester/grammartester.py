@@ -20,6 +20,7 @@ from .textfiledashb import TextFileDashboardConf  # , HTMLFileDashboard
 from .lgmisc import create_grammar_dir, get_output_suffix
 
 from .lginprocparser import LGInprocParser
+from .lgapiparser import LGApiParser
 
 
 __all__ = ['test_grammar', 'GrammarTester', 'GrammarTestError']
@@ -32,6 +33,7 @@ CONF_MIN_WORD_CNT = "min_word_count"
 CONF_MAX_SENT_LEN = "max_sentence_len"
 CONF_STOP_TOKENS = "stop_tokens"
 CONF_WORD_CNT_PATH = "word_count_path"
+CONF_WORKERS = "workers"
 
 # on_corpus_file() argument list indexes
 # [dest_path, lang_path, dict_path, corpus_path, output_path, reference_path]
@@ -274,16 +276,19 @@ class GrammarTester(AbstractGrammarTestClient):
         if dict_path == output_path:
             self._options &= (~BIT_DPATH_CREATE)
 
-        # Count total number of sentences across all corpus files
-        self._total_sentences = get_corpus_sentence_count(corpus_path, self._options)
-
         # Either count or load token appearance data if min_word_count is specified
-        if self._test_kwargs.get("min_word_count", 0) > 1:
+        use_token_counts = self._test_kwargs.get("min_word_count", 0) > 1
+        cnt_path = self._test_kwargs.get(CONF_WORD_CNT_PATH, None) if use_token_counts else None
+
+        # Count total number of sentences across all corpus files, token appearances are counted in the same pass
+        self._total_sentences = get_corpus_sentence_count(corpus_path, self._options,
+                                                          self._token_counts if use_token_counts and cnt_path is None
+                                                          else None)
 
-            cnt_path = self._test_kwargs.get(CONF_WORD_CNT_PATH, None)
+        if use_token_counts:
 
-            self._token_counts = count_tokens(corpus_path, self._options) if cnt_path is None \
-                else load_token_counts(cnt_path)
+            if cnt_path is not None:
+                self._token_counts = load_token_counts(cnt_path)
 
             # self._logger.debug(self._token_counts)
             self._test_kwargs["token_counts"] = self._token_counts
@@ -331,7 +336,8 @@ class GrammarTester(AbstractGrammarTestClient):
 
 
 def test_grammar(corpus_path: str, output_path: str, dict_path: str, grammar_path: str, template_path: str,
-                       linkage_limit: int, options: int, reference_path: str, timeout: int=1, **kwargs) \
+                       linkage_limit: int, options: int, reference_path: str, timeout: int=1, workers: int=1,
+                       **kwargs) \
         -> (Decimal, Decimal, Decimal, Decimal):
     """
     Test grammar(s) over specified corpus providing numerical estimation of parsing quality.
@@ -347,10 +353,12 @@ def test_grammar(corpus_path: str, output_path: str, dict_path: str, grammar_pat
                             quality estimation.
     :param timeout:         Timeout value used by Link Grammar to restrict maximum amount of time spent for parsing
                             a single sentence.
+    :param workers:         Number of link-parser processes each corpus file is parsed with concurrently. The file
+                            is split into sentence aligned shards, one per process. If BIT_LG_EXE is not set, number
+                            of Link Grammar API worker processes.
     :return:                (parse-ability, F1, precision, recall)
     """
-    # parser = LGInprocParser(linkage_limit) if options & BIT_LG_EXE else LGApiParser(linkage_limit)
-    parser = LGInprocParser(linkage_limit, timeout)
+    parser = LGInprocParser(linkage_limit, timeout) if options & BIT_LG_EXE else LGApiParser(linkage_limit, timeout)
 
     gt = GrammarTester(grammar_path, template_path, linkage_limit, parser)
 
@@ -358,10 +366,17 @@ def test_grammar(corpus_path: str, output_path: str, dict_path: str, grammar_pat
 
     logger = logging.getLogger("test_grammar")
 
+    kwargs[CONF_WORKERS] = workers
+
     logger.debug(kwargs)
 
-    # pm, pq = gt.test(dict_path, corpus_path, output_path, reference_path, options, None)
-    pm, pq = gt.test(dict_path, corpus_path, output_path, reference_path, options, TextProgress, **kwargs)
+    try:
+        # pm, pq = gt.test(dict_path, corpus_path, output_path, reference_path, options, None)
+        pm, pq = gt.test(dict_path, corpus_path, output_path, reference_path, options, TextProgress, **kwargs)
+
+    finally:
+        # Terminate persistent link-parser/worker processes if any
+        parser.close()
 
     return \
         pm.parseability(pm), \
@@ -7,6 +7,8 @@ from ..common.cliutils import handle_path_string, strip_quotes
 from ..common.absclient import AbstractPipelineComponent
 from .artificialparser import SequentialParser, RandomParser
 from .lginprocparser import LGInprocParser
+from .lgapiparser import LGApiParser
+from .lgparserbase import LGParserBase
 from .grammartester import GrammarTester
 
 __all__ = ['GrammarTesterComponent']
@@ -24,7 +26,8 @@ CONF_TIMEOUT = "timeout"
 class GrammarTesterComponent(AbstractPipelineComponent):
 
     parser_types = {
-        "random": RandomParser, "sequential": SequentialParser, "link-grammar-exe": LGInprocParser
+        "random": RandomParser, "sequential": SequentialParser, "link-grammar-exe": LGInprocParser,
+        "link-grammar-api": LGApiParser
     }
 
     def __init__(self, **kwargs):
@@ -38,6 +41,7 @@ class GrammarTesterComponent(AbstractPipelineComponent):
 
         # Create parser instance
         parser = parser_type(kwargs.get(CONF_LNK_LIMIT, 100), kwargs.get(CONF_TIMEOUT, 1))
+        self.parser = parser
 
         # Create GrammarTester instance
         self.tester = GrammarTester(handle_path_string(kwargs.get(CONF_GRMR_PATH, r"~/data/dict")),
@@ -78,11 +82,17 @@ class GrammarTesterComponent(AbstractPipelineComponent):
         if ref_path:
             ref_path = handle_path_string(ref_path)
 
-        pa, pq = self.tester.test(dict_path,
-                         handle_path_string(kwargs.pop(CONF_CORP_PATH)),
-                         handle_path_string(kwargs.pop(CONF_DEST_PATH, os.environ['PWD'])),
-                         ref_path,
-                         options, TextProgress, **kwargs)
+        try:
+            pa, pq = self.tester.test(dict_path,
+                             handle_path_string(kwargs.pop(CONF_CORP_PATH)),
+                             handle_path_string(kwargs.pop(CONF_DEST_PATH, os.environ['PWD'])),
+                             ref_path,
+                             options, TextProgress, **kwargs)
+
+        finally:
+            # Terminate persistent link-parser/worker processes if any
+            if isinstance(self.parser, LGParserBase):
+                self.parser.close()
 
         return {"parseability": pa.parseability_str(pa), "PA": pa.parseability_str(pa), "F1": pq.f1_str(pq),
                 "recall": pq.recall_str(pq), "precision": pq.precision_str(pq), "PT": pa.parse_time_str(pa)}
@@ -1,152 +1,324 @@
-import re
+import os
 import sys
-from linkgrammar import LG_DictionaryError, LG_Error, ParseOptions, Dictionary, Sentence
+import logging
+from collections import OrderedDict, deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Iterable, Iterator, Optional, Union, Tuple
+
+import linkgrammar
+from linkgrammar import LG_Error, ParseOptions, Dictionary, Sentence, Clinkgrammar as clg
 
 from ..common.optconst import *
+from ..common.absclient import AbstractProgressClient
 from ..common.parsemetrics import ParseMetrics, ParseQuality
-from .parsestat import parse_metrics, parse_quality
-from .psparse import parse_postscript, prepare_tokens, get_link_set
-from .lgmisc import get_output_suffix, print_output
-from ..common.absclient import AbstractFileParserClient
-from .parsevaluate import load_parses
+from ..common.corpusfilter import CorpusFilter
+from .psparse import parse_linkage
+from .lgmisc import LGParseError
+from .parsevaluate import load_parses, EvalError
+from .linkgrammarver import get_lg_dict_version
+from .lgparserbase import LGParserBase
 
+"""
+    Link Grammar parser running in the same process by means of 'linkgrammar' Python bindings.
 
-__all__ = ['LGApiParser']
+    Dictionaries are loaded once per process and kept in LRU cache for subsequent corpus files. Tokens and links
+    are taken directly from Linkage objects instead of printing and parsing postscript notation.
+"""
 
+__all__ = ['LGApiParser', 'get_dictionary', 'parse_sentences']
 
-class LGApiParser(AbstractFileParserClient):
 
-    def __init__(self, limit: int=1000):
-        self._linkage_limit = limit
+DICT_CACHE_SIZE = 4
 
-    def parse(self, dict_path: str, corpus_path: str, output_path: str, ref_path: str, options: int) \
-            -> (ParseMetrics, ParseQuality):
-        """
-        Link Grammar API parser invokation routine.
-
-        :param dict_path:       Dictionary file or directory path.
-        :param corpus_path:     Corpus file or directory path.
-        :param output_path:     Output file or directory path.
-        :param ref_path:        Reference file or directory path.
-        :param options:         Bit field. See `optconst.py` for details
-        :return:                Tuple (ParseMetrics, ParseQuality)
-        """
-        input_file_handle = None
-        output_file_handle = None
+# Sentence count value reported by Link Grammar in case of combinatorial explosion (INT_MAX)
+LG_COUNT_OVERFLOW = 2147483647
 
-        ref_parses = []
+_dict_cache = OrderedDict()
 
-        # Sentence statistics variables
-        total_metrics, total_quality = ParseMetrics(), ParseQuality()
 
-        sentence_count = 0                  # number of sentences in the corpus
+def get_dict_mtime(dict_path: str) -> Optional[float]:
+    """
+    Return modification time of the dictionary files
 
-        print("Info: Parsing a corpus file: '" + corpus_path + "'")
-        print("Info: Using dictionary: '" + dict_path + "'")
+    :param dict_path:   Dictionary directory path or language name.
+    :return:            Latest modification time of the dictionary directory files, None if the path does not exist
+                        (e.g. the dictionary is specified by language name).
+    """
+    if os.path.isdir(dict_path):
+        return max([entry.stat().st_mtime for entry in os.scandir(dict_path) if entry.is_file()],
+                   default=os.path.getmtime(dict_path))
 
-        if output_path is not None:
-            print(f"Info: Parses are saved in: '{output_path}'")
-        else:
-            print("Info: Output file name is not specified. Parses are redirected to 'stdout'.")
+    return os.path.getmtime(dict_path) if os.path.exists(dict_path) else None
 
-        try:
-            if options & BIT_PARSE_QUALITY and ref_path is not None:
-                ref_parses = load_parses(ref_path)
 
-            link_line = re.compile(r"\A[0-9].+")
+def get_dictionary(dict_path: str) -> Dictionary:
+    """
+    Return Dictionary instance, loading it only if the dictionary is not cached yet or it has been changed since.
+
+    :param dict_path:   Dictionary directory path or language name.
+    :return:            Dictionary instance.
+    """
+    key = (dict_path, get_dict_mtime(dict_path))
+
+    dictionary = _dict_cache.get(key, None)
+
+    if dictionary is not None:
+        _dict_cache.move_to_end(key)
+        return dictionary
+
+    # Previously loaded version of the same dictionary is no longer valid
+    for stale in [k for k in _dict_cache.keys() if k[0] == dict_path]:
+        del _dict_cache[stale]
+
+    dictionary = _dict_cache[key] = Dictionary(dict_path)
+
+    while len(_dict_cache) > DICT_CACHE_SIZE:
+        _dict_cache.popitem(last=False)
+
+    return dictionary
+
+
+def parse_sentence(text: str, dictionary: Dictionary, po: ParseOptions, options: int) \
+        -> Union[None, str, Tuple[List[str], List[Tuple[int, int]]]]:
+    """
+    Parse single sentence and return the first linkage.
+
+    :param text:        Sentence text.
+    :param dictionary:  Dictionary instance.
+    :param po:          ParseOptions instance.
+    :param options:     Bit mask representing parsing options.
+    :return:            Linkage text if output format other than ULL is specified, (tokens, links) tuple if ULL
+                        output is specified, None if there is no linkage or the linkage is excluded by options.
+    """
+    sent = Sentence(text, dictionary, po)
+    linkages = sent.parse()
+
+    # Same exclusion rules as link-parser output warnings are checked against
+    if options & (BIT_EXCLUDE_TIMEOUTED | BIT_EXCLUDE_PANICED) and clg.parse_options_timer_expired(po._obj) \
+            or options & BIT_EXCLUDE_EXPLOSION and clg.sentence_num_linkages_found(sent._obj) >= LG_COUNT_OVERFLOW:
+        return None
+
+    # Only the first linkage is counted.
+    linkage = next(iter(linkages), None)
+
+    if linkage is None:
+        return None
+
+    if (options & BIT_OUTPUT_DIAGRAM) == BIT_OUTPUT_DIAGRAM:
+        return linkage.diagram()
+
+    elif (options & BIT_OUTPUT_POSTSCRIPT) == BIT_OUTPUT_POSTSCRIPT:
+        return linkage.postscript()
+
+    elif (options & BIT_OUTPUT_CONST_TREE) == BIT_OUTPUT_CONST_TREE:
+        return linkage.constituent_tree()
 
-            po = ParseOptions(min_null_count=0, max_null_count=999)
-            po.linkage_limit = self._linkage_limit
+    lkg = linkage._obj
 
-            di = Dictionary(dict_path)
+    words = [clg.linkage_get_word(lkg, i) for i in range(clg.linkage_get_num_words(lkg))]
+    links = [(clg.linkage_get_link_lword(lkg, i), clg.linkage_get_link_rword(lkg, i),
+              clg.linkage_get_link_llabel(lkg, i)) for i in range(clg.linkage_get_num_links(lkg))]
 
-            input_file_handle = open(corpus_path)
-            output_file_handle = sys.stdout if output_path is None \
-                                            else open(output_path, "w")
+    tokens, links = parse_linkage(words, links, options)
 
-            for line in input_file_handle:
+    if not len(tokens):
+        raise LGParseError(f"No tokens for sentence: '{text}'")
 
-                # Filter out links when ULL parses are used as input
-                if options & BIT_ULL_IN > 0 and link_line.match(line):
-                    continue
+    return tokens, links
 
-                # Skip empty lines to get proper statistics estimation and skip commented lines
-                if len(line.strip()) < 1:  # or line.startswith("#"):
-                    continue
 
-                # Tokenize and parse the sentence
-                sent = Sentence(line, di, po)
-                linkages = sent.parse()
+def parse_sentences(dict_path: str, sentences: List[str], options: int, limit: int, timeout: int) \
+        -> List[Union[None, str, Tuple[List[str], List[Tuple[int, int]]]]]:
+    """
+    Parse a list of sentences with the cached dictionary. Module level function to be run by worker processes.
 
-                sent_metrics, sent_quality = ParseMetrics(), ParseQuality()
-                linkage_count = 0
+    :param dict_path:   Dictionary directory path or language name.
+    :param sentences:   List of sentences.
+    :param options:     Bit mask representing parsing options.
+    :param limit:       Linkage limit.
+    :param timeout:     Maximum amount of time in seconds spent for parsing a single sentence.
+    :return:            List of parse_sentence() results, one per sentence.
+    """
+    try:
+        dictionary = get_dictionary(dict_path)
 
-                for linkage in linkages:
+        po = ParseOptions(min_null_count=0, max_null_count=999, linkage_limit=limit, max_parse_time=timeout,
+                          display_morphology=False, verbosity=0)
 
-                    # Only the first linkage is counted.
-                    if linkage_count == 1:
-                        break
+        return [parse_sentence(text, dictionary, po, options) for text in sentences]
 
-                    if (options & BIT_OUTPUT_DIAGRAM) == BIT_OUTPUT_DIAGRAM:
-                        print(linkage.diagram(), file=output_file_handle)
+    except LG_Error as err:
+        raise LGParseError(f"{type(err).__name__}: {err}")
 
-                    elif (options & BIT_OUTPUT_POSTSCRIPT) == BIT_OUTPUT_POSTSCRIPT:
-                        print(linkage.postscript(), file=output_file_handle)
 
-                    elif (options & BIT_OUTPUT_CONST_TREE) == BIT_OUTPUT_CONST_TREE:
-                        print(linkage.constituent_tree(), file=output_file_handle)
+class LGApiParser(LGParserBase):
+    """
+    Link Grammar API parser. Sentences are parsed either in the current process or, if 'workers' argument is
+        greater than one, by a pool of processes which is kept alive (as well as the dictionaries loaded by them)
+        until close() is called.
+    """
+    CHUNK_SIZE = 100
 
-                    elif not (options & BIT_OUTPUT):
+    def __init__(self, limit: int = 100, timeout=1, verbosity=1):
+        super().__init__()
+        self._linkage_limit = limit
+        self._timeout = timeout
+        self._lg_verbosity = verbosity
+        self._lg_version = linkgrammar.__version__
+        self._executor = None
+        self._executor_size = 0
+
+    def __del__(self):
+        self.close()
+
+    def close(self) -> None:
+        """ Terminate worker processes if any """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor, self._executor_size = None, 0
+
+    def _parse_pooled(self, dict_path: str, sentences: List[str], workers: int, options: int) \
+            -> Iterator[Union[None, str, Tuple[List[str], List[Tuple[int, int]]]]]:
+        """
+        Parse sentences in chunks by worker processes and yield the results in sentence order.
+
+        :param dict_path:   Dictionary directory path or language name.
+        :param sentences:   List of sentences.
+        :param workers:     Number of worker processes.
+        :param options:     Bit mask representing parsing options.
+        :return:            Iterator of parse_sentence() results.
+        """
+        if self._executor_size != workers:
+            self.close()
+            self._executor, self._executor_size = ProcessPoolExecutor(workers), workers
+
+        chunks = (sentences[i:i + LGApiParser.CHUNK_SIZE] for i in range(0, len(sentences), LGApiParser.CHUNK_SIZE))
+        futures = deque()
+
+        def submit() -> None:
+            for chunk in islice(chunks, 1):
+                futures.append(self._executor.submit(parse_sentences, dict_path, chunk, options,
+                                                     self._linkage_limit, self._timeout))
+
+        # Keep at most two chunks per worker in progress not to hold the whole output in memory
+        for _ in range(2 * workers):
+            submit()
+
+        while len(futures):
+            results = futures.popleft().result()
+            submit()
+            yield from results
+
+    def parse(self, dict_path: str, corpus_path: str, output_path: str, ref_file: str, options: int,
+              progress: AbstractProgressClient = None, **kwargs) -> (ParseMetrics, ParseQuality):
+        """
+        Link Grammar API parser invocation routine.
+
+        :param dict_path:       Name or path to the dictionary.
+        :param corpus_path:     Path to the test text file.
+        :param output_path:     Output file path.
+        :param ref_file:        Reference file path.
+        :param options:         Bit mask representing parsing options.
+        :param progress:        Progress instance reference.
+        :param kwargs:          Optional parameters: 'stop_tokens', 'max_sentence_len', 'min_word_count',
+                                    'token_counts', 'workers' - number of processes to parse sentences with
+                                    concurrently.
+        :return:                Tuple (ParseMetrics, ParseQuality).
+        """
+        if progress is None:
+            self._logger.info("Link Grammar version: {}".format(self._lg_version))
 
-                        tokens, links = parse_postscript(linkage.postscript().replace("\n", ""), options)
+        if not (options & BIT_EXISTING_DICT):
+            dict_ver = get_lg_dict_version(dict_path)
 
-                        # Print ULL formated parses
-                        print_output(tokens, links, options, output_file_handle)
+            self._logger.debug(f"Dictionary version: {dict_ver}, Link Grammar version: {self._lg_version}")
 
-                        # Calculate parseability
-                        sent_metrics += parse_metrics(prepare_tokens(tokens, options))
+            if dict_ver != "sql-dict" and dict_ver != "0.0.0" and (self._lg_version < "5.5.0" and dict_ver >= "5.5.0" or
+                    self._lg_version >= "5.5.0" and dict_ver < "5.5.0"):
+                raise LGParseError(f"Wrong dictionary version: {dict_ver}, expected: {self._lg_version}")
 
-                        # Calculate parse quality if the option is set
-                        if options & BIT_PARSE_QUALITY and len(ref_parses):
-                            sent_quality += parse_quality(get_link_set(tokens, links, options),
-                                                          ref_parses[sentence_count][1])
+        # Issue #184 modifications
+        self._set_sentence_filters(**kwargs)
+
+        workers = kwargs.get("workers", 1) or 1
+
+        bar = None
+
+        if progress is None:
+            self._logger.info(f"Parsing a corpus file: '{corpus_path}'")
+            self._logger.info(f"Using dictionary: '{dict_path}'")
+
+            if output_path is not None:
+                self._logger.info(f"Parses are saved in: '{output_path}'")
+            else:
+                self._logger.info("Output file name is not specified. Parses are redirected to 'stdout'.")
+
+            if ref_file is not None:
+                self._logger.info(f"Reference file: '{ref_file}'")
+            else:
+                self._logger.info("Reference file name is not specified. Parse quality is not calculated.")
+
+        out_stream = None
+        ret_metrics = ParseMetrics()
+        ret_quality = ParseQuality()
+
+        def update_progress(increment: int) -> None:
+            if progress is not None:
+                progress.update(increment)
+
+            if bar is not None:
+                bar.update(increment)
+
+        try:
+            # The same lines are filtered out as sed does for link-parser
+            sentences = [line.rstrip("\n") for line in CorpusFilter(options).lines(corpus_path)]
 
-                    linkage_count += 1
+            sentence_count = len(sentences)
 
-                assert sent_metrics.average_parsed_ratio <= 1.0, "sent_metrics.average_parsed_ratio > 1.0"
-                assert sent_quality.quality <= 1.0, "sent_quality.quality > 1.0"
+            if progress is not None:
+                progress_type = type(progress)
+                bar = progress_type(total=sentence_count, desc=os.path.split(corpus_path)[1],
+                                    unit="sentences", leave=True)
+            else:
+                self._logger.info(f"Number of sentences: {sentence_count}")
 
-                total_metrics += sent_metrics
-                total_quality += sent_quality
+            out_stream = sys.stdout if output_path is None \
+                else open(output_path, "w", encoding="utf-8")
 
-                # if not linkage_count:
-                #     sent_metrics.completely_unparsed_ratio += 1
+            parses = self._parse_pooled(dict_path, sentences, workers, options) if workers > 1 and sentence_count > 1 \
+                else parse_sentences(dict_path, sentences, options, self._linkage_limit, self._timeout)
 
-                sentence_count += 1
+            # Parse only if 'ull' output format is specified.
+            if not (options & BIT_OUTPUT):
 
-            total_metrics.sentences = sentence_count
-            total_quality.sentences = sentence_count
+                ref_parses = load_parses(ref_file) if options & BIT_PARSE_QUALITY and ref_file is not None else []
 
-            # Prevent interleaving "Dictionary close" messages
-            ParseOptions(verbosity=0)
+                if options & BIT_PARSE_QUALITY and ref_file is not None and len(ref_parses) != sentence_count:
+                    raise LGParseError("Number of sentences in corpus and reference files missmatch. "
+                                       "Reference file '{}' does not match "
+                                       "its corpus counterpart {} != {}.".format(ref_file, len(ref_parses),
+                                                                                 sentence_count))
 
-        except LG_DictionaryError as err:
-            print("LG_DictionaryError: " + str(err))
+                ret_metrics, ret_quality = self._handle_parses(parses, options, out_stream, ref_parses,
+                                                               update_progress)
 
-        except LG_Error as err:
-            print("LG_Error: " + str(err))
+            # If output format is other than ull then simply write linkage text to the output stream.
+            else:
+                for text in parses:
+                    if text is not None:
+                        print(text, file=out_stream)
 
-        except IOError as err:
-            print("IOError: " + str(err))
+                    update_progress(1)
 
-        except FileNotFoundError as err:
-            print("FileNotFoundError: " + str(err))
+        except EvalError as err:
+            raise LGParseError(err)
 
         finally:
-            if input_file_handle is not None:
-                input_file_handle.close()
+            if bar is not None:
+                del bar
 
-            if output_file_handle is not None and output_file_handle != sys.stdout:
-                output_file_handle.close()
+            if out_stream is not None and out_stream != sys.stdout:
+                out_stream.close()
 
-            return total_metrics, total_quality
+        return ret_metrics, ret_quality
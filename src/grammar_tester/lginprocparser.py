@@ -1,12 +1,15 @@
 import sys
 import os
+import io
 import re
 import logging
+from tempfile import TemporaryFile
 from subprocess import PIPE, Popen
+from typing import Iterable, Iterator, List
+from itertools import chain
 
-from ..common.absclient import AbstractFileParserClient, AbstractProgressClient
-from ..common.sentencecount import get_sentence_count
-from ..common.sedcommands import get_sed_cmd_common_part
+from ..common.absclient import AbstractProgressClient
+from ..common.corpusfilter import CorpusFilter
 from ..common.tokencount import unbox_tokens
 from .psparse import *
 from .parsestat import *
@@ -15,6 +18,8 @@ from .lgmisc import *
 from .parsevaluate import load_parses, tokenize_sentence, unbox_tokens, EvalError
 from .lgpcommands import *
 from .linkgrammarver import get_lg_version, get_lg_dict_version
+from .lgworkerpool import LGWorkerPool
+from .lgparserbase import LGParserBase
 
 
 __all__ = ['LGInprocParser']
@@ -35,12 +40,10 @@ class PSSentence:
         return ret
 
 
-class LGInprocParser(AbstractFileParserClient):
-
-    MAX_SENTENCE_LENGTH = 99999
+class LGInprocParser(LGParserBase):
 
     def __init__(self, limit: int = 100, timeout=1, verbosity=1):
-        self._logger = logging.getLogger("LGInprocParser")
+        super().__init__()
         self._linkage_limit = limit
         self._timeout = timeout
         self._out_stream = None
@@ -48,10 +51,13 @@ class LGInprocParser(AbstractFileParserClient):
         self._counter = 0
         self._lg_version, self._lg_dict_path = get_lg_version()
         self._lg_verbosity = verbosity
-        self._stop_tokens_set = None
-        self._min_word_count = 0
-        self._max_sentence_len = LGInprocParser.MAX_SENTENCE_LENGTH
-        self._token_counts = None
+        self._pool = None
+
+    def close(self) -> None:
+        """ Terminate persistent link-parser processes if any """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
 
     def _parse_batch_ps_output(self, text: str, options: int) -> list:
         """
@@ -64,22 +70,74 @@ class LGInprocParser(AbstractFileParserClient):
         :return:            List of PSSentence.
 
         """
-        sentences = []
-
         pos = skip_command_response(text)
         end = trim_garbage(text)
 
         if pos > end:
             end = text.rfind("No complete linkages found.")
 
+        pattern = re.compile(r"\n\n[^\s]", re.M)
+
+        return list(self._parse_ps_blocks(re.split(pattern, text[pos:end]), options))
+
+    @staticmethod
+    def _split_ps_stream(lines: Iterable[str]) -> Iterator[str]:
+        """
+        Split link-parser output into text blocks separated by empty lines, the way _parse_batch_ps_output() splits
+            the whole output text. Each block is yielded as soon as the next one starts, so only one block is kept
+            in memory at a time.
+
+        :param lines:       Iterable of link-parser output lines (e.g. stdout stream opened in text mode).
+        :return:            Iterator of text blocks.
+        """
+        lines = iter(lines)
+
+        # Skip command response
+        for line in lines:
+            line = line.rstrip("\r\n")
+
+            if len(line) and not (line.startswith("Debug:") or line.find(" set to ") >= 0):
+                break
+        else:
+            return
+
+        block, prev_empty = [line], False
+
+        for line in lines:
+            line = line.rstrip("\r\n")
+
+            # Empty line followed by a line which starts with non-space character means the beginning of a new block
+            if prev_empty and not line[:1].isspace() and len(line):
+                yield "\n".join(block)
+                block = []
+
+            block.append(line)
+            prev_empty = not len(line)
+
+        # Strip garbage following the last postscript linkage as well as link-parser farewell
+        text = "\n".join(block)
+        end = trim_garbage(text) if text.find("]") > 0 else text.rfind("Bye.")
+        text = text[:end] if end >= 0 else text
+
+        if len(text.strip()):
+            yield text
+
+    def _parse_ps_blocks(self, blocks: Iterable[str], options: int) -> Iterator[PSSentence]:
+        """
+        Parse postscript text blocks, returned by link-parser, into sentences. Each sentence is followed by zero
+            or many postscript notated linkages. A sentence is yielded as soon as the next one is found or
+            the blocks are over.
+
+        :param blocks:      Iterable of text blocks.
+        :param options:     Parsing options.
+        :return:            Iterator of PSSentence.
+        """
         validity_mask = (options & (BIT_EXCLUDE_TIMEOUTED | BIT_EXCLUDE_PANICED | BIT_EXCLUDE_EXPLOSION))
 
         prev_sent = None
 
-        pattern = re.compile(r"\n\n[^\s]", re.M)
-
         # Parse output to get sentences and linkages in postscript notation
-        for block in re.split(pattern, text[pos:end]):  # text[pos:end].split("\n\n"):
+        for block in blocks:
 
             block = block.strip()
 
@@ -106,11 +164,14 @@ class LGInprocParser(AbstractFileParserClient):
 
                 # Check if it's a new sentence or just another linkage
                 if sentence is not None:
-                    # If the text block is a sentence then add another sentence to the sentence list.
+                    # The previous sentence is complete as soon as the next one is found
+                    if prev_sent is not None:
+                        yield prev_sent
+
+                    # If the text block is a sentence then create another sentence.
                     #   The linkage will be added to the newly created sentence.
                     cur_sent = PSSentence(sentence)
                     cur_sent.valid = is_valid
-                    sentences.append(cur_sent)
 
                 else:
                     # If the text block is another linkage then it will be added to the previous sentence
@@ -129,19 +190,34 @@ class LGInprocParser(AbstractFileParserClient):
 
                 prev_sent = cur_sent
 
-        return sentences
+        if prev_sent is not None:
+            yield prev_sent
+
+    def _handle_sentences(self, sentences: Iterable[PSSentence], options: int, out_stream, ref_parses: list,
+                          progress=None) -> (ParseMetrics, ParseQuality):
+        """
+        Print out ULL-formatted linkages and estimate statistics sentence by sentence.
+
+        :param sentences:   Iterable of PSSentence.
+        :param options:     Integer variable with multiple bit fields.
+        :param out_stream:  Output file stream handle.
+        :param ref_parses:  List of reference parses, loaded with load_parses(). Empty list if not specified.
+        :param progress:    Callable taking increment value to report progress after each sentence or None.
+        :return:            Tuple (ParseMetrics, ParseQuality)
+        """
+        def get_parse(sent: PSSentence):
+            if not len(sent.linkages) or not sent.valid:
+                return None
+
+            # Parse postscript notated linkage and get two lists with tokens and links in return.
+            tokens, links = parse_postscript(sent.linkages[0], options)
 
-    def _check_token_counts(self, tokens: List[str]) -> bool:
-        if self._token_counts is None:
-            return True
+            if not len(tokens):
+                raise LGParseError(f"No tokens for sentence: '{sent.linkages[0].text}'")
 
-        # The sentence is considered invalid if any of the sentence tokens appears less then 'min_word_count' times.
-        for token in unbox_tokens(tokens):
-            if not token.startswith(r"###") and self._token_counts.get(token, 0) < self._min_word_count:
-                # self._logger.debug(f"{token}")
-                return False
+            return tokens, links
 
-        return True
+        return self._handle_parses(map(get_parse, sentences), options, out_stream, ref_parses, progress)
 
     def _handle_stream_output(self, text: str, options: int, out_stream, ref_path: str) -> (ParseMetrics, ParseQuality):
         """
@@ -176,55 +252,151 @@ class LGInprocParser(AbstractFileParserClient):
                                        "Reference file '{}' does not match "
                                        "its corpus counterpart {} != {}.".format(ref_path, len_ref, len_par))
 
-            # Parse linkages and make statistics estimation
-            for sentence_count, sent in enumerate(sentences):
+            total_metrics, total_quality = self._handle_sentences(sentences, options, out_stream, ref_parses)
 
-                if not len(sent.linkages) or not sent.valid:
-                    total_metrics.skipped_sentences += 1
-                    continue
+        # If output format is other than ull then simply write text to the output stream.
+        else:
+            print(text, file=out_stream)
 
-                # Parse postscript notated linkage and get two lists with tokens and links in return.
-                tokens, links = parse_postscript(sent.linkages[0], options)
+        return total_metrics, total_quality
 
-                if not len(tokens):
-                    raise LGParseError(f"No tokens for sentence: '{sent.linkages[0].text}'")
+    def _handle_line_streams(self, streams: Iterable[Iterable[str]], options: int, out_stream, ref_path: str,
+                             progress=None) -> (ParseMetrics, ParseQuality):
+        """
+        Handle link-parser output line by line as it is read from the process' stdout. Each sentence is handled
+            as soon as its linkages are complete so memory consumption is bounded by the largest sentence output.
 
-                # Filter tokens to match parse options
-                prepared = prepare_tokens(tokens, options)
+        :param streams:     Iterable of output line streams, one per link-parser process, in corpus sentence order.
+        :param options:     Integer variable with multiple bit fields.
+        :param out_stream:  Output file stream handle.
+        :param ref_path:    Reference file path.
+        :param progress:    Callable taking increment value to report progress after each sentence or None.
+        :return:            Tuple (ParseMetrics, ParseQuality)
+        """
+        total_metrics, total_quality = ParseMetrics(), ParseQuality()
 
-                # Strip suffixes, convert to lower case and make a set out of token list
-                lcased_token_set = set(prepared)
-                # lcased_token_set = { strip_token(token.lower()) for token in tokens }
+        # Parse only if 'ull' output format is specified.
+        if not (options & BIT_OUTPUT):
 
-                # The sentence is skipped if one of the following is true:
-                #   - stop token list is not empty and the sentence contains at least one of the stop tokens
-                #   - sentence length exceeds 'max_sentence_len' value
-                #   - one of the sentence tokens has count less then specified by 'min_word_count'
-                if self._stop_tokens_set is not None and len(lcased_token_set & self._stop_tokens_set) or \
-                        len(prepared) > self._max_sentence_len or not self._check_token_counts(prepared):
+            ref_parses = load_parses(ref_path) if options & BIT_PARSE_QUALITY and ref_path is not None else []
 
-                    # Increment skipped sentence counter and continue with the next sentence
-                    total_metrics.skipped_sentences += 1
-                    continue
+            sentences = chain.from_iterable(self._parse_ps_blocks(self._split_ps_stream(lines), options)
+                                            for lines in streams)
 
-                # Print out links in ULL-format
-                print_output(tokens, links, options, out_stream)
+            total_metrics, total_quality = self._handle_sentences(sentences, options, out_stream, ref_parses,
+                                                                  progress)
 
-                # Calculate parse ability etc.
-                total_metrics += parse_metrics(prepared)
+            len_par = total_metrics.sentences + total_metrics.skipped_sentences
 
-                # Calculate parse quality if the option is set
-                if (options & BIT_PARSE_QUALITY) and len(ref_parses):
-                    ref_set = get_link_set(unbox_tokens(tokenize_sentence(ref_parses[sentence_count][0])),
-                                           ref_parses[sentence_count][1], options)
-                    total_quality += parse_quality(get_link_set(tokens, links, options), ref_set)
+            if options & BIT_PARSE_QUALITY and ref_path is not None and len(ref_parses) != len_par:
+                raise LGParseError("Number of sentences in corpus and reference files missmatch. "
+                                   "Reference file '{}' does not match "
+                                   "its corpus counterpart {} != {}.".format(ref_path, len(ref_parses), len_par))
 
-        # If output format is other than ull then simply write text to the output stream.
+        # If output format is other than ull then simply copy text to the output stream.
         else:
-            print(text, file=out_stream)
+            for lines in streams:
+                for line in lines:
+                    out_stream.write(line)
 
         return total_metrics, total_quality
 
+    @staticmethod
+    def _write_sentences(sentences: Iterable[str]):
+        """
+        Write filtered corpus file lines into a temporary file to be used as link-parser standard input.
+
+        :param sentences:   Iterable of lines returned by CorpusFilter.lines().
+        :return:            Temporary file object positioned at the beginning.
+        """
+        in_file = TemporaryFile()
+
+        in_file.writelines(line.encode("utf-8", "surrogateescape") for line in sentences)
+        in_file.seek(0)
+
+        return in_file
+
+    def _parse_shards(self, sentences: List[str], lgp_cmd: list, workers: int, options: int, out_stream,
+                      ref_path: str, progress=None) -> (ParseMetrics, ParseQuality):
+        """
+        Split filtered corpus file sentences into shards and parse them concurrently with separate
+            link-parser processes. Shard outputs are handled one after another in the original sentence order
+            as soon as the corresponding process is finished, so both ULL output and reference parse alignment
+            are the same as if the file was parsed by a single process.
+
+        :param sentences:       List of filtered corpus file lines.
+        :param lgp_cmd:         link-parser command line.
+        :param workers:         Number of link-parser processes.
+        :param options:         Integer variable with multiple bit fields.
+        :param out_stream:      Output file stream handle.
+        :param ref_path:        Reference file path.
+        :param progress:        Callable taking increment value to report progress after each sentence or None.
+        :return:                Tuple (ParseMetrics, ParseQuality)
+        """
+        shard_size = max(1, -(-len(sentences) // workers))
+        shards, procs = [], []
+
+        try:
+            # Write sentences into shard files
+            for start in range(0, len(sentences), shard_size):
+                shards.append((self._write_sentences(sentences[start:start + shard_size]), TemporaryFile(),
+                               TemporaryFile()))
+
+            # Start link-parser process for each shard
+            for in_file, out_file, err_file in shards:
+                procs.append(Popen(lgp_cmd, stdin=in_file, stdout=out_file, stderr=err_file))
+
+            def shard_outputs():
+                for proc, (in_file, out_file, err_file) in zip(procs, shards):
+                    proc.wait()
+
+                    # Check return code to make sure the process completed successfully.
+                    if proc.returncode != 0:
+                        err_file.seek(0)
+                        raise ParserError(f"Process '{lgp_cmd[0]}' terminated with exit code: {proc.returncode} "
+                                          f"and error message:\n'{err_file.read().decode()}'.")
+
+                    out_file.seek(0)
+                    yield io.TextIOWrapper(out_file, encoding="utf-8-sig")
+
+            return self._handle_line_streams(shard_outputs(), options, out_stream, ref_path, progress)
+
+        finally:
+            for proc in procs:
+                if proc.poll() is None:
+                    proc.kill()
+                    proc.wait()
+
+            for files in shards:
+                for file in files:
+                    file.close()
+
+    def _parse_pooled(self, sentences: List[str], lgp_cmd: list, workers: int, options: int, out_stream,
+                      ref_path: str, progress=None) -> (ParseMetrics, ParseQuality):
+        """
+        Parse filtered corpus file sentences with persistent link-parser processes. The processes are started
+            once per dictionary and reused for all corpus files parsed by this instance until close() is called.
+
+        :param sentences:       List of filtered corpus file lines.
+        :param lgp_cmd:         link-parser command line.
+        :param workers:         Number of link-parser processes.
+        :param options:         Integer variable with multiple bit fields.
+        :param out_stream:      Output file stream handle.
+        :param ref_path:        Reference file path.
+        :param progress:        Callable taking increment value to report progress after each sentence or None.
+        :return:                Tuple (ParseMetrics, ParseQuality)
+        """
+        if self._pool is not None and self._pool.size != workers:
+            self.close()
+
+        if self._pool is None:
+            self._pool = LGWorkerPool(workers, read_timeout=max(60, 10 * self._timeout))
+
+        # Chunk outputs are joined into a single stream as if it was returned by a single process
+        lines = chain.from_iterable(self._pool.parse(lgp_cmd, sentences))
+
+        return self._handle_line_streams([lines], options, out_stream, ref_path, progress)
+
     def parse(self, dict_path: str, corpus_path: str, output_path: str, ref_file: str, options: int,
               progress: AbstractProgressClient = None, **kwargs) -> (ParseMetrics, ParseQuality):
         """
@@ -236,6 +408,13 @@ class LGInprocParser(AbstractFileParserClient):
         :param ref_file:        Reference file path.
         :param options:         Bit mask representing parsing options.
         :param progress:        Progress instance reference.
+        :param kwargs:          Optional parameters: 'stop_tokens', 'max_sentence_len', 'min_word_count',
+                                    'token_counts', 'stream_output' - if True, link-parser output is read and
+                                    handled sentence by sentence instead of being held in memory as a whole,
+                                    'workers' - number of link-parser processes to parse corpus file shards
+                                    concurrently (output is handled the same way as with 'stream_output'),
+                                    'persistent_workers' - if True, link-parser processes are kept alive and
+                                    reused for all corpus files parsed with the same dictionary.
         :return:                Tuple (ParseMetrics, ParseQuality).
         """
         if progress is None:
@@ -252,19 +431,11 @@ class LGInprocParser(AbstractFileParserClient):
                 raise LGParseError(f"Wrong dictionary version: {dict_ver}, expected: {self._lg_version}")
 
         # Issue #184 modifications
-        stop_tokens = kwargs.get("stop_tokens", None)
+        self._set_sentence_filters(**kwargs)
 
-        self._stop_tokens_set = set([token.strip() for token in stop_tokens.split(" ")]) if stop_tokens is not None \
-            else None
-
-        self._max_sentence_len = kwargs.get("max_sentence_len", LGInprocParser.MAX_SENTENCE_LENGTH)
-
-        # Zero max_sentence_len means unlimited sentence length
-        if not self._max_sentence_len:
-            self._max_sentence_len = LGInprocParser.MAX_SENTENCE_LENGTH
-
-        self._min_word_count = kwargs.get("min_word_count", 0)
-        self._token_counts = kwargs.get("token_counts", None)
+        stream_output = kwargs.get("stream_output", False)
+        workers = kwargs.get("workers", 1) or 1
+        persistent_workers = kwargs.get("persistent_workers", False)
 
         sentence_count = 0
 
@@ -284,17 +455,27 @@ class LGInprocParser(AbstractFileParserClient):
             else:
                 self._logger.info("Reference file name is not specified. Parse quality is not calculated.")
 
-        sed_cmd = get_sed_cmd_common_part(options) + [corpus_path]
-
         out_stream = None
         ret_metrics = ParseMetrics()
         ret_quality = ParseQuality()
 
-        raw_stream, err_stream = None, None
+        raw_stream, err_stream, in_file = None, None, None
+
+        # Stream mode: stderr is redirected to a temporary file so that the pipe never blocks link-parser
+        err_file = TemporaryFile() if stream_output and workers <= 1 and not persistent_workers else PIPE
+
+        def update_progress(increment: int) -> None:
+            if progress is not None:
+                progress.update(increment)
+
+            if bar is not None:
+                bar.update(increment)
 
         try:
-            # Get number of sentences in input file
-            sentence_count = get_sentence_count(corpus_path, options)
+            # Filter input file sentences the same way sed does and count them in the same pass
+            corpus_filter = CorpusFilter(options)
+            sentences = list(corpus_filter.lines(corpus_path))
+            sentence_count = corpus_filter.sentence_count
 
             if progress is not None:
                 progress_type = type(progress)
@@ -310,49 +491,72 @@ class LGInprocParser(AbstractFileParserClient):
             out_stream = sys.stdout if output_path is None \
                 else open(output_path, "w", encoding="utf-8")
 
-            with Popen(sed_cmd, stdout=PIPE) as proc_grep, \
-                 Popen(lgp_cmd, stdin=proc_grep.stdout, stdout=PIPE, stderr=PIPE) as proc_pars:
+            if persistent_workers:
+                ret_metrics, ret_quality = self._parse_pooled(sentences, lgp_cmd, workers, options, out_stream,
+                                                              ref_file, update_progress)
+
+            elif workers > 1 and sentence_count > 1:
+                ret_metrics, ret_quality = self._parse_shards(sentences, lgp_cmd, workers, options, out_stream,
+                                                              ref_file, update_progress)
 
-                # Closing grep output stream will terminate it's process.
-                proc_grep.stdout.close()
+            else:
+                in_file = self._write_sentences(sentences)
 
-                # Read pipes to get complete output returned by link-parser
-                raw_stream, err_stream = proc_pars.communicate()
+                with Popen(lgp_cmd, stdin=in_file, stdout=PIPE, stderr=err_file) as proc_pars:
 
-                # Check return code to make sure the process completed successfully.
-                if proc_pars.returncode != 0:
-                    raise ParserError(f"Process '{lgp_cmd[0]}' terminated with exit code: {proc_pars.returncode} "
-                                      f"and error message:\n'{err_stream.decode()}'.")
+                    if stream_output:
+                        # Handle link-parser output sentence by sentence while it is being read
+                        ret_metrics, ret_quality = self._handle_line_streams(
+                            [io.TextIOWrapper(proc_pars.stdout, encoding="utf-8-sig")], options, out_stream, ref_file,
+                            update_progress)
 
-                # Take an action depending on the output format specified by 'options'
-                ret_metrics, ret_quality = self._handle_stream_output(raw_stream.decode("utf-8-sig"), options,
-                                                                      out_stream, ref_file)
+                        proc_pars.wait()
+                        err_file.seek(0)
+                        err_stream = err_file.read()
 
-                if progress is not None:
-                    progress.update(sentence_count)
+                    else:
+                        # Read pipes to get complete output returned by link-parser
+                        raw_stream, err_stream = proc_pars.communicate()
 
-                if bar is not None:
-                    bar.update(sentence_count)
+                    # Check return code to make sure the process completed successfully.
+                    if proc_pars.returncode != 0:
+                        raise ParserError(f"Process '{lgp_cmd[0]}' terminated with exit code: {proc_pars.returncode} "
+                                          f"and error message:\n'{err_stream.decode()}'.")
 
-                if not (options & BIT_OUTPUT) \
-                        and ret_metrics.sentences + ret_metrics.skipped_sentences != sentence_count:
+                    if not stream_output:
+                        # Take an action depending on the output format specified by 'options'
+                        ret_metrics, ret_quality = self._handle_stream_output(raw_stream.decode("utf-8-sig"), options,
+                                                                              out_stream, ref_file)
 
-                    path_len = len(corpus_path)
+                        update_progress(sentence_count)
 
-                    raise LGParseError("Number of sentences does not match. "
-                          "Read: {}, Parsed: {}, File: {}".format(sentence_count,
-                                                                  ret_metrics.sentences + ret_metrics.skipped_sentences,
-                                                                  corpus_path if path_len < 31
-                                                                                else "..." + corpus_path[path_len-27:]))
+            if not (options & BIT_OUTPUT) \
+                    and ret_metrics.sentences + ret_metrics.skipped_sentences != sentence_count:
+
+                path_len = len(corpus_path)
+
+                raise LGParseError("Number of sentences does not match. "
+                      "Read: {}, Parsed: {}, File: {}".format(sentence_count,
+                                                              ret_metrics.sentences + ret_metrics.skipped_sentences,
+                                                              corpus_path if path_len < 31
+                                                                            else "..." + corpus_path[path_len-27:]))
 
         except LGParseError:
-            self._logger.debug(err_stream.decode("utf-8-sig"))
+            # In stream mode the process is already terminated when the exception gets here
+            if err_stream is None and err_file is not PIPE:
+                err_file.seek(0)
+                err_stream = err_file.read()
+
+            # There is no raw output to save in stream mode as well as no error output in sharded mode
+            if raw_stream is not None:
+                with open(output_path + ".raw", "w") as r:
+                    r.write(raw_stream.decode("utf-8-sig"))
 
-            with open(output_path + ".raw", "w") as r:
-                r.write(raw_stream.decode("utf-8-sig"))
+            if err_stream is not None:
+                self._logger.debug(err_stream.decode("utf-8-sig"))
 
-            with open(output_path + ".err", "w") as e:
-                e.write(err_stream.decode("utf-8-sig"))
+                with open(output_path + ".err", "w") as e:
+                    e.write(err_stream.decode("utf-8-sig"))
 
             raise
 
@@ -366,4 +570,10 @@ class LGInprocParser(AbstractFileParserClient):
             if out_stream is not None and out_stream != sys.stdout:
                 out_stream.close()
 
+            if err_file is not PIPE:
+                err_file.close()
+
+            if in_file is not None:
+                in_file.close()
+
         return ret_metrics, ret_quality
@@ -0,0 +1,143 @@
+import logging
+from typing import Iterable, List, Optional, Tuple
+
+from ..common.absclient import AbstractFileParserClient
+from ..common.optconst import *
+from ..common.parsemetrics import ParseMetrics, ParseQuality
+from .psparse import prepare_tokens, get_link_set
+from .parsestat import parse_metrics, parse_quality
+from .lgmisc import LGParseError, print_output
+from .parsevaluate import tokenize_sentence, unbox_tokens
+
+"""
+    Functionality shared by Link Grammar file parsers regardless of the way sentences are actually parsed:
+    sentence filtering, ULL output and statistics estimation.
+"""
+
+__all__ = ['LGParserBase']
+
+
+class LGParserBase(AbstractFileParserClient):
+
+    MAX_SENTENCE_LENGTH = 99999
+
+    def __init__(self):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._stop_tokens_set = None
+        self._min_word_count = 0
+        self._max_sentence_len = LGParserBase.MAX_SENTENCE_LENGTH
+        self._token_counts = None
+        self._metrics = ParseMetrics()
+        self._quality = ParseQuality()
+
+    def close(self) -> None:
+        """ Release resources held between parse() calls if any """
+        pass
+
+    @property
+    def metrics(self) -> ParseMetrics:
+        """ Parse metrics accumulated so far by the current (or the last) parse() call """
+        return self._metrics
+
+    @property
+    def quality(self) -> ParseQuality:
+        """ Parse quality accumulated so far by the current (or the last) parse() call """
+        return self._quality
+
+    def _set_sentence_filters(self, **kwargs) -> None:
+        """
+        Set sentence filters from parse() keyword arguments (Issue #184 modifications).
+
+        :param kwargs:      'stop_tokens', 'max_sentence_len', 'min_word_count' and 'token_counts' are recognized.
+        :return:            None
+        """
+        stop_tokens = kwargs.get("stop_tokens", None)
+
+        self._stop_tokens_set = set([token.strip() for token in stop_tokens.split(" ")]) if stop_tokens is not None \
+            else None
+
+        self._max_sentence_len = kwargs.get("max_sentence_len", LGParserBase.MAX_SENTENCE_LENGTH)
+
+        # Zero max_sentence_len means unlimited sentence length
+        if not self._max_sentence_len:
+            self._max_sentence_len = LGParserBase.MAX_SENTENCE_LENGTH
+
+        self._min_word_count = kwargs.get("min_word_count", 0)
+        self._token_counts = kwargs.get("token_counts", None)
+
+    def _check_token_counts(self, tokens: List[str]) -> bool:
+        if self._token_counts is None:
+            return True
+
+        # The sentence is considered invalid if any of the sentence tokens appears less then 'min_word_count' times.
+        for token in unbox_tokens(tokens):
+            if not token.startswith(r"###") and self._token_counts.get(token, 0) < self._min_word_count:
+                # self._logger.debug(f"{token}")
+                return False
+
+        return True
+
+    def _handle_parses(self, parses: Iterable[Optional[Tuple[List[str], List[Tuple[int, int]]]]], options: int,
+                       out_stream, ref_parses: list, progress=None) -> (ParseMetrics, ParseQuality):
+        """
+        Print out ULL-formatted linkages and estimate statistics sentence by sentence.
+
+        :param parses:      Iterable of (tokens, links) tuples, one per sentence. None stands for a sentence
+                            with no valid linkage.
+        :param options:     Integer variable with multiple bit fields.
+        :param out_stream:  Output file stream handle.
+        :param ref_parses:  List of reference parses, loaded with load_parses(). Empty list if not specified.
+        :param progress:    Callable taking increment value to report progress after each sentence or None.
+        :return:            Tuple (ParseMetrics, ParseQuality)
+        """
+        # Running totals are available through 'metrics' and 'quality' properties while parsing is in progress
+        total_metrics, total_quality = self._metrics, self._quality = ParseMetrics(), ParseQuality()
+
+        # Make statistics estimation
+        for sentence_count, parse in enumerate(parses):
+
+            if progress is not None:
+                progress(1)
+
+            if parse is None:
+                total_metrics.skipped_sentences += 1
+                continue
+
+            tokens, links = parse
+
+            # Filter tokens to match parse options
+            prepared = prepare_tokens(tokens, options)
+
+            # Strip suffixes, convert to lower case and make a set out of token list
+            lcased_token_set = set(prepared)
+            # lcased_token_set = { strip_token(token.lower()) for token in tokens }
+
+            # The sentence is skipped if one of the following is true:
+            #   - stop token list is not empty and the sentence contains at least one of the stop tokens
+            #   - sentence length exceeds 'max_sentence_len' value
+            #   - one of the sentence tokens has count less then specified by 'min_word_count'
+            if self._stop_tokens_set is not None and len(lcased_token_set & self._stop_tokens_set) or \
+                    len(prepared) > self._max_sentence_len or not self._check_token_counts(prepared):
+
+                # Increment skipped sentence counter and continue with the next sentence
+                total_metrics.skipped_sentences += 1
+                continue
+
+            # Print out links in ULL-format
+            print_output(tokens, links, options, out_stream)
+
+            # Calculate parse ability etc.
+            total_metrics += parse_metrics(prepared)
+
+            # Calculate parse quality if the option is set
+            if (options & BIT_PARSE_QUALITY) and len(ref_parses):
+
+                if sentence_count >= len(ref_parses):
+                    raise LGParseError("Number of sentences in corpus and reference files missmatch. "
+                                       "Reference file has only {} sentences.".format(len(ref_parses)))
+
+                ref_set = get_link_set(unbox_tokens(tokenize_sentence(ref_parses[sentence_count][0])),
+                                       ref_parses[sentence_count][1], options)
+                total_quality += parse_quality(get_link_set(tokens, links, options), ref_set)
+
+        return total_metrics, total_quality
@@ -0,0 +1,244 @@
+import shutil
+import logging
+import threading
+from queue import Queue, Empty
+from collections import deque
+from itertools import cycle, islice
+from concurrent.futures import ThreadPoolExecutor
+from subprocess import PIPE, Popen
+from typing import List, Iterable, Iterator
+
+from .lgmisc import ParserError
+
+"""
+    Long-lived link-parser processes fed with sentences over stdin.
+
+    link-parser is started once per dictionary (command line) and reused for every corpus file. Sentences are sent
+    in chunks, each chunk followed by a sentinel command ('!limit=<N>', setting the limit to the same value). The
+    command response ('limit set to <N>') marks the end of the chunk output.
+"""
+
+__all__ = ['LGWorker', 'LGWorkerPool', 'LGWorkerError']
+
+
+class LGWorkerError(ParserError):
+    pass
+
+
+def get_sentinel(limit: int) -> (str, str):
+    """
+    Return sentinel command and its response
+
+    :param limit:       Linkage limit value.
+    :return:            Tuple (<sentinel command>, <sentinel response>)
+    """
+    return f"!limit={limit}\n", f"limit set to {limit}"
+
+
+def get_limit(lgp_cmd: List[str]) -> int:
+    """ Return linkage limit value of link-parser command line """
+    for arg in lgp_cmd:
+        if arg.startswith("-limit="):
+            return int(arg[len("-limit="):])
+
+    raise LGWorkerError(f"No '-limit' argument in link-parser command line: {lgp_cmd}")
+
+
+class LGWorker:
+    """
+    Single link-parser process. Output lines are read by a separate thread so that the process never blocks
+        on a full pipe, standard error is kept for the last 'ERR_LINES' lines.
+    """
+    ERR_LINES = 100
+
+    def __init__(self, lgp_cmd: List[str], read_timeout: float = 60):
+        self._logger = logging.getLogger("LGWorker")
+        self._lgp_cmd = lgp_cmd
+        self._read_timeout = read_timeout
+        self._limit = get_limit(lgp_cmd)
+        self._proc = None
+        self._lines = None
+        self._errors = deque(maxlen=LGWorker.ERR_LINES)
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _read(stream, put) -> None:
+        for line in stream:
+            put(line)
+
+        put(None)
+
+    def start(self) -> None:
+        # link-parser stdout is a pipe, so it is forced to be line buffered not to hold back sentinel response
+        cmd = (["stdbuf", "-oL"] if shutil.which("stdbuf") else []) + self._lgp_cmd
+
+        self._proc = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE, encoding="utf-8")
+        self._lines = Queue()
+        self._errors.clear()
+
+        threading.Thread(target=self._read, args=(self._proc.stdout, self._lines.put), daemon=True).start()
+        threading.Thread(target=self._read, args=(self._proc.stderr, self._errors.append), daemon=True).start()
+
+        # Skip command line options response. It may have 'limit set to <N>' line already, so the limit is changed
+        #   to another value and back.
+        self._exchange(*get_sentinel(self._limit + 1))
+        self._exchange(*get_sentinel(self._limit))
+
+    def close(self) -> None:
+        if self._proc is None:
+            return
+
+        try:
+            self._proc.stdin.close()
+            self._proc.wait(timeout=self._read_timeout)
+
+        except Exception:
+            self._proc.kill()
+            self._proc.wait()
+
+        self._proc = None
+
+    def restart(self) -> None:
+        if self._proc is not None:
+            self._proc.kill()
+            self._proc.wait()
+            self._proc = None
+
+        self.start()
+
+    @property
+    def errors(self) -> str:
+        return "".join(line for line in self._errors if line is not None)
+
+    def parse(self, sentences: List[str]) -> List[str]:
+        """
+        Parse sentences and return output lines.
+
+        :param sentences:   List of sentences, one per line.
+        :return:            List of link-parser output lines (no sentinel response).
+        """
+        sentinel, response = get_sentinel(self._limit)
+
+        return self._exchange("".join(line if line.endswith("\n") else line + "\n" for line in sentences)
+                              + sentinel, response)
+
+    def _exchange(self, text: str, response: str) -> List[str]:
+        """ Write text to link-parser stdin and read output lines until response line is found """
+        if self._proc is None or self._proc.poll() is not None:
+            raise LGWorkerError(f"Process '{self._lgp_cmd[0]}' is not running:\n'{self.errors}'.")
+
+        self._proc.stdin.write(text)
+        self._proc.stdin.flush()
+
+        lines = []
+
+        while True:
+            try:
+                line = self._lines.get(timeout=self._read_timeout)
+
+            except Empty:
+                raise LGWorkerError(f"Process '{self._lgp_cmd[0]}' has not responded "
+                                    f"for {self._read_timeout} seconds.")
+
+            if line is None:
+                self._proc.wait()
+                raise LGWorkerError(f"Process '{self._lgp_cmd[0]}' terminated with exit code: "
+                                    f"{self._proc.returncode} and error message:\n'{self.errors}'.")
+
+            if line.rstrip("\r\n") == response:
+                return lines
+
+            lines.append(line)
+
+
+class LGWorkerPool:
+    """
+    Pool of link-parser processes for a single dictionary (link-parser command line). The processes are reused
+        for all corpus files until a different command line is requested, then the pool is restarted.
+    """
+    def __init__(self, size: int = 1, chunk_size: int = 100, read_timeout: float = 60, retries: int = 1):
+        self._logger = logging.getLogger("LGWorkerPool")
+        self._size = max(1, size)
+        self._chunk_size = chunk_size
+        self._read_timeout = read_timeout
+        self._retries = retries
+        self._lgp_cmd = None
+        self._workers = []
+        self._executor = None
+
+    def __del__(self):
+        self.close()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def close(self) -> None:
+        for worker in self._workers:
+            worker.close()
+
+        if self._executor is not None:
+            self._executor.shutdown()
+
+        self._workers, self._executor, self._lgp_cmd = [], None, None
+
+    def _start(self, lgp_cmd: List[str]) -> None:
+        if lgp_cmd == self._lgp_cmd:
+            return
+
+        self.close()
+
+        self._logger.debug(f"Starting {self._size} worker(s): {lgp_cmd}")
+
+        self._workers = [LGWorker(lgp_cmd, self._read_timeout) for _ in range(self._size)]
+
+        for worker in self._workers:
+            worker.start()
+
+        self._executor = ThreadPoolExecutor(self._size)
+        self._lgp_cmd = lgp_cmd
+
+    def _parse_chunk(self, worker: LGWorker, chunk: List[str]) -> List[str]:
+        with worker.lock:
+            for attempt in range(self._retries + 1):
+                try:
+                    return worker.parse(chunk)
+
+                except LGWorkerError as err:
+                    self._logger.warning(f"{err} Restarting the worker.")
+
+                    worker.restart()
+
+                    if attempt == self._retries:
+                        raise
+
+    def parse(self, lgp_cmd: List[str], sentences: Iterable[str]) -> Iterator[List[str]]:
+        """
+        Parse sentences with the pool workers.
+
+        :param lgp_cmd:     link-parser command line. The pool is restarted if it differs from the previous one.
+        :param sentences:   Iterable of sentences, one per line.
+        :return:            Iterator of link-parser output line lists, one per chunk of sentences, in sentence order.
+        """
+        self._start(lgp_cmd)
+
+        sentences = iter(sentences)
+        workers = cycle(self._workers)
+        futures = deque()
+
+        def submit() -> bool:
+            chunk = list(islice(sentences, self._chunk_size))
+
+            if len(chunk):
+                futures.append(self._executor.submit(self._parse_chunk, next(workers), chunk))
+
+            return len(chunk) > 0
+
+        # Keep at most two chunks per worker in progress not to hold the whole output in memory
+        while len(futures) < 2 * self._size and submit():
+            pass
+
+        while len(futures):
+            lines = futures.popleft().result()
+            submit()
+            yield lines
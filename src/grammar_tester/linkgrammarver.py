@@ -1,5 +1,6 @@
 from subprocess import PIPE, Popen
 from typing import Tuple, Optional
+from functools import lru_cache
 import os
 
 class LGVersionParseError(Exception):
@@ -43,9 +44,10 @@ def handle_version_response(text: str) -> Tuple[str, str]:
     return ver, pth
 
 
+@lru_cache(maxsize=None)
 def get_lg_version() -> (str, str):
     """
-    Get Link Grammar version and preinstalled dictionary path
+    Get Link Grammar version and preinstalled dictionary path. 'link-parser --version' is run only once per process.
 
     :return:    Tuple: (<version string>, <dictionary path>)
     """
@@ -10,9 +10,10 @@ from decimal import Decimal
      
 """
 
-__all__ = ['strip_token', 'parse_tokens', 'parse_links', 'parse_postscript', 'skip_lines', 'trim_garbage',
-           'get_link_set', 'prepare_tokens', 'skip_command_response', 'skip_linkage_header', 'split_ps_parses',
-           'get_sentence_text', 'get_linkage_cost', 'PS_TIMEOUT_EXPIRED', 'PS_PANIC_DETECTED']
+__all__ = ['strip_token', 'parse_tokens', 'parse_words', 'parse_links', 'parse_postscript', 'parse_linkage',
+           'skip_lines', 'trim_garbage', 'get_link_set', 'prepare_tokens', 'skip_command_response',
+           'skip_linkage_header', 'split_ps_parses', 'get_sentence_text', 'get_linkage_cost', 'PS_TIMEOUT_EXPIRED',
+           'PS_PANIC_DETECTED']
 
 __version__ = "1.0.0"
 
@@ -88,8 +89,7 @@ def parse_tokens(txt, opt) -> (list, int):
     :param opt:         Bit mask option value (see parse_test() description for more details).
     :return:            List of tokens.
     """
-    tokens = []
-    offset = 0
+    words = []
 
     # Skip the open brace
     start_pos = 1
@@ -100,7 +100,30 @@ def parse_tokens(txt, opt) -> (list, int):
         end_pos = len(txt)-1
 
     while end_pos - start_pos > 0:
-        token = txt[start_pos:end_pos:]
+        words.append(txt[start_pos:end_pos:])
+
+        start_pos = end_pos + 2
+        end_pos = txt.find(")(", start_pos + 1)
+
+        if end_pos < 0:
+            end_pos = len(txt)-1
+
+    return parse_words(words, opt)
+
+
+def parse_words(words: List[str], opt: int) -> (list, int):
+    """
+    Convert linkage words, either extracted from postscript or obtained directly from Linkage object, into the list
+        of tokens the same way for both.
+
+    :param words:       List of linkage words as they are printed by LG.
+    :param opt:         Bit mask option value (see parse_test() description for more details).
+    :return:            Tuple (<list of tokens>, <token index offset>).
+    """
+    tokens = []
+    offset = 0
+
+    for index, token in enumerate(words):
 
         # Strip LG suffixes if the option is set.
         if opt & BIT_STRIP == BIT_STRIP:
@@ -118,7 +141,7 @@ def parse_tokens(txt, opt) -> (list, int):
         else:
             # Even if LEFT-WALL is not defined in .dict file it is still added into the token list
             #   in order for token numbering to be started from one as agreed for ULL project.
-            if start_pos == 1:
+            if not index:
                 tokens.append(r"###LEFT-WALL###")
                 offset = 1
 
@@ -128,12 +151,6 @@ def parse_tokens(txt, opt) -> (list, int):
 
             tokens.append(token)
 
-        start_pos = end_pos + 2
-        end_pos = txt.find(")(", start_pos + 1)
-
-        if end_pos < 0:
-            end_pos = len(txt)-1
-
     return tokens, offset
 
 
@@ -239,6 +256,40 @@ def parse_postscript(text: str, options: int) -> ([], []):
     raise LGParseError(f"parse_postscript(): regex does not match for:\n{text}")
 
 
+def parse_linkage(words: List[str], links: List[Tuple[int, int, str]], options: int) -> ([], []):
+    """
+    Convert words and links obtained directly from Link Grammar Linkage object into tokens and links
+        exactly as parse_postscript() does for the postscript printed by link-parser. Walls and their links
+        are dropped the way LG postscript printing drops them when walls are not displayed.
+
+    :param words:       List of linkage words.
+    :param links:       List of (<left word index>, <right word index>, <left connector label>) tuples.
+    :param options:     Bit mask, representing different parsing options. See `optconst.py` for details.
+    :return:            Tuple of two lists: (tokens, links).
+    """
+    last = len(words) - 1
+
+    def is_printed(wall_index: int, wall: str, suppressor: str) -> bool:
+        # Word is not a wall, i.e. the wall is not defined in the dictionary
+        if last < 0 or words[wall_index] not in [wall, "[" + wall + "]"]:
+            return True
+
+        wall_links = [label for left, right, label in links if (left if not wall_index else right) == wall_index
+                      and (wall_index or right != last)]
+
+        return len(wall_links) > 1 or len(wall_links) == 1 and wall_links[0] != suppressor
+
+    print_first, print_last = is_printed(0, "LEFT-WALL", "Wd"), is_printed(last, "RIGHT-WALL", "RW")
+
+    skipped = 0 if print_first else 1
+
+    tokens, offset = parse_words(words[skipped:(last + 1 if print_last else last)], options)
+
+    return tokens, [(left - skipped + offset, right - skipped + offset) for left, right, _ in links
+                    if (print_first or left) and (print_last or right != last)
+                    and right - skipped + offset < len(tokens)]
+
+
 def get_link_set(tokens: list, links: Union[list, set], options: int) -> set:
     """
     Create link set from link list filtering out unnecessary links according to options bit flags.